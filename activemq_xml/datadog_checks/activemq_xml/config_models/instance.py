@@ -78,6 +78,7 @@ class InstanceConfig(BaseModel):
     proxy: Optional[Proxy]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     service: Optional[str]
     skip_proxy: Optional[bool]
     suppress_errors: Optional[bool]
@@ -122,12 +122,14 @@ class InstanceConfig(BaseModel):
     password: Optional[str]
     persist_connections: Optional[bool]
     port: Optional[int]
+    prefetch_shared_labels: Optional[bool]
     proxy: Optional[Proxy]
     raw_line_filters: Optional[Sequence[str]]
     raw_metric_prefix: Optional[str]
     read_timeout: Optional[float]
     rename_labels: Optional[Mapping[str, Any]]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     service: Optional[str]
     share_labels: Optional[Mapping[str, Union[bool, ShareLabel]]]
     skip_proxy: Optional[bool]
@@ -147,6 +149,8 @@ class InstanceConfig(BaseModel):
     use_latest_spec: Optional[bool]
     use_legacy_auth_encoding: Optional[bool]
     use_process_start_time: Optional[bool]
+    use_protobuf: Optional[bool]
+    use_streaming_parser: Optional[bool]
     username: Optional[str]
 
     @root_validator(pre=True)
@@ -121,6 +121,7 @@ class InstanceConfig(BaseModel):
     openmetrics_endpoint: Optional[str]
     password: Optional[str]
     persist_connections: Optional[bool]
+    prefetch_shared_labels: Optional[bool]
     prometheus_metrics_path: Optional[str]
     proxy: Optional[Proxy]
     raw_line_filters: Optional[Sequence[str]]
@@ -129,6 +130,7 @@ class InstanceConfig(BaseModel):
     region_name: Optional[str]
     rename_labels: Optional[Mapping[str, Any]]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     service: Optional[str]
     share_labels: Optional[Mapping[str, Union[bool, ShareLabel]]]
     skip_proxy: Optional[bool]
@@ -147,6 +149,8 @@ class InstanceConfig(BaseModel):
     use_legacy_auth_encoding: Optional[bool]
     use_openmetrics: Optional[bool]
     use_process_start_time: Optional[bool]
+    use_protobuf: Optional[bool]
+    use_streaming_parser: Optional[bool]
     username: Optional[str]
 
     @root_validator(pre=True)
@@ -75,6 +75,7 @@ class InstanceConfig(BaseModel):
     proxy: Optional[Proxy]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     service: Optional[str]
     services: Optional[Mapping[str, Any]]
     skip_proxy: Optional[bool]
@@ -202,6 +202,10 @@ def instance_persist_connections(field, value):
     return False
 
 
+def instance_prefetch_shared_labels(field, value):
+    return False
+
+
 def instance_proxy(field, value):
     return get_default_field_value(field, value)
 
@@ -230,6 +234,10 @@ def instance_request_size(field, value):
     return 16
 
 
+def instance_response_cache_size(field, value):
+    return 10240
+
+
 def instance_service(field, value):
     return get_default_field_value(field, value)
 
@@ -298,5 +306,13 @@ def instance_use_process_start_time(field, value):
     return False
 
 
+def instance_use_protobuf(field, value):
+    return False
+
+
+def instance_use_streaming_parser(field, value):
+    return False
+
+
 def instance_username(field, value):
     return get_default_field_value(field, value)
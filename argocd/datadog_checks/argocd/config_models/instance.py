@@ -118,6 +118,7 @@ class InstanceConfig(BaseModel):
     openmetrics_endpoint: Optional[str]
     password: Optional[str]
     persist_connections: Optional[bool]
+    prefetch_shared_labels: Optional[bool]
     proxy: Optional[Proxy]
     raw_line_filters: Optional[Sequence[str]]
     raw_metric_prefix: Optional[str]
@@ -125,6 +126,7 @@ class InstanceConfig(BaseModel):
     rename_labels: Optional[Mapping[str, Any]]
     repo_server_endpoint: Optional[str]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     service: Optional[str]
     share_labels: Optional[Mapping[str, Union[bool, ShareLabel]]]
     skip_proxy: Optional[bool]
@@ -142,6 +144,8 @@ class InstanceConfig(BaseModel):
     use_latest_spec: Optional[bool]
     use_legacy_auth_encoding: Optional[bool]
     use_process_start_time: Optional[bool]
+    use_protobuf: Optional[bool]
+    use_streaming_parser: Optional[bool]
     username: Optional[str]
 
     @root_validator(pre=True)
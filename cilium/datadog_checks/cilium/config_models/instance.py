@@ -150,6 +150,7 @@ class InstanceConfig(BaseModel):
     operator_endpoint: Optional[str]
     password: Optional[str]
     persist_connections: Optional[bool]
+    prefetch_shared_labels: Optional[bool]
     prometheus_metrics_prefix: Optional[str]
     prometheus_url: Optional[str]
     proxy: Optional[Proxy]
@@ -158,6 +159,7 @@ class InstanceConfig(BaseModel):
     read_timeout: Optional[float]
     rename_labels: Optional[Mapping[str, Any]]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     send_distribution_buckets: Optional[bool]
     send_distribution_counts_as_monotonic: Optional[bool]
     send_distribution_sums_as_monotonic: Optional[bool]
@@ -183,6 +185,8 @@ class InstanceConfig(BaseModel):
     use_legacy_auth_encoding: Optional[bool]
     use_openmetrics: Optional[bool]
     use_process_start_time: Optional[bool]
+    use_protobuf: Optional[bool]
+    use_streaming_parser: Optional[bool]
     username: Optional[str]
 
     @root_validator(pre=True)
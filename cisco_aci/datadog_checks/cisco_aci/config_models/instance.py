@@ -83,6 +83,7 @@ class InstanceConfig(BaseModel):
     pwd: Optional[str]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     service: Optional[str]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
@@ -138,6 +138,10 @@ def instance_request_size(field, value):
     return 16
 
 
+def instance_response_cache_size(field, value):
+    return 10240
+
+
 def instance_results_per_page(field, value):
     return 100
 
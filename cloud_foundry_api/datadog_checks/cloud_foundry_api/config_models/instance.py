@@ -79,6 +79,7 @@ class InstanceConfig(BaseModel):
     proxy: Optional[Proxy]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     results_per_page: Optional[int] = Field(None, le=5000)
     service: Optional[str]
     skip_proxy: Optional[bool]
@@ -158,6 +158,10 @@ def instance_request_size(field, value):
     return 16
 
 
+def instance_response_cache_size(field, value):
+    return 10240
+
+
 def instance_self_leader_check(field, value):
     return False
 
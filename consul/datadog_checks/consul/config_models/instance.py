@@ -81,6 +81,7 @@ class InstanceConfig(BaseModel):
     proxy: Optional[Proxy]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     self_leader_check: Optional[bool]
     service: Optional[str]
     services_exclude: Optional[Sequence[str]]
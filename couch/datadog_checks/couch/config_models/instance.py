@@ -80,6 +80,7 @@ class InstanceConfig(BaseModel):
     proxy: Optional[Proxy]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     server: str
     service: Optional[str]
     skip_proxy: Optional[bool]
@@ -77,6 +77,7 @@ class InstanceConfig(BaseModel):
     query_monitoring_url: Optional[str]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     server: str
     service: Optional[str]
     skip_proxy: Optional[bool]
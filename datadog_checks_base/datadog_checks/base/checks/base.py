@@ -8,9 +8,11 @@ import inspect
 import json
 import logging
 import re
+import threading
 import traceback
 import unicodedata
 from collections import deque
+from itertools import repeat
 from os.path import basename
 from typing import (  # noqa: F401
     TYPE_CHECKING,
@@ -19,6 +21,7 @@ from typing import (  # noqa: F401
     Callable,
     Deque,
     Dict,
+    Iterable,
     List,
     Optional,
     Sequence,
@@ -28,7 +31,8 @@ from typing import (  # noqa: F401
 )
 
 import yaml
-from six import PY2, binary_type, iteritems, raise_from, text_type
+from cachetools import LRUCache
+from six import PY2, binary_type, iteritems, raise_from, string_types, text_type
 
 from ..config import is_affirmative
 from ..constants import ServiceCheck
@@ -42,6 +46,7 @@ from ..types import (
     ProxySettings,  # noqa: F401
     ServiceCheckStatus,  # noqa: F401
 )
+from ..utils.agent.common import METRIC_NAMESPACE_METRICS
 from ..utils.agent.utils import should_profile_memory
 from ..utils.common import ensure_bytes, to_native_string
 from ..utils.http import RequestsWrapper
@@ -87,6 +92,14 @@ if TYPE_CHECKING:
 
 # Metric types for which it's only useful to submit once per set of tags
 ONE_PER_CONTEXT_METRIC_TYPES = [aggregator.GAUGE, aggregator.RATE, aggregator.MONOTONIC_COUNT]
+BATCH_METRIC_TYPES = {
+    'gauge': aggregator.GAUGE,
+    'count': aggregator.COUNT,
+    'monotonic_count': aggregator.MONOTONIC_COUNT,
+    'rate': aggregator.RATE,
+    'histogram': aggregator.HISTOGRAM,
+    'historate': aggregator.HISTORATE,
+}
 TYPO_SIMILARITY_THRESHOLD = 0.95
 
 
@@ -160,6 +173,13 @@ class AgentCheck(object):
     # See https://github.com/DataDog/integrations-core/pull/2093 for more information.
     DEFAULT_METRIC_LIMIT = 0
 
+    # The maximum number of distinct sets of tags whose normalized form is kept in memory, checks that
+    # submit a large amount of distinct sets of tags may want to increase this. Set to 0 to disable caching.
+    TAGS_CACHE_SIZE = 10000
+
+    # The maximum number of metric names for which the result of the `metric_patterns` filtering is remembered
+    METRIC_DECISIONS_CACHE_SIZE = 10000
+
     # Allow tracing for classic integrations
     def __init_subclass__(cls, *args, **kwargs):
         try:
@@ -229,6 +249,8 @@ class AgentCheck(object):
         if not isinstance(metric_patterns, dict):
             raise ConfigurationError('Setting `metric_patterns` must be a mapping')
 
+        # Whether or not to send every formatted metric name, invalidated whenever the patterns change
+        self._metric_decisions = {}  # type: Dict[str, bool]
         self.exclude_metrics_pattern = self._create_metrics_pattern(metric_patterns, 'exclude')
         self.include_metrics_pattern = self._create_metrics_pattern(metric_patterns, 'include')
 
@@ -289,6 +311,13 @@ class AgentCheck(object):
         # Setup metric limits
         self.metric_limiter = self._get_metric_limiter(self.name, instance=self.instance)
 
+        # Setup the cache of normalized tags, cachetools caches are not thread-safe and metrics may be
+        # submitted from other threads, e.g. by DBM async jobs
+        self._tags_cache = LRUCache(self.TAGS_CACHE_SIZE) if self.TAGS_CACHE_SIZE > 0 else None
+        self._tags_cache_lock = threading.Lock()
+        self._tags_cache_hits = 0
+        self._tags_cache_misses = 0
+
         # Lazily load and validate config
         self._config_model_instance = None  # type: Any
         self._config_model_shared = None  # type: Any
@@ -375,6 +404,24 @@ class AgentCheck(object):
         """
         return yaml.safe_load(yaml_str)
 
+    @property
+    def exclude_metrics_pattern(self):
+        return self._exclude_metrics_pattern
+
+    @exclude_metrics_pattern.setter
+    def exclude_metrics_pattern(self, pattern):
+        self._exclude_metrics_pattern = pattern
+        self._metric_decisions.clear()
+
+    @property
+    def include_metrics_pattern(self):
+        return self._include_metrics_pattern
+
+    @include_metrics_pattern.setter
+    def include_metrics_pattern(self, pattern):
+        self._include_metrics_pattern = pattern
+        self._metric_decisions.clear()
+
     @property
     def http(self):
         # type: () -> RequestsWrapper
@@ -649,7 +696,40 @@ class AgentCheck(object):
         aggregator.submit_event_platform_event(self, self.check_id, to_native_string(raw_event), "dbm-activity")
 
     def should_send_metric(self, metric_name):
-        return not self._metric_excluded(metric_name) and self._metric_included(metric_name)
+        if self._exclude_metrics_pattern is None and self._include_metrics_pattern is None:
+            return True
+
+        try:
+            return self._metric_decisions[metric_name]
+        except KeyError:
+            decision = not self._metric_excluded(metric_name) and self._metric_included(metric_name)
+            if len(self._metric_decisions) < self.METRIC_DECISIONS_CACHE_SIZE:
+                self._metric_decisions[metric_name] = decision
+
+            return decision
+
+    def resolve_metric_decisions(self, metric_names, raw=False):
+        # type: (Iterable[str], bool) -> Dict[str, bool]
+        """Decide ahead of time whether or not metrics will be sent based on the `metric_patterns` option.
+
+        This is meant to be called at initialization with the names of all the metrics that a check knows it
+        may submit, so that no filtering is done during check runs for those metrics.
+
+        - **metric_names** (_Iterable[str]_) - the names of the metrics, as they would be passed to
+            submission methods
+        - **raw** (_bool_) - whether to ignore any defined namespace prefix
+
+        Returns a mapping of every metric name to whether or not it will be sent.
+        """
+        decisions = {}
+        for metric_name in metric_names:
+            formatted_name = self._format_namespace(metric_name, raw)
+            decision = not self._metric_excluded(formatted_name) and self._metric_included(formatted_name)
+
+            # Names known in advance are not subject to the cache size limit
+            self._metric_decisions[formatted_name] = decisions[metric_name] = decision
+
+        return decisions
 
     def _metric_included(self, metric_name):
         if self.include_metrics_pattern is None:
@@ -703,6 +783,86 @@ class AgentCheck(object):
 
         aggregator.submit_metric(self, self.check_id, mtype, name, value, tags, hostname, flush_first_value)
 
+    def submit_metrics_batch(
+        self, metric_type, names, values, tags_list, hostnames=None, raw=False, flush_first_value=False
+    ):
+        # type: (str, Union[str, Sequence[str]], Sequence[float], Sequence[Sequence[str]], Any, bool, bool) -> None
+        """Submit many samples of the same metric type at once.
+
+        This is equivalent to calling the method of the given type once per sample, but the namespace formatting
+        and filtering of every distinct metric name is only done once for the whole batch.
+
+        - **metric_type** (_str_) - one of `gauge`, `count`, `monotonic_count`, `rate`, `histogram` or `historate`
+        - **names** (_Union[str, List[str]]_) - the name of the metric for every sample, or a single name for all
+        - **values** (_List[float]_) - the value of every sample
+        - **tags_list** (_List[List[str]]_) - the tags of every sample
+        - **hostnames** (_Union[str, List[str]]_) - the hostname of every sample, or a single hostname for all.
+            Defaults to the current host.
+        - **raw** (_bool_) - whether to ignore any defined namespace prefix
+        - **flush_first_value** (_bool_) - whether to sample the first value of monotonic counts
+        """
+        mtype = BATCH_METRIC_TYPES.get(metric_type)
+        if mtype is None:
+            raise ValueError(
+                'Unknown metric type `{}`, must be one of: {}'.format(
+                    metric_type, ', '.join(sorted(BATCH_METRIC_TYPES))
+                )
+            )
+
+        if isinstance(names, string_types):
+            names = repeat(names)
+        if hostnames is None or isinstance(hostnames, string_types):
+            hostnames = repeat(hostnames or '')
+
+        # Formatted name of every distinct metric name or `None` if the metric should not be sent
+        formatted_names = {}
+
+        metric_limiter = self.metric_limiter
+        one_per_context = mtype in ONE_PER_CONTEXT_METRIC_TYPES
+        check_id = self.check_id
+        submit_metric = aggregator.submit_metric
+
+        for name, value, tags, hostname in zip(names, values, tags_list, hostnames):
+            if value is None:
+                # ignore metric sample
+                continue
+
+            try:
+                formatted_name = formatted_names[name]
+            except KeyError:
+                formatted_name = self._format_namespace(name, raw)
+                if not self.should_send_metric(formatted_name):
+                    formatted_name = None
+
+                formatted_names[name] = formatted_name
+
+            if formatted_name is None:
+                continue
+
+            tags = self._normalize_tags_type(tags or [], metric_name=formatted_name)
+            if hostname is None:
+                hostname = ''
+
+            if metric_limiter:
+                if one_per_context:
+                    if metric_limiter.is_reached():
+                        return
+                elif metric_limiter.is_reached(self._context_uid(mtype, formatted_name, tags, hostname)):
+                    continue
+
+            try:
+                value = float(value)
+            except ValueError:
+                err_msg = 'Metric: {} has non float value: {}. Only float values can be submitted as metrics.'.format(
+                    repr(formatted_name), repr(value)
+                )
+                if using_stub_aggregator:
+                    raise ValueError(err_msg)
+                self.warning(err_msg)
+                continue
+
+            submit_metric(self, check_id, mtype, formatted_name, value, tags, hostname, flush_first_value)
+
     def gauge(self, name, value, tags=None, hostname=None, device_name=None, raw=False):
         # type: (str, float, Sequence[str], str, str, bool) -> None
         """Sample a gauge metric.
@@ -966,7 +1126,7 @@ class AgentCheck(object):
             for hostname, source_map in external_tags:
                 new_tags.append((to_native_string(hostname), source_map))
                 for src_name, tags in iteritems(source_map):
-                    source_map[src_name] = self._normalize_tags_type(tags)
+                    source_map[src_name] = list(self._normalize_tags_type(tags))
             datadog_agent.set_external_tags(new_tags)
         except IndexError:
             self.log.exception('Unexpected external tags format: %s', external_tags)
@@ -1153,6 +1313,16 @@ class AgentCheck(object):
 
                 self.metric_limiter.reset()
 
+            if self._tags_cache is not None:
+                if is_affirmative(self.debug_metrics.get('tags_cache', False)):
+                    tags = self.get_debug_metric_tags()
+                    for metric_name, value in self._get_tags_cache_debug_metrics():
+                        self.gauge(metric_name, value, tags=tags, raw=True)
+
+                with self._tags_cache_lock:
+                    self._tags_cache_hits = 0
+                    self._tags_cache_misses = 0
+
         return error_report
 
     def event(self, event):
@@ -1193,7 +1363,7 @@ class AgentCheck(object):
                 return
 
         if event.get('tags'):
-            event['tags'] = self._normalize_tags_type(event['tags'])
+            event['tags'] = list(self._normalize_tags_type(event['tags']))
         if event.get('timestamp'):
             event['timestamp'] = int(event['timestamp'])
         if event.get('aggregation_key'):
@@ -1205,13 +1375,38 @@ class AgentCheck(object):
         aggregator.submit_event(self, self.check_id, event)
 
     def _normalize_tags_type(self, tags, device_name=None, metric_name=None):
-        # type: (Sequence[Union[None, str, bytes]], str, str) -> List[str]
+        # type: (Sequence[Union[None, str, bytes]], str, str) -> Sequence[str]
         """
         Normalize tags contents and type:
         - append `device_name` as `device:` tag
         - normalize tags type
-        - doesn't mutate the passed list, returns a new list
+        - doesn't mutate the passed list, returns a new sequence that may be shared between calls
         """
+        if device_name or self._tags_cache is None:
+            return self._normalize_tags(tags, device_name, metric_name)
+
+        # Sets of tags are mostly the same from one submission to the next, so cache their normalized form
+        key = tuple(tags)
+        try:
+            with self._tags_cache_lock:
+                normalized_tags = self._tags_cache.get(key)
+                if normalized_tags is not None:
+                    self._tags_cache_hits += 1
+                    return normalized_tags
+        except TypeError:
+            # Unhashable tags, let the normalization handle them
+            return self._normalize_tags(key, metric_name=metric_name)
+
+        # Normalize outside of the lock, concurrent misses for the same tags store equal values
+        normalized_tags = tuple(self._normalize_tags(key, metric_name=metric_name))
+        with self._tags_cache_lock:
+            self._tags_cache_misses += 1
+            self._tags_cache[key] = normalized_tags
+
+        return normalized_tags
+
+    def _normalize_tags(self, tags, device_name=None, metric_name=None):
+        # type: (Sequence[Union[None, str, bytes]], str, str) -> List[str]
         normalized_tags = []
 
         if device_name:
@@ -1237,6 +1432,13 @@ class AgentCheck(object):
                 normalized_tags.append(tag)
         return normalized_tags
 
+    def _get_tags_cache_debug_metrics(self):
+        return (
+            ('{}.tags_cache.hits'.format(METRIC_NAMESPACE_METRICS), self._tags_cache_hits),
+            ('{}.tags_cache.misses'.format(METRIC_NAMESPACE_METRICS), self._tags_cache_misses),
+            ('{}.tags_cache.size'.format(METRIC_NAMESPACE_METRICS), len(self._tags_cache)),
+        )
+
     def degeneralise_tag(self, tag):
         split_tag = tag.split(':', 1)
         if len(split_tag) > 1:
@@ -7,6 +7,7 @@ import copy
 import time
 from fnmatch import translate
 from math import isinf, isnan
+from operator import itemgetter
 from os.path import isfile
 from re import compile
 
@@ -55,6 +56,9 @@ class OpenMetricsScraperMixin(object):
     KUBERNETES_TOKEN_PATH = '/var/run/secrets/kubernetes.io/serviceaccount/token'
     METRICS_WITH_COUNTERS = {"counter", "histogram", "summary"}
 
+    # Label names are [a-zA-Z0-9_]*, so no risk of collision
+    WILDCARD_LABEL_JOIN = ('*',)
+
     def __init__(self, *args, **kwargs):
         # Initialize AgentCheck's base class
         super(OpenMetricsScraperMixin, self).__init__(*args, **kwargs)
@@ -149,11 +153,11 @@ class OpenMetricsScraperMixin(object):
         config['label_joins'] = default_instance.get('label_joins', {})
         config['label_joins'].update(instance.get('label_joins', {}))
 
-        # `_label_mapping` holds the additionals label info to add for a specific
-        # label value, example:
+        # `_label_mapping` holds the additionals label info to add for specific
+        # label values, by sorted label names, example:
         # self._label_mapping = {
-        #     'pod': {
-        #         'dd-agent-9s1l1': {
+        #     ('namespace', 'pod'): {
+        #         ('default', 'dd-agent-9s1l1'): {
         #             "node": "yolo",
         #             "host_ip": "yey"
         #         }
@@ -161,16 +165,25 @@ class OpenMetricsScraperMixin(object):
         # }
         config['_label_mapping'] = {}
 
-        # `_active_label_mapping` holds a dictionary of label values found during the run
+        # `_active_label_mapping` holds the label values found during the run
         # to cleanup the label_mapping of unused values, example:
         # self._active_label_mapping = {
-        #     'pod': {
-        #         'dd-agent-9s1l1': True
-        #     }
+        #     ('namespace', 'pod'): {('default', 'dd-agent-9s1l1')}
         # }
         config['_active_label_mapping'] = {}
 
-        # `_watched_labels` holds the sets of labels to watch for enrichment
+        # `_watched_labels` holds the labels to watch for enrichment, example:
+        # self._watched_labels = {
+        #     # The labels to match of every targeted metric
+        #     'keys': {'kube_pod_info': ('namespace', 'pod')},
+        #     # Every distinct join, along with the projection of sample labels on its labels to match
+        #     'joins': [(('namespace', 'pod'), itemgetter('namespace', 'pod'))],
+        #     # The joins relevant to the samples having the given label names
+        #     'plans': {('condition', 'namespace', 'pod'): [(('namespace', 'pod'), itemgetter('namespace', 'pod'))]},
+        #     # The labels to match of every join but the wildcard one, and the joins providing some of them
+        #     'chained_labels': {'namespace', 'pod'},
+        #     'chaining_joins': set(),
+        # }
         config['_watched_labels'] = {}
 
         config['_dry_run'] = True
@@ -510,9 +523,12 @@ class OpenMetricsScraperMixin(object):
                 scraper_config['_dry_run'] = False
             elif not scraper_config['_watched_labels']:
                 watched = scraper_config['_watched_labels']
-                watched['sets'] = {}
                 watched['keys'] = {}
-                watched['singles'] = set()
+                watched['joins'] = []
+                watched['plans'] = {}
+                watched['chained_labels'] = set()
+                watched['chaining_joins'] = set()
+                mapping_keys = []
                 for key, val in iteritems(scraper_config['label_joins']):
                     labels = []
                     if 'labels_to_match' in val:
@@ -525,11 +541,19 @@ class OpenMetricsScraperMixin(object):
                             labels = [val['label_to_match']]
 
                     if labels:
-                        s = frozenset(labels)
-                        watched['sets'][key] = s
-                        watched['keys'][key] = ','.join(s)
-                        if len(labels) == 1:
-                            watched['singles'].add(labels[0])
+                        # Joins on the same labels share their mapping
+                        mapping_key = tuple(sorted(set(labels)))
+                        watched['keys'][key] = mapping_key
+                        if mapping_key not in mapping_keys:
+                            mapping_keys.append(mapping_key)
+                        if mapping_key != self.WILDCARD_LABEL_JOIN:
+                            watched['chained_labels'].update(mapping_key)
+
+                # Apply the wildcard join first, then joins on a single label, then joins on multiple labels
+                mapping_keys.sort(key=lambda mapping_key: (mapping_key != self.WILDCARD_LABEL_JOIN, len(mapping_key)))
+                watched['joins'] = [
+                    (mapping_key, self._get_label_projection(mapping_key)) for mapping_key in mapping_keys
+                ]
 
             for metric in self.parse_metric_family(response, scraper_config):
                 yield metric
@@ -537,13 +561,14 @@ class OpenMetricsScraperMixin(object):
             # Set dry run off
             scraper_config['_dry_run'] = False
             # Garbage collect unused mapping and reset active labels
-            for metric, mapping in list(iteritems(scraper_config['_label_mapping'])):
-                for key in list(mapping):
-                    if (
-                        metric in scraper_config['_active_label_mapping']
-                        and key not in scraper_config['_active_label_mapping'][metric]
-                    ):
-                        del scraper_config['_label_mapping'][metric][key]
+            for mapping_key, mapping in iteritems(scraper_config['_label_mapping']):
+                active_values = scraper_config['_active_label_mapping'].get(mapping_key)
+                if active_values is None:
+                    continue
+
+                for mapping_value in list(mapping):
+                    if mapping_value not in active_values:
+                        del mapping[mapping_value]
             scraper_config['_active_label_mapping'] = {}
         finally:
             response.close()
@@ -636,12 +661,15 @@ class OpenMetricsScraperMixin(object):
             return
 
         watched = scraper_config['_watched_labels']
-        matching_labels = watched['sets'][metric.name]
         mapping_key = watched['keys'][metric.name]
+        matching_labels = () if mapping_key == self.WILDCARD_LABEL_JOIN else mapping_key
+        project = self._get_label_projection(mapping_key)
 
         labels_to_get = scraper_config['label_joins'][metric.name]['labels_to_get']
         get_all = '*' in labels_to_get
-        match_all = mapping_key == '*'
+        chained_labels = watched['chained_labels']
+        chaining = False
+        mapping = scraper_config['_label_mapping'].setdefault(mapping_key, {})
         for sample in metric.samples:
             # metadata-only metrics that are used for label joins are always equal to 1
             # this is required for metrics where all combinations of a state are sent
@@ -651,29 +679,33 @@ class OpenMetricsScraperMixin(object):
                 continue
 
             sample_labels = sample[self.SAMPLE_LABELS]
-            sample_labels_keys = sample_labels.keys()
+            try:
+                mapping_value = project(sample_labels)
+            except KeyError:
+                continue
 
-            if match_all or matching_labels.issubset(sample_labels_keys):
-                label_dict = {}
+            if get_all:
+                label_dict = {
+                    label_name: label_value
+                    for label_name, label_value in iteritems(sample_labels)
+                    if label_name not in matching_labels
+                }
+            else:
+                label_dict = {
+                    label_name: sample_labels[label_name] for label_name in labels_to_get if label_name in sample_labels
+                }
 
-                if get_all:
-                    for label_name, label_value in iteritems(sample_labels):
-                        if label_name in matching_labels:
-                            continue
-                        label_dict[label_name] = label_value
-                else:
-                    for label_name in labels_to_get:
-                        if label_name in sample_labels:
-                            label_dict[label_name] = sample_labels[label_name]
+            labels = mapping.get(mapping_value)
+            if labels is None:
+                mapping[mapping_value] = label_dict
+            else:
+                labels.update(label_dict)
 
-                if match_all:
-                    mapping_value = '*'
-                else:
-                    mapping_value = ','.join([sample_labels[l] for l in matching_labels])
+            if not chaining and chained_labels:
+                chaining = not chained_labels.isdisjoint(label_dict)
 
-                scraper_config['_label_mapping'].setdefault(mapping_key, {}).setdefault(mapping_value, {}).update(
-                    label_dict
-                )
+        if chaining:
+            watched['chaining_joins'].add(mapping_key)
 
     def _join_labels(self, metric, scraper_config):
         # Filter metric to see if we can enrich with joined labels
@@ -682,50 +714,71 @@ class OpenMetricsScraperMixin(object):
 
         label_mapping = scraper_config['_label_mapping']
         active_label_mapping = scraper_config['_active_label_mapping']
-
         watched = scraper_config['_watched_labels']
-        sets = watched['sets']
-        keys = watched['keys']
-        singles = watched['singles']
+        chaining_joins = watched['chaining_joins']
 
         for sample in metric.samples:
             sample_labels = sample[self.SAMPLE_LABELS]
-            sample_labels_keys = sample_labels.keys()
+            plan = self._get_label_join_plan(tuple(sample_labels), watched)
+            applied_joins = None
 
-            # Match with wildcard label
-            # Label names are [a-zA-Z0-9_]*, so no risk of collision
-            if '*' in singles:
-                active_label_mapping.setdefault('*', {})['*'] = True
+            while plan:
+                chained = False
+                for mapping_key, project in plan:
+                    mapping_value = project(sample_labels)
 
-                if '*' in label_mapping and '*' in label_mapping['*']:
-                    sample_labels.update(label_mapping['*']['*'])
-
-            # Match with single labels
-            matching_single_labels = singles.intersection(sample_labels_keys)
-            for label in matching_single_labels:
-                mapping_key = label
-                mapping_value = sample_labels[label]
-
-                active_label_mapping.setdefault(mapping_key, {})[mapping_value] = True
+                    active_values = active_label_mapping.get(mapping_key)
+                    if active_values is None:
+                        active_label_mapping[mapping_key] = {mapping_value}
+                    else:
+                        active_values.add(mapping_value)
 
-                if mapping_key in label_mapping and mapping_value in label_mapping[mapping_key]:
-                    sample_labels.update(label_mapping[mapping_key][mapping_value])
+                    mapping = label_mapping.get(mapping_key)
+                    if mapping is not None and mapping_value in mapping:
+                        sample_labels.update(mapping[mapping_value])
+                        chained = chained or mapping_key in chaining_joins
 
-            # Match with tuples of labels
-            for key, mapping_key in iteritems(keys):
-                if mapping_key in matching_single_labels:
-                    continue
+                if not chained:
+                    break
 
-                matching_labels = sets[key]
+                # The joined labels may complete the labels to match of other joins
+                if applied_joins is None:
+                    applied_joins = set()
+                applied_joins.update(mapping_key for mapping_key, _ in plan)
+                plan = [
+                    join
+                    for join in self._get_label_join_plan(tuple(sample_labels), watched)
+                    if join[0] != self.WILDCARD_LABEL_JOIN and join[0] not in applied_joins
+                ]
 
-                if matching_labels.issubset(sample_labels_keys):
-                    matching_values = [sample_labels[l] for l in matching_labels]
-                    mapping_value = ','.join(matching_values)
+    def _get_label_join_plan(self, label_names, watched):
+        """
+        Return the joins relevant to samples with the given label names, so that samples are only matched against
+        the joins whose labels they all have.
+        """
+        plans = watched['plans']
+        plan = plans.get(label_names)
+        if plan is None:
+            label_names_set = set(label_names)
+            plan = plans[label_names] = [
+                (mapping_key, project)
+                for mapping_key, project in watched['joins']
+                if mapping_key == self.WILDCARD_LABEL_JOIN or label_names_set.issuperset(mapping_key)
+            ]
 
-                    active_label_mapping.setdefault(mapping_key, {})[mapping_value] = True
+        return plan
 
-                    if mapping_key in label_mapping and mapping_value in label_mapping[mapping_key]:
-                        sample_labels.update(label_mapping[mapping_key][mapping_value])
+    def _get_label_projection(self, mapping_key):
+        """
+        Return a function making the tuple of the values of the labels to match from sample labels.
+        """
+        if mapping_key == self.WILDCARD_LABEL_JOIN:
+            return lambda labels: ()
+        elif len(mapping_key) == 1:
+            label_name = mapping_key[0]
+            return lambda labels: (labels[label_name],)
+        else:
+            return itemgetter(*mapping_key)
 
     def _ignore_metrics_by_label(self, scraper_config, metric_name, sample):
         ignore_metrics_by_label = scraper_config['ignore_metrics_by_labels']
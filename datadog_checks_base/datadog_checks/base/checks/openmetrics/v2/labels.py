@@ -1,6 +1,9 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+from operator import itemgetter
+from time import perf_counter
+
 from ....utils.functions import no_op
 
 
@@ -15,6 +18,8 @@ class LabelAggregator:
 
         self.cache_shared_labels = config.get('cache_shared_labels', True)
         self.shared_labels_cached = False
+        # Read the source metrics in a first pass over the payload rather than holding the metrics preceding them
+        self.prefetch_shared_labels = config.get('prefetch_shared_labels', False)
 
         self.metric_config = {}
         for metric, config in share_labels.items():
@@ -68,13 +73,26 @@ class LabelAggregator:
 
         self.logger = check.log
 
-        self.label_sets = []
+        # Shared labels indexed by the names of the labels to match, then by their values:
+        # {('namespace', 'pod'): {('default', 'foo'): [(position, shared_labels), ...]}}
+        self.label_sets = {}
+        self.label_set_count = 0
 
         self.unconditional_labels = {}
 
-    def __call__(self, metrics):
+        # Telemetry, reset by the scraper after every submission
+        self.index_build_time = 0.0
+        self.lookups = 0
+        self.hits = 0
+
+    def __call__(self, metrics, source_metrics=None):
         if self.cache_shared_labels:
             if self.shared_labels_cached:
+                yield from metrics
+            elif source_metrics is not None:
+                self.collect_sources(source_metrics)
+                self.shared_labels_cached = True
+
                 yield from metrics
             else:
                 metric_config = self.metric_config.copy()
@@ -88,27 +106,47 @@ class LabelAggregator:
                 self.shared_labels_cached = True
         else:
             try:
-                metric_config = self.metric_config.copy()
+                if source_metrics is None:
+                    metric_config = self.metric_config.copy()
 
-                # Cache every encountered metric until the desired labels have been collected
-                cached_metrics = []
+                    # Cache every encountered metric until the desired labels have been collected
+                    cached_metrics = []
 
-                for metric in metrics:
-                    if metric.name in metric_config:
-                        self.collect(metric, metric_config.pop(metric.name))
+                    for metric in metrics:
+                        if metric.name in metric_config:
+                            self.collect(metric, metric_config.pop(metric.name))
 
-                    cached_metrics.append(metric)
+                        cached_metrics.append(metric)
 
-                    if not metric_config:
-                        break
+                        if not metric_config:
+                            break
+
+                    yield from cached_metrics
+                else:
+                    self.collect_sources(source_metrics)
 
-                yield from cached_metrics
                 yield from metrics
             finally:
                 self.label_sets.clear()
+                self.label_set_count = 0
                 self.unconditional_labels.clear()
 
+    def collect_sources(self, source_metrics):
+        metric_config = self.metric_config.copy()
+
+        try:
+            for metric in source_metrics:
+                if metric.name in metric_config:
+                    self.collect(metric, metric_config.pop(metric.name))
+
+                    if not metric_config:
+                        break
+        finally:
+            # Stop reading the payload once every source metric has been collected
+            source_metrics.close()
+
     def collect(self, metric, config):
+        start_time = perf_counter()
         allowed_values = config.get('values')
 
         if 'match' in config:
@@ -126,7 +164,7 @@ class LabelAggregator:
                         if label in labels:
                             shared_labels[label] = value
 
-                    self.label_sets.append((label_set, shared_labels))
+                    self.index_label_set(label_set, shared_labels)
             else:
                 for sample in self.allowed_samples(metric, allowed_values):
                     label_set = set()
@@ -138,7 +176,7 @@ class LabelAggregator:
 
                         shared_labels[label] = value
 
-                    self.label_sets.append((label_set, shared_labels))
+                    self.index_label_set(label_set, shared_labels)
         else:
             if 'labels' in config:
                 labels = config['labels']
@@ -151,14 +189,35 @@ class LabelAggregator:
                     for label, value in sample.labels.items():
                         self.unconditional_labels[label] = value
 
+        self.index_build_time += perf_counter() - start_time
+
+    def index_label_set(self, label_set, shared_labels):
+        label_names, label_values = zip(*sorted(label_set)) if label_set else ((), ())
+        self.label_sets.setdefault(label_names, {}).setdefault(label_values, []).append(
+            (self.label_set_count, shared_labels)
+        )
+        self.label_set_count += 1
+
     def populate(self, labels):
-        label_set = frozenset(labels.items())
+        # Label values are strings so missing labels, projected as `None`, never match
+        matches = []
+        for label_names, label_sets in self.label_sets.items():
+            entries = label_sets.get(tuple(map(labels.get, label_names)))
+            if entries is not None:
+                matches.extend(entries)
+
         labels.update(self.unconditional_labels)
+        self.lookups += 1
+        if not matches:
+            return
+
+        self.hits += 1
+        if len(matches) > 1:
+            # Label sets collected last take precedence
+            matches.sort(key=itemgetter(0))
 
-        for matching_label_set, shared_labels in self.label_sets:
-            # Check for subset without incurring the cost of a `.issubset` lookup and call
-            if matching_label_set <= label_set:
-                labels.update(shared_labels)
+        for _, shared_labels in matches:
+            labels.update(shared_labels)
 
     @staticmethod
     def allowed_samples(metric, allowed_values):
@@ -0,0 +1,196 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import re
+
+from prometheus_client.metrics_core import Metric
+from prometheus_client.samples import Sample
+
+# Suffixes of the sample names that belong to a metric family of a given type, see:
+# https://github.com/prometheus/docs/blob/main/content/docs/instrumenting/exposition_formats.md
+FAMILY_SAMPLE_SUFFIXES = {
+    b'counter': (b'',),
+    b'gauge': (b'',),
+    b'summary': (b'_count', b'_sum', b''),
+    b'histogram': (b'_count', b'_sum', b'_bucket'),
+}
+
+LABEL_PATTERN = re.compile(r'\s*([^=,\s]+)\s*=\s*"([^"\\]*(?:\\.[^"\\]*)*)"')
+
+ESCAPE_SEQUENCES = {'\\\\': '\\', '\\n': '\n', '\\"': '"'}
+ESCAPING_PATTERN = re.compile(r'\\[\\n"]')
+HELP_ESCAPING_PATTERN = re.compile(r'\\[\\n]')
+
+
+def replace_escape_sequence(match):
+    return ESCAPE_SEQUENCES[match.group(0)]
+
+
+def parse_labels(labels_string):
+    labels = dict(LABEL_PATTERN.findall(labels_string))
+    if '\\' in labels_string:
+        for label, value in labels.items():
+            labels[label] = ESCAPING_PATTERN.sub(replace_escape_sequence, value)
+
+    return labels
+
+
+def parse_sample(line, label_start, name):
+    # If there are multiple values only consider the first, and the last as the timestamp
+    if label_start == -1:
+        values = line.split()[1:]
+        labels = {}
+    else:
+        label_end = line.rfind(b'}')
+        values = line[label_end + 1 :].split()
+        labels = parse_labels(line[label_start + 1 : label_end].decode('utf-8'))
+
+    # `float` accepts bytes so there is no need to decode the value
+    return Sample(name, labels, float(values[0]), float(values[-1]) / 1000 if len(values) > 1 else None)
+
+
+def get_sample_name(line):
+    label_start = line.find(b'{')
+    if label_start == -1:
+        return line.split(None, 1)[0], label_start
+
+    return line[:label_start].rstrip(), label_start
+
+
+def build_metric(name, documentation, metric_type, samples):
+    # Munge counters into the OpenMetrics representation used internally, like `prometheus_client` does
+    if metric_type == 'counter':
+        if name.endswith('_total'):
+            name = name[:-6]
+        else:
+            samples = [Sample(f'{sample.name}_total', *sample[1:]) for sample in samples]
+
+    documentation = HELP_ESCAPING_PATTERN.sub(replace_escape_sequence, documentation.decode('utf-8'))
+    metric = Metric(name, documentation, metric_type)
+    metric.samples = samples
+    return metric
+
+
+def get_family_name(name, metric_type):
+    if metric_type == 'counter' and name.endswith('_total'):
+        return name[:-6]
+
+    return name
+
+
+class StreamingTextParser:
+    """
+    A parser for the Prometheus text exposition format (version 0.0.4) that operates on lines of raw bytes.
+
+    The output is equivalent to that of `prometheus_client.parser.text_fd_to_metric_families` but nothing is
+    decoded until required. If a `family_filter` is provided, it is called once for every metric family with
+    the name of the family and every family for which it returns `True` is skipped without decoding any of its
+    samples. The number of samples skipped during the last parse is available as `skipped_samples`.
+    """
+
+    def __init__(self, family_filter=None):
+        self.family_filter = family_filter
+        self.skipped_samples = 0
+
+    def __call__(self, lines):
+        self.skipped_samples = 0
+        family_filter = self.family_filter
+
+        raw_name = b''
+        name = ''
+        documentation = b''
+        metric_type = 'untyped'
+        samples = []
+        allowed_names = ()
+
+        # Sample names are repeated often so only decode them once
+        sample_names = {}
+
+        # Whether or not to skip the current family, `None` means undecided
+        skip_family = None
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            elif line.startswith(b'#'):
+                parts = line.split(None, 3)
+                if len(parts) < 3:
+                    continue
+
+                token = parts[1]
+                if token == b'HELP':
+                    if parts[2] != raw_name:
+                        yield from self.finish_family(raw_name, name, documentation, metric_type, samples, skip_family)
+
+                        raw_name = parts[2]
+                        name = raw_name.decode('utf-8')
+                        metric_type = 'untyped'
+                        samples = []
+                        allowed_names = (raw_name,)
+                        skip_family = None
+
+                    documentation = parts[3] if len(parts) == 4 else b''
+                elif token == b'TYPE':
+                    if parts[2] != raw_name:
+                        yield from self.finish_family(raw_name, name, documentation, metric_type, samples, skip_family)
+
+                        raw_name = parts[2]
+                        name = raw_name.decode('utf-8')
+                        documentation = b''
+                        samples = []
+                        skip_family = None
+
+                    raw_type = parts[3] if len(parts) == 4 else b''
+                    metric_type = raw_type.decode('utf-8')
+                    allowed_names = tuple(raw_name + suffix for suffix in FAMILY_SAMPLE_SUFFIXES.get(raw_type, (b'',)))
+
+                continue
+
+            raw_sample_name, label_start = get_sample_name(line)
+            if raw_sample_name not in allowed_names:
+                yield from self.finish_family(raw_name, name, documentation, metric_type, samples, skip_family)
+
+                # New metric, yield immediately as an untyped singleton
+                raw_name = b''
+                name = ''
+                documentation = b''
+                metric_type = 'untyped'
+                samples = []
+                allowed_names = ()
+                skip_family = None
+
+                sample_name = raw_sample_name.decode('utf-8')
+                if family_filter is not None and family_filter(sample_name):
+                    self.skipped_samples += 1
+                else:
+                    yield build_metric(sample_name, b'', 'untyped', [parse_sample(line, label_start, sample_name)])
+
+                continue
+
+            if skip_family is None:
+                skip_family = self.skip_family(name, metric_type)
+
+            if skip_family:
+                self.skipped_samples += 1
+            else:
+                sample_name = sample_names.get(raw_sample_name)
+                if sample_name is None:
+                    sample_name = sample_names[raw_sample_name] = raw_sample_name.decode('utf-8')
+
+                samples.append(parse_sample(line, label_start, sample_name))
+
+        yield from self.finish_family(raw_name, name, documentation, metric_type, samples, skip_family)
+
+    def finish_family(self, raw_name, name, documentation, metric_type, samples, skip_family):
+        if not raw_name:
+            return
+
+        if skip_family is None:
+            skip_family = self.skip_family(name, metric_type)
+
+        if not skip_family:
+            yield build_metric(name, documentation, metric_type, samples)
+
+    def skip_family(self, name, metric_type):
+        return self.family_filter is not None and self.family_filter(get_family_name(name, metric_type))
@@ -0,0 +1,493 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+from struct import Struct
+
+from prometheus_client.metrics_core import Metric
+from prometheus_client.samples import Sample
+
+# https://github.com/prometheus/prometheus/blob/v2.43.0/scrape/scrape.go#L787
+PROTOBUF_ACCEPT_HEADER = 'application/vnd.google.protobuf;proto=io.prometheus.client.MetricFamily;encoding=delimited'
+PROTOBUF_MEDIA_TYPE = 'application/vnd.google.protobuf'
+
+# `MetricType` enum of https://github.com/prometheus/client_model/blob/v0.4.0/io/prometheus/client/metrics.proto
+METRIC_TYPES = ('counter', 'gauge', 'summary', 'untyped', 'histogram', 'gaugehistogram')
+
+# Wire types, see https://protobuf.dev/programming-guides/encoding/#structure
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+FIXED32 = 5
+
+# The field of the `Metric` message holding the value of every metric type
+METRIC_VALUE_FIELDS = {'gauge': 2, 'counter': 3, 'summary': 4, 'untyped': 5, 'histogram': 7, 'gaugehistogram': 7}
+
+DOUBLE = Struct('<d')
+INFINITY = float('inf')
+
+
+def decode_varint(buf, pos):
+    result = buf[pos]
+    pos += 1
+    if result < 0x80:
+        return result, pos
+
+    result &= 0x7F
+    shift = 7
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def decode_signed_varint(buf, pos):
+    # Negative `int64` values are encoded as their two's complement
+    value, pos = decode_varint(buf, pos)
+    if value >= 1 << 63:
+        value -= 1 << 64
+
+    return value, pos
+
+
+def decode_zigzag(value):
+    # `sint32` and `sint64` values
+    return (value >> 1) ^ -(value & 1)
+
+
+def skip_field(buf, pos, wire_type):
+    if wire_type == VARINT:
+        _, pos = decode_varint(buf, pos)
+        return pos
+    elif wire_type == FIXED64:
+        return pos + 8
+    elif wire_type == LENGTH_DELIMITED:
+        length, pos = decode_varint(buf, pos)
+        return pos + length
+    elif wire_type == FIXED32:
+        return pos + 4
+
+    raise ValueError(f'Unsupported protobuf wire type: {wire_type}')
+
+
+def iter_fields(buf, pos, end):
+    """
+    Yield the field number and wire type of every field of the message between `pos` and `end`, along with
+    the position of its value and the position after it. The values of length-delimited fields start after
+    their length.
+    """
+    while pos < end:
+        key, pos = decode_varint(buf, pos)
+        field_number = key >> 3
+        wire_type = key & 0x07
+        if wire_type == LENGTH_DELIMITED:
+            length, pos = decode_varint(buf, pos)
+            yield field_number, wire_type, pos, pos + length
+            pos += length
+        else:
+            value_end = skip_field(buf, pos, wire_type)
+            yield field_number, wire_type, pos, value_end
+            pos = value_end
+
+
+def decode_sint(buf, pos):
+    return decode_zigzag(decode_varint(buf, pos)[0])
+
+
+# Repeated scalar fields are either packed in a single length-delimited field or encoded one field at a time
+
+
+def decode_repeated_doubles(buf, pos, end, wire_type):
+    if wire_type == FIXED64:
+        return [DOUBLE.unpack_from(buf, pos)[0]]
+
+    return [value for (value,) in DOUBLE.iter_unpack(buf[pos:end])]
+
+
+def decode_repeated_sints(buf, pos, end, wire_type):
+    if wire_type == VARINT:
+        return [decode_sint(buf, pos)]
+
+    values = []
+    while pos < end:
+        value, pos = decode_varint(buf, pos)
+        values.append(decode_zigzag(value))
+
+    return values
+
+
+def decode_value(buf, pos, end):
+    # `Gauge`, `Counter` and `Untyped` messages, which usually only have a value
+    if end - pos == 9 and buf[pos] == 0x09:
+        return DOUBLE.unpack_from(buf, pos + 1)[0]
+
+    value = 0.0
+    for field_number, wire_type, value_pos, _ in iter_fields(buf, pos, end):
+        if field_number == 1 and wire_type == FIXED64:
+            value = DOUBLE.unpack_from(buf, value_pos)[0]
+
+    return value
+
+
+def decode_bucket_span(buf, pos, end):
+    offset = length = 0
+    for field_number, wire_type, value_pos, _ in iter_fields(buf, pos, end):
+        if field_number == 1 and wire_type == VARINT:
+            offset = decode_sint(buf, value_pos)
+        elif field_number == 2 and wire_type == VARINT:
+            length = decode_varint(buf, value_pos)[0]
+
+    return offset, length
+
+
+def format_float(value):
+    # Bucket bounds and quantiles are labels in the text format, they are formatted like the Go client formats them
+    # so that the tags are the same whichever format is used, see:
+    # https://github.com/prometheus/common/blob/v0.42.0/expfmt/text_create.go#L448-L465
+    if value.is_integer() and abs(value) < 1e21:
+        return str(int(value))
+    elif value == INFINITY:
+        return '+Inf'
+    elif value == -INFINITY:
+        return '-Inf'
+    elif value != value:
+        return 'NaN'
+
+    return repr(value)
+
+
+def get_native_bucket_bound(schema, index):
+    # https://github.com/prometheus/prometheus/blob/v2.43.0/model/histogram/generic.go#L127-L131
+    return 2.0 ** (index * 2**-schema)
+
+
+def iter_native_buckets(spans, deltas, counts):
+    """
+    Yield the index and the count of every bucket of one side of a native histogram. The counts are either
+    absolute for float histograms, or deltas from the count of the previous bucket for integer histograms.
+    """
+    index = 0
+    position = 0
+    count = 0
+    for offset, length in spans:
+        # The offset of the first span is the index of its first bucket, the others start after a gap
+        index += offset
+        for _ in range(length):
+            if counts:
+                count = counts[position]
+            else:
+                count += deltas[position]
+
+            yield index, count
+            position += 1
+            index += 1
+
+
+def get_native_histogram_buckets(schema, zero_threshold, zero_count, negative_buckets, positive_buckets):
+    """
+    Convert the exponential buckets of a native histogram into cumulative buckets with explicit upper bounds, from
+    the most negative bucket to the most positive one. When buckets are not contiguous, an empty bucket is added
+    so that the lower bound of the next bucket is preserved.
+    """
+    buckets = []
+    cumulative_count = 0
+    previous_upper_bound = None
+
+    for lower_bound, upper_bound, count in chain_native_buckets(
+        schema, zero_threshold, zero_count, negative_buckets, positive_buckets
+    ):
+        if previous_upper_bound is not None and lower_bound != previous_upper_bound:
+            buckets.append((lower_bound, cumulative_count))
+
+        cumulative_count += count
+        buckets.append((upper_bound, cumulative_count))
+        previous_upper_bound = upper_bound
+
+    return buckets
+
+
+def chain_native_buckets(schema, zero_threshold, zero_count, negative_buckets, positive_buckets):
+    for index, count in reversed(negative_buckets):
+        yield -get_native_bucket_bound(schema, index), -get_native_bucket_bound(schema, index - 1), count
+
+    if zero_threshold or zero_count:
+        yield -zero_threshold, zero_threshold, zero_count
+
+    for index, count in positive_buckets:
+        yield get_native_bucket_bound(schema, index - 1), get_native_bucket_bound(schema, index), count
+
+
+class ProtobufParser:
+    """
+    A parser for the delimited protobuf exposition format that operates on chunks of raw bytes, see:
+    https://github.com/prometheus/docs/blob/main/content/docs/instrumenting/exposition_formats.md#protobuf-format
+
+    The output is equivalent to that of `prometheus_client.parser.text_fd_to_metric_families` for the same metrics
+    exposed in the text format. Native histograms are converted into histograms with cumulative buckets unless the
+    histogram also has classic buckets, which are then used instead. If a `family_filter` is provided, it is called
+    once for every metric family with the name of the family and every family for which it returns `True` is
+    skipped without decoding any of its metrics. The number of metrics skipped during the last parse is available
+    as `skipped_samples`.
+    """
+
+    def __init__(self, family_filter=None):
+        self.family_filter = family_filter
+        self.skipped_samples = 0
+
+        # Labels are repeated often so only decode them once per parse
+        self._label_pairs = {}
+
+    def __call__(self, chunks):
+        self.skipped_samples = 0
+
+        try:
+            for buf, pos, end in self.iter_messages(chunks):
+                yield from self.parse_metric_family(buf, pos, end)
+        finally:
+            self._label_pairs.clear()
+
+    @staticmethod
+    def iter_messages(chunks):
+        """
+        Yield the buffer and the boundaries of every `MetricFamily` message, each prefixed by its length.
+        """
+        buf = b''
+        pos = 0
+
+        # Chunks are only joined once enough of them were read to complete the next message
+        pending_chunks = []
+        pending_size = 0
+        missing_size = 0
+        for chunk in chunks:
+            pending_chunks.append(chunk)
+            pending_size += len(chunk)
+            if pending_size < missing_size:
+                continue
+
+            buf = b''.join([buf[pos:], *pending_chunks])
+            pos = 0
+            end = len(buf)
+            pending_chunks.clear()
+            pending_size = 0
+            missing_size = 0
+
+            while pos < end:
+                try:
+                    length, message_start = decode_varint(buf, pos)
+                except IndexError:
+                    # The length prefix itself is incomplete
+                    break
+
+                message_end = message_start + length
+                if message_end > end:
+                    missing_size = message_end - end
+                    break
+
+                yield buf, message_start, message_end
+                pos = message_end
+
+        trailing_size = len(buf) - pos + pending_size
+        if trailing_size:
+            raise ValueError(f'Truncated protobuf message: {trailing_size} trailing bytes')
+
+    def parse_metric_family(self, buf, pos, end):
+        name = ''
+        documentation = ''
+        metric_type = 'counter'
+        metrics = []
+        for field_number, wire_type, value_pos, value_end in iter_fields(buf, pos, end):
+            if field_number == 4 and wire_type == LENGTH_DELIMITED:
+                metrics.append((value_pos, value_end))
+            elif field_number == 1 and wire_type == LENGTH_DELIMITED:
+                name = buf[value_pos:value_end].decode('utf-8')
+            elif field_number == 2 and wire_type == LENGTH_DELIMITED:
+                documentation = buf[value_pos:value_end].decode('utf-8')
+            elif field_number == 3 and wire_type == VARINT:
+                type_number = decode_varint(buf, value_pos)[0]
+                metric_type = METRIC_TYPES[type_number] if type_number < len(METRIC_TYPES) else 'unknown'
+
+        if metric_type == 'counter' and name.endswith('_total'):
+            family_name = name[:-6]
+        else:
+            family_name = name
+
+        if self.family_filter is not None and self.family_filter(family_name):
+            self.skipped_samples += len(metrics)
+            return
+
+        # Munge counters into the OpenMetrics representation used internally, like `prometheus_client` does
+        if metric_type == 'counter':
+            name = family_name
+
+        samples = []
+        for metric_pos, metric_end in metrics:
+            self.parse_metric(buf, metric_pos, metric_end, name, metric_type, samples)
+
+        metric = Metric(name, documentation, metric_type)
+        metric.samples = samples
+        yield metric
+
+    def parse_metric(self, buf, pos, end, name, metric_type, samples):
+        # This is the hot path so the fields of `Metric` messages are iterated inline, all of them have a number
+        # lower than 16 so their key is a single byte
+        labels = {}
+        label_pairs = self._label_pairs
+        timestamp = None
+        value_field = METRIC_VALUE_FIELDS.get(metric_type)
+        value_pos = value_end = None
+        while pos < end:
+            key = buf[pos]
+            pos += 1
+            if key & 0x07 != LENGTH_DELIMITED:
+                if key == 0x30:
+                    timestamp = decode_signed_varint(buf, pos)[0] / 1000
+
+                pos = skip_field(buf, pos, key & 0x07)
+                continue
+
+            length = buf[pos]
+            if length < 0x80:
+                pos += 1
+            else:
+                length, pos = decode_varint(buf, pos)
+
+            field_end = pos + length
+            field_number = key >> 3
+            if field_number == 1:
+                raw_label_pair = buf[pos:field_end]
+                label_pair = label_pairs.get(raw_label_pair)
+                if label_pair is None:
+                    label_pair = label_pairs[raw_label_pair] = self.parse_label_pair(buf, pos, field_end)
+
+                labels[label_pair[0]] = label_pair[1]
+            elif field_number == value_field:
+                value_pos = pos
+                value_end = field_end
+
+            pos = field_end
+
+        if value_pos is None:
+            return
+
+        if metric_type == 'counter':
+            samples.append(Sample(f'{name}_total', labels, decode_value(buf, value_pos, value_end), timestamp))
+        elif metric_type in ('histogram', 'gaugehistogram'):
+            self.parse_histogram(buf, value_pos, value_end, name, metric_type, labels, timestamp, samples)
+        elif metric_type == 'summary':
+            self.parse_summary(buf, value_pos, value_end, name, labels, timestamp, samples)
+        else:
+            samples.append(Sample(name, labels, decode_value(buf, value_pos, value_end), timestamp))
+
+    @staticmethod
+    def parse_label_pair(buf, pos, end):
+        label_name = ''
+        label_value = ''
+        for field_number, wire_type, value_pos, value_end in iter_fields(buf, pos, end):
+            if field_number == 1 and wire_type == LENGTH_DELIMITED:
+                label_name = buf[value_pos:value_end].decode('utf-8')
+            elif field_number == 2 and wire_type == LENGTH_DELIMITED:
+                label_value = buf[value_pos:value_end].decode('utf-8')
+
+        return label_name, label_value
+
+    @staticmethod
+    def parse_summary(buf, pos, end, name, labels, timestamp, samples):
+        sample_count = 0
+        sample_sum = 0.0
+        for field_number, wire_type, value_pos, value_end in iter_fields(buf, pos, end):
+            if field_number == 3 and wire_type == LENGTH_DELIMITED:
+                quantile = value = 0.0
+                for quantile_field_number, quantile_wire_type, quantile_pos, _ in iter_fields(
+                    buf, value_pos, value_end
+                ):
+                    if quantile_wire_type != FIXED64:
+                        continue
+                    elif quantile_field_number == 1:
+                        quantile = DOUBLE.unpack_from(buf, quantile_pos)[0]
+                    elif quantile_field_number == 2:
+                        value = DOUBLE.unpack_from(buf, quantile_pos)[0]
+
+                samples.append(Sample(name, {**labels, 'quantile': format_float(quantile)}, value, timestamp))
+            elif field_number == 1 and wire_type == VARINT:
+                sample_count = decode_varint(buf, value_pos)[0]
+            elif field_number == 2 and wire_type == FIXED64:
+                sample_sum = DOUBLE.unpack_from(buf, value_pos)[0]
+
+        samples.append(Sample(f'{name}_sum', labels, sample_sum, timestamp))
+        samples.append(Sample(f'{name}_count', labels, float(sample_count), timestamp))
+
+    @staticmethod
+    def parse_histogram(buf, pos, end, name, metric_type, labels, timestamp, samples):
+        sample_count = 0.0
+        sample_sum = 0.0
+        buckets = []
+
+        schema = 0
+        zero_threshold = 0.0
+        zero_count = 0.0
+        spans = {9: [], 12: []}
+        deltas = {10: [], 13: []}
+        counts = {11: [], 14: []}
+
+        for field_number, wire_type, value_pos, value_end in iter_fields(buf, pos, end):
+            if field_number == 3 and wire_type == LENGTH_DELIMITED:
+                upper_bound = 0.0
+                cumulative_count = 0.0
+                for bucket_field_number, bucket_wire_type, bucket_pos, _ in iter_fields(buf, value_pos, value_end):
+                    if bucket_field_number == 1 and bucket_wire_type == VARINT:
+                        cumulative_count = float(decode_varint(buf, bucket_pos)[0])
+                    elif bucket_field_number == 4 and bucket_wire_type == FIXED64:
+                        cumulative_count = DOUBLE.unpack_from(buf, bucket_pos)[0]
+                    elif bucket_field_number == 2 and bucket_wire_type == FIXED64:
+                        upper_bound = DOUBLE.unpack_from(buf, bucket_pos)[0]
+
+                buckets.append((upper_bound, cumulative_count))
+            elif field_number in deltas:
+                deltas[field_number].extend(decode_repeated_sints(buf, value_pos, value_end, wire_type))
+            elif field_number in counts:
+                counts[field_number].extend(decode_repeated_doubles(buf, value_pos, value_end, wire_type))
+            elif field_number in spans and wire_type == LENGTH_DELIMITED:
+                spans[field_number].append(decode_bucket_span(buf, value_pos, value_end))
+            elif field_number == 1 and wire_type == VARINT:
+                sample_count = float(decode_varint(buf, value_pos)[0])
+            elif field_number == 4 and wire_type == FIXED64:
+                sample_count = DOUBLE.unpack_from(buf, value_pos)[0]
+            elif field_number == 2 and wire_type == FIXED64:
+                sample_sum = DOUBLE.unpack_from(buf, value_pos)[0]
+            elif field_number == 5 and wire_type == VARINT:
+                schema = decode_sint(buf, value_pos)
+            elif field_number == 6 and wire_type == FIXED64:
+                zero_threshold = DOUBLE.unpack_from(buf, value_pos)[0]
+            elif field_number == 7 and wire_type == VARINT:
+                zero_count = float(decode_varint(buf, value_pos)[0])
+            elif field_number == 8 and wire_type == FIXED64:
+                zero_count = DOUBLE.unpack_from(buf, value_pos)[0]
+
+        # Classic buckets are preferred when a histogram is exposed both ways, as their bounds are set by users
+        if not buckets and (spans[9] or spans[12] or zero_threshold or zero_count):
+            buckets = get_native_histogram_buckets(
+                schema,
+                zero_threshold,
+                zero_count,
+                list(iter_native_buckets(spans[9], deltas[10], counts[11])),
+                list(iter_native_buckets(spans[12], deltas[13], counts[14])),
+            )
+
+        # The bucket with an infinite upper bound is implicit
+        if not buckets or buckets[-1][0] != INFINITY:
+            buckets.append((INFINITY, sample_count))
+
+        bucket_name = f'{name}_bucket'
+        for upper_bound, cumulative_count in buckets:
+            samples.append(
+                Sample(bucket_name, {**labels, 'le': format_float(upper_bound)}, cumulative_count, timestamp)
+            )
+
+        if metric_type == 'gaugehistogram':
+            samples.append(Sample(f'{name}_gsum', labels, sample_sum, timestamp))
+            samples.append(Sample(f'{name}_gcount', labels, sample_count, timestamp))
+        else:
+            samples.append(Sample(f'{name}_sum', labels, sample_sum, timestamp))
+            samples.append(Sample(f'{name}_count', labels, sample_count, timestamp))
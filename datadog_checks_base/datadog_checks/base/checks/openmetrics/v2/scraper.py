@@ -19,6 +19,8 @@ from ....utils.functions import no_op, return_true
 from ....utils.http import RequestsWrapper
 from .first_scrape_handler import first_scrape_handler
 from .labels import LabelAggregator, get_label_normalizer
+from .parser import StreamingTextParser
+from .protobuf import PROTOBUF_ACCEPT_HEADER, PROTOBUF_MEDIA_TYPE, ProtobufParser
 from .transform import MetricTransformer
 
 try:
@@ -27,6 +29,11 @@ except ImportError:
     from datadog_checks.base.stubs import datadog_agent
 
 
+def parse_openmetrics_bytes(lines):
+    # The OpenMetrics parser only operates on text
+    return parse_openmetrics(line.decode('utf-8') for line in lines)
+
+
 class OpenMetricsScraper:
     """
     OpenMetricsScraper is a class that can be used to override the default scraping behavior for OpenMetricsBaseCheckV2.
@@ -204,6 +211,11 @@ class OpenMetricsScraper:
         # These will be applied to everything except service checks
         self.tags = self.static_tags
 
+        # Parse the raw bytes of the response directly and skip unwanted metric families without decoding them
+        self.use_streaming_parser = is_affirmative(config.get('use_streaming_parser', False))
+        self.streaming_parser = StreamingTextParser(self.skip_metric_family)
+        self.protobuf_parser = ProtobufParser(self.skip_metric_family)
+
         self.raw_line_filter = None
         raw_line_filters = config.get('raw_line_filters', [])
         if not isinstance(raw_line_filters, list):
@@ -213,16 +225,29 @@ class OpenMetricsScraper:
                 if not isinstance(entry, str):
                     raise ConfigurationError(f'Entry #{i} of setting `raw_line_filters` must be a string')
 
-            self.raw_line_filter = re.compile('|'.join(raw_line_filters))
+            raw_line_filter = '|'.join(raw_line_filters)
+            if self.use_streaming_parser:
+                self.raw_line_filter = re.compile(raw_line_filter.encode('utf-8'))
+            else:
+                self.raw_line_filter = re.compile(raw_line_filter)
 
         self.http = RequestsWrapper(config, self.check.init_config, self.check.HTTP_CONFIG_REMAPPER, self.check.log)
 
         self._content_type = ''
         self._use_latest_spec = is_affirmative(config.get('use_latest_spec', False))
+        self._use_protobuf = is_affirmative(config.get('use_protobuf', False))
+        if self._use_latest_spec and self._use_protobuf:
+            raise ConfigurationError('Settings `use_latest_spec` and `use_protobuf` are mutually exclusive')
+
         # Accept headers are taken from:
         # https://github.com/prometheus/prometheus/blob/v2.43.0/scrape/scrape.go#L787
         if self._use_latest_spec:
             accept_header = 'application/openmetrics-text;version=1.0.0,application/openmetrics-text;version=0.0.1'
+        elif self._use_protobuf:
+            accept_header = (
+                f'{PROTOBUF_ACCEPT_HEADER},application/openmetrics-text;version=1.0.0;q=0.8,'
+                'application/openmetrics-text;version=0.0.1;q=0.75,text/plain;version=0.0.4;q=0.5,*/*;q=0.1'
+            )
         else:
             accept_header = (
                 'application/openmetrics-text;version=1.0.0,application/openmetrics-text;version=0.0.1;q=0.75,'
@@ -262,7 +287,10 @@ class OpenMetricsScraper:
         if not self.flush_first_value and self.use_process_start_time:
             metric_parser = first_scrape_handler(metric_parser, runtime_data, datadog_agent.get_process_start_time())
         if self.label_aggregator.configured:
-            metric_parser = self.label_aggregator(metric_parser)
+            if self.label_aggregator.prefetch_shared_labels:
+                metric_parser = self.label_aggregator(metric_parser, self.parse_shared_label_sources())
+            else:
+                metric_parser = self.label_aggregator(metric_parser)
 
         for metric in metric_parser:
             if metric.name in self.exclude_metrics or (
@@ -273,14 +301,15 @@ class OpenMetricsScraper:
 
             yield metric
 
+        if self.label_aggregator.configured:
+            self.submit_telemetry_shared_labels(self.label_aggregator)
+
     def parse_metrics(self):
         """
         Get the line streamer and yield processed metrics.
         """
 
         line_streamer = self.stream_connection_lines()
-        if self.raw_line_filter is not None:
-            line_streamer = self.filter_connection_lines(line_streamer)
 
         # Since we determine `self.parse_metric_families` dynamically from the response and that's done as a
         # side effect inside the `line_streamer` generator, we need to consume the first line in order to
@@ -291,7 +320,13 @@ class OpenMetricsScraper:
             # If line_streamer is an empty iterator, next(line_streamer) fails.
             return
 
-        for metric in self.parse_metric_families(line_streamer):
+        parse_metric_families = self.parse_metric_families
+
+        # The protobuf format is binary so there are no lines to filter
+        if self.raw_line_filter is not None and parse_metric_families is not self.protobuf_parser:
+            line_streamer = self.filter_connection_lines(line_streamer)
+
+        for metric in parse_metric_families(line_streamer):
             self.submit_telemetry_number_of_total_metric_samples(metric)
 
             # It is critical that the prefix is removed immediately so that
@@ -301,18 +336,96 @@ class OpenMetricsScraper:
 
             yield metric
 
+        if parse_metric_families is self.streaming_parser or parse_metric_families is self.protobuf_parser:
+            self.submit_telemetry_number_of_skipped_metric_samples(parse_metric_families.skipped_samples)
+
+    def parse_shared_label_sources(self):
+        """
+        Yield only the metrics from which labels are shared, ignoring the lines of every other metric.
+        """
+
+        line_streamer = self.stream_connection_lines()
+
+        # The media type of the response is only known once the first line is read
+        try:
+            line_streamer = chain([next(line_streamer)], line_streamer)
+        except StopIteration:
+            return
+
+        parse_metric_families = self.parse_metric_families
+        if parse_metric_families is self.protobuf_parser:
+            # Metric families are skipped as a whole rather than line by line
+            metric_config = self.label_aggregator.metric_config
+            raw_metric_prefix = self.raw_metric_prefix
+
+            def skip_metric_family(metric_name):
+                if raw_metric_prefix and metric_name.startswith(raw_metric_prefix):
+                    metric_name = metric_name[len(raw_metric_prefix) :]
+
+                return metric_name not in metric_config
+
+            parse_metric_families = ProtobufParser(skip_metric_family)
+        else:
+            line_prefixes = ['# EOF']
+            for metric_name in self.label_aggregator.metric_config:
+                raw_metric_name = f'{self.raw_metric_prefix}{metric_name}'
+                line_prefixes.extend((raw_metric_name, f'# HELP {raw_metric_name}', f'# TYPE {raw_metric_name}'))
+
+            line_prefixes = tuple(line_prefixes)
+            if self.use_streaming_parser:
+                line_prefixes = tuple(prefix.encode('utf-8') for prefix in line_prefixes)
+
+            if self.raw_line_filter is not None:
+                line_streamer = (line for line in line_streamer if not self.raw_line_filter.search(line))
+
+            line_streamer = (line for line in line_streamer if line.startswith(line_prefixes))
+
+        for metric in parse_metric_families(line_streamer):
+            if self.raw_metric_prefix and metric.name.startswith(self.raw_metric_prefix):
+                metric.name = metric.name[len(self.raw_metric_prefix) :]
+
+            yield metric
+
     @property
     def parse_metric_families(self):
-        media_type = self._content_type.split(';')[0]
+        media_type = self._content_type.split(';')[0].strip()
         # Setting `use_latest_spec` forces the use of the OpenMetrics format, otherwise
         # the format will be chosen based on the media type specified in the response's content-header.
         # The selection is based on what Prometheus does:
         # https://github.com/prometheus/prometheus/blob/v2.43.0/model/textparse/interface.go#L83-L90
-        return (
-            parse_openmetrics
-            if self._use_latest_spec or media_type == 'application/openmetrics-text'
-            else parse_prometheus
+        if media_type == PROTOBUF_MEDIA_TYPE:
+            return self.protobuf_parser
+        elif self._use_latest_spec or media_type == 'application/openmetrics-text':
+            if self.use_streaming_parser:
+                return parse_openmetrics_bytes
+
+            return parse_openmetrics
+        elif self.use_streaming_parser:
+            return self.streaming_parser
+        else:
+            return parse_prometheus
+
+    def skip_metric_family(self, metric_name):
+        """
+        Whether or not an entire metric family can be skipped by the streaming parser before its samples are decoded.
+        """
+
+        if self.raw_metric_prefix and metric_name.startswith(self.raw_metric_prefix):
+            metric_name = metric_name[len(self.raw_metric_prefix) :]
+
+        excluded = metric_name in self.exclude_metrics or (
+            self.exclude_metrics_pattern is not None and self.exclude_metrics_pattern.search(metric_name)
         )
+        if not excluded and self.metric_transformer.has_transformer(metric_name):
+            return False
+
+        # Metrics that are excluded or not collected may still be required for other features
+        if self.label_aggregator.configured and metric_name in self.label_aggregator.metric_config:
+            return False
+        elif self.use_process_start_time and metric_name == 'process_start_time_seconds':
+            return False
+
+        return True
 
     def generate_sample_data(self, metric):
         """
@@ -368,7 +481,12 @@ class OpenMetricsScraper:
         with self.get_connection() as connection:
             # Media type will be used to select parser dynamically
             self._content_type = connection.headers.get('Content-Type', '')
-            for line in connection.iter_lines(decode_unicode=True):
+            if self.parse_metric_families is self.protobuf_parser:
+                # The protobuf format is binary so it is read in chunks rather than lines
+                yield from connection.iter_content()
+                return
+
+            for line in connection.iter_lines(decode_unicode=not self.use_streaming_parser):
                 yield line
 
     def filter_connection_lines(self, line_streamer):
@@ -439,12 +557,27 @@ class OpenMetricsScraper:
     def submit_telemetry_number_of_ignored_metric_samples(self, metric):
         self.count('telemetry.metrics.ignored.count', len(metric.samples), tags=self.tags)
 
+    def submit_telemetry_number_of_skipped_metric_samples(self, count):
+        if count:
+            self.count('telemetry.metrics.input.count', count, tags=self.tags)
+            self.count('telemetry.metrics.ignored.count', count, tags=self.tags)
+
     def submit_telemetry_number_of_processed_metric_samples(self):
         self.count('telemetry.metrics.processed.count', 1, tags=self.tags)
 
     def submit_telemetry_number_of_ignored_lines(self):
         self.count('telemetry.metrics.blacklist.count', 1, tags=self.tags)
 
+    def submit_telemetry_shared_labels(self, label_aggregator):
+        if label_aggregator.index_build_time:
+            self.gauge('telemetry.shared_labels.index.build_time', label_aggregator.index_build_time, tags=self.tags)
+        self.count('telemetry.shared_labels.lookups.count', label_aggregator.lookups, tags=self.tags)
+        self.count('telemetry.shared_labels.hits.count', label_aggregator.hits, tags=self.tags)
+
+        label_aggregator.index_build_time = 0.0
+        label_aggregator.lookups = 0
+        label_aggregator.hits = 0
+
     def submit_telemetry_endpoint_response_size(self, response):
         content_length = response.headers.get('Content-Length')
         if content_length is not None:
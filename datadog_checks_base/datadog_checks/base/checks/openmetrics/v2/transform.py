@@ -55,6 +55,9 @@ class MetricTransformer:
                     error = f'Error compiling transformer for metric `{raw_metric_name}`: {e}'
                     raise_from(type(e)(error), None)
 
+        # Whether or not a metric name is defined, regardless of its type
+        self.defined_metrics = {}
+
     def get(self, metric):
         metric_name = metric.name
 
@@ -79,10 +82,20 @@ class MetricTransformer:
 
         self.logger.debug('Skipping metric `%s` as it is not defined in `metrics`', metric_name)
 
+    def has_transformer(self, metric_name):
+        defined = self.defined_metrics.get(metric_name)
+        if defined is None:
+            defined = self.defined_metrics[metric_name] = metric_name in self.transformer_data or any(
+                metric_pattern.search(metric_name) for metric_pattern, _ in self.metric_patterns
+            )
+
+        return defined
+
     def add_custom_transformer(self, name, transformer, pattern=False):
         if not pattern:
             name = '^{}$'.format(name)
         self.metric_patterns.append((re.compile(name), {'__transformer__': transformer}))
+        self.defined_metrics.clear()
 
     def compile_transformer(self, config):
         custom_transformer = config.pop('__transformer__', None)
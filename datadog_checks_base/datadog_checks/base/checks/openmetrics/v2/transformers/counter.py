@@ -8,21 +8,27 @@ def get_counter(check, metric_name, modifiers, global_options):
     https://prometheus.io/docs/concepts/metric_types/#counter
     https://github.com/OpenObservability/OpenMetrics/blob/master/specification/OpenMetrics.md#counter-1
     """
-    monotonic_count_method = check.monotonic_count
+    submit_metrics_batch = check.submit_metrics_batch
     metric_name = f'{metric_name}.count'
 
     def counter(metric, sample_data, runtime_data):
-        flush_first_value = runtime_data['flush_first_value']
-
+        values = []
+        tags_list = []
+        hostnames = []
         for sample, tags, hostname in sample_data:
             if sample.name.endswith('_total'):
-                monotonic_count_method(
-                    metric_name,
-                    sample.value,
-                    tags=tags,
-                    hostname=hostname,
-                    flush_first_value=flush_first_value,
-                )
+                values.append(sample.value)
+                tags_list.append(tags)
+                hostnames.append(hostname)
+
+        submit_metrics_batch(
+            'monotonic_count',
+            metric_name,
+            values,
+            tags_list,
+            hostnames,
+            flush_first_value=runtime_data['flush_first_value'],
+        )
 
     del check
     del modifiers
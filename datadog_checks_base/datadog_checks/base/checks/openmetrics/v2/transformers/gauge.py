@@ -8,11 +8,18 @@ def get_gauge(check, metric_name, modifiers, global_options):
     https://prometheus.io/docs/concepts/metric_types/#gauge
     https://github.com/OpenObservability/OpenMetrics/blob/master/specification/OpenMetrics.md#gauge-1
     """
-    gauge_method = check.gauge
+    submit_metrics_batch = check.submit_metrics_batch
 
     def gauge(metric, sample_data, runtime_data):
+        values = []
+        tags_list = []
+        hostnames = []
         for sample, tags, hostname in sample_data:
-            gauge_method(metric_name, sample.value, tags=tags, hostname=hostname)
+            values.append(sample.value)
+            tags_list.append(tags)
+            hostnames.append(hostname)
+
+        submit_metrics_batch('gauge', metric_name, values, tags_list, hostnames)
 
     del check
     del modifiers
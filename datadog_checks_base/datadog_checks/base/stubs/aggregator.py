@@ -107,7 +107,8 @@ class AggregatorStub(object):
     def submit_metric(self, check, check_id, mtype, name, value, tags, hostname, flush_first_value):
         check_tag_names(name, tags)
         if not self.ignore_metric(name):
-            self._metrics[name].append(MetricStub(name, mtype, value, tags, hostname, None, flush_first_value))
+            # Like the Agent, keep a copy of the tags as checks may share the same sequence between submissions
+            self._metrics[name].append(MetricStub(name, mtype, value, list(tags), hostname, None, flush_first_value))
 
     def submit_metric_e2e(
         self, check, check_id, mtype, name, value, tags, hostname, device=None, flush_first_value=False
@@ -122,7 +123,7 @@ class AggregatorStub(object):
             raise Exception("Expected empty message on OK service check")
 
         check_tag_names(name, tags)
-        self._service_checks[name].append(ServiceCheckStub(check_id, name, status, tags, hostname, message))
+        self._service_checks[name].append(ServiceCheckStub(check_id, name, status, list(tags), hostname, message))
 
     def submit_event(self, check, check_id, event):
         self._events.append(event)
@@ -145,7 +146,9 @@ class AggregatorStub(object):
     ):
         check_tag_names(name, tags)
         self._histogram_buckets[name].append(
-            HistogramBucketStub(name, value, lower_bound, upper_bound, monotonic, hostname, tags, flush_first_value)
+            HistogramBucketStub(
+                name, value, lower_bound, upper_bound, monotonic, hostname, list(tags), flush_first_value
+            )
         )
 
     def metrics(self, name):
@@ -2,10 +2,12 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import logging
+from functools import partial
 from itertools import chain
-from typing import Any, Callable, Dict, List, Tuple  # noqa: F401
+from typing import Any, Callable, Dict, Iterable, List, Tuple  # noqa: F401
 
 from datadog_checks.base import AgentCheck  # noqa: F401
+from datadog_checks.base.checks.base import BATCH_METRIC_TYPES
 from datadog_checks.base.utils.db.types import QueriesExecutor, QueriesSubmitter, Transformer  # noqa: F401
 
 from ...config import is_affirmative
@@ -31,6 +33,7 @@ class QueryExecutor(object):
         error_handler=None,  # type: Callable[[str], str]
         hostname=None,  # type: str
         logger=None,
+        columnar=False,  # type: bool
     ):  # type: (...) -> QueryExecutor
         self.executor = executor  # type: QueriesExecutor
         self.submitter = submitter  # type: QueriesSubmitter
@@ -46,14 +49,24 @@ class QueryExecutor(object):
         self.hostname = hostname  # type: str
         self.logger = logger or logging.getLogger(__name__)
 
+        # Whether to process result sets column by column rather than row by row
+        self.columnar = columnar  # type: bool
+
     def compile_queries(self):
         """This method compiles every `Query` object."""
         column_transformers = COLUMN_TRANSFORMERS.copy()  # type: Dict[str, Transformer]
 
+        batch_submit_method = getattr(self.submitter, 'submit_metrics_batch', None) if self.columnar else None
+
         for submission_method, transformer_name in SUBMISSION_METHODS.items():
             method = getattr(self.submitter, submission_method)
+            if batch_submit_method is not None and submission_method in BATCH_METRIC_TYPES:
+                batch_method = partial(batch_submit_method, submission_method)
+            else:
+                batch_method = None
+
             # Save each method in the initializer -> callable format
-            column_transformers[transformer_name] = create_submission_transformer(method)
+            column_transformers[transformer_name] = create_submission_transformer(method, batch_method)
 
         for query in self.queries:
             query.compile(column_transformers, EXTRA_TRANSFORMERS.copy())
@@ -81,6 +94,10 @@ class QueryExecutor(object):
 
                 continue
 
+            if self.columnar:
+                self._execute_columnar(query, rows, global_tags)
+                continue
+
             for row in rows:
                 if not self._is_row_valid(query, row):
                     continue
@@ -123,6 +140,86 @@ class QueryExecutor(object):
                         if result is not None:
                             sources[name] = result
 
+    def _execute_columnar(self, query, rows, global_tags):
+        # type: (Query, Iterable[List], List[str]) -> None
+        rows = [row for row in rows if self._is_row_valid(query, row)]
+        if not rows:
+            return
+
+        query_tags = global_tags + query.base_tags
+        tags_list = [list(query_tags) for _ in rows]
+
+        # Columns whose values can be submitted at once, grouped by batch submission method
+        batch_columns = {}  # type: Dict[Tuple[Callable, bool], List[Tuple[int, str]]]
+        # Columns whose transformer must be called for every row along with the row's values
+        row_submissions = []  # type: List[Tuple[int, Transformer]]
+
+        for index, ((column_name, type_transformer), column_values) in enumerate(
+            zip(query.column_transformers, zip(*rows))
+        ):
+            # Columns can be ignored via configuration
+            if not column_name:
+                continue
+
+            column_type, transformer = type_transformer
+            if transformer is None:
+                continue
+            elif column_type == 'tag':
+                # Tag columns usually have few distinct values
+                column_tags = {}  # type: Dict[Any, str]
+                for tags, column_value in zip(tags_list, column_values):
+                    try:
+                        tag = column_tags[column_value]
+                    except KeyError:
+                        tag = column_tags[column_value] = transformer(None, column_value)
+                    except TypeError:
+                        tag = transformer(None, column_value)
+
+                    tags.append(tag)
+            elif column_type == 'tag_list':
+                for tags, column_value in zip(tags_list, column_values):
+                    tags.extend(transformer(None, column_value))
+            elif hasattr(transformer, 'batch_submission'):
+                batch_submit_method, metric_name, raw = transformer.batch_submission
+                batch_columns.setdefault((batch_submit_method, raw), []).append((index, metric_name))
+            else:
+                row_submissions.append((index, transformer))
+
+        for (batch_submit_method, raw), columns in batch_columns.items():
+            # Keep the samples of every row together so that each row's tags are normalized only once
+            names = []
+            values = []
+            sample_tags = []
+            for row, tags in zip(rows, tags_list):
+                for index, metric_name in columns:
+                    names.append(metric_name)
+                    values.append(row[index])
+                    sample_tags.append(tags)
+
+            batch_submit_method(names, values, sample_tags, self.hostname, raw=raw)
+
+        extra_transformers = query.extra_transformers
+        if not row_submissions and not extra_transformers:
+            return
+
+        column_names = [column_name for column_name, _ in query.column_transformers]
+        for row, tags in zip(rows, tags_list):
+            # It holds the query results
+            sources = {column_name: column_value for column_name, column_value in zip(column_names, row) if column_name}
+
+            for index, transformer in row_submissions:
+                transformer(sources, row[index], tags=tags, hostname=self.hostname)
+
+            for name, transformer in extra_transformers:
+                try:
+                    result = transformer(sources, tags=tags, hostname=self.hostname)
+                except Exception as e:
+                    self.logger.error('Error transforming %s: %s', name, e)
+                    continue
+                else:
+                    if result is not None:
+                        sources[name] = result
+
     def _is_row_valid(self, query, row):
         # type: (Query, List) -> bool
         if not row:
@@ -195,6 +292,7 @@ class QueryManager(QueryExecutor):
         tags=None,  # type: List[str]
         error_handler=None,  # type: Callable[[str], str]
         hostname=None,  # type: str
+        columnar=False,  # type: bool
     ):  # type: (...) -> QueryManager
         """
         - **check** (_AgentCheck_) - an instance of a Check
@@ -204,6 +302,9 @@ class QueryManager(QueryExecutor):
         - **tags** (_List[str]_) - a list of tags to associate with every submission
         - **error_handler** (_callable_) - a callable accepting a `str` error as its sole argument and returning
           a sanitized string, useful for scrubbing potentially sensitive information libraries emit
+        - **hostname** (_str_) - a hostname to associate with every submission
+        - **columnar** (_bool_) - whether to process result sets column by column, transforming every column
+          once and submitting plain metrics for all rows at once. This is faster for queries returning many rows.
         """
         super(QueryManager, self).__init__(
             executor=executor,
@@ -213,6 +314,7 @@ class QueryManager(QueryExecutor):
             error_handler=error_handler,
             hostname=hostname,
             logger=check.log,
+            columnar=columnar,
         )
         self.check = check  # type: AgentCheck
 
@@ -22,7 +22,11 @@ class StatementMetrics:
     """
 
     def __init__(self):
-        self._previous_statements = {}
+        # The state of the previous run is stored column-wise rather than as one dict per row: the metric columns,
+        # a flat list of the metric values of every row and the offset of every row's values in that list
+        self._previous_columns = ()
+        self._previous_offsets = {}
+        self._previous_values = []
 
     def compute_derivative_rows(self, rows, metrics, key):
         """
@@ -43,37 +47,46 @@ class StatementMetrics:
         - **key** (_callable_) - function for an ID which uniquely identifies a row across runs
         """
         result = []
-        new_cache = {}
         metrics = set(metrics)
 
         rows = _merge_duplicate_rows(rows, metrics, key)
-        if len(rows) > 0:
-            dropped_metrics = metrics - set(rows[0].keys())
-            if dropped_metrics:
-                logger.warning(
-                    'Some statement metrics are not available from the table: %s', ','.join(m for m in dropped_metrics)
-                )
+        if not rows:
+            self._previous_columns = ()
+            self._previous_offsets = {}
+            self._previous_values = []
+            return result
+
+        # All rows come from the same table so they share the same columns
+        first_row = next(iter(rows.values()))
+        columns = tuple(sorted(metrics.intersection(first_row)))
+        dropped_metrics = metrics.difference(columns)
+        if dropped_metrics:
+            logger.warning(
+                'Some statement metrics are not available from the table: %s', ','.join(m for m in dropped_metrics)
+            )
+
+        # The previous values are meaningless if the available metrics changed, start tracking from this run forward
+        if columns == self._previous_columns:
+            previous_offsets = self._previous_offsets
+        else:
+            previous_offsets = {}
 
-        for row in rows:
-            row_key = key(row)
-            if row_key in new_cache:
-                logger.error(
-                    'Unexpected collision in cached query metrics. Dropping existing row, row_key=%s new=%s dropped=%s',
-                    row_key,
-                    row,
-                    new_cache[row_key],
-                )
+        previous_values = self._previous_values
+        num_columns = len(columns)
+        offsets = {}
+        values = []
 
-            # Set the row on the new cache to be checked the next run. This should happen for every row, regardless of
+        for row_key, row in rows.items():
+            # Store the row's values to be checked the next run. This should happen for every row, regardless of
             # whether a metric is submitted for the row during this run or not.
-            new_cache[row_key] = row
+            row_values = [row[column] for column in columns]
+            offsets[row_key] = len(values)
+            values.extend(row_values)
 
-            prev = self._previous_statements.get(row_key)
-            if prev is None:
+            previous_offset = previous_offsets.get(row_key)
+            if previous_offset is None:
                 continue
 
-            metric_columns = metrics & set(row.keys())
-
             # Take the diff of all metric values between the current row and the previous run's row.
             # There are a couple of edge cases to be aware of:
             #
@@ -84,23 +97,32 @@ class StatementMetrics:
             # 2. No changes since the previous run: There is no need to store metrics of 0, since that is implied by
             #    the absence of metrics. On any given check run, most rows will have no difference so this optimization
             #    avoids having to send a lot of unnecessary metrics.
-
-            diffed_row = {k: row[k] - prev[k] if k in metric_columns else row[k] for k in row.keys()}
+            diffs = [
+                current - previous
+                for current, previous in zip(
+                    row_values, previous_values[previous_offset : previous_offset + num_columns]
+                )
+            ]
 
             # Check for negative values, but only in the columns used for metrics
-            if any(diffed_row[k] < 0 for k in metric_columns):
+            if any(diff < 0 for diff in diffs):
                 # A "break" might be expected here instead of "continue," but there are cases where a subset of rows
                 # are removed. To avoid situations where all results are discarded every check run, we err on the side
                 # of potentially including truncated rows that exceed previous run counts.
                 continue
 
             # No changes to the query; no metric needed
-            if all(diffed_row[k] == 0 for k in metric_columns):
+            if all(diff == 0 for diff in diffs):
                 continue
 
+            # Only materialize rows that changed
+            diffed_row = dict(row)
+            diffed_row.update(zip(columns, diffs))
             result.append(diffed_row)
 
-        self._previous_statements = new_cache
+        self._previous_columns = columns
+        self._previous_offsets = offsets
+        self._previous_values = values
 
         return result
 
@@ -111,23 +133,23 @@ def _merge_duplicate_rows(rows, metrics, key):
     with the sum of the stats of all duplicates. This is motivated by database integrations such as postgres
     that can report many instances of a query that are considered the same after the agent normalization.
 
+    Returns a mapping of every key to its row, the rows that have no duplicates are not copied.
+
     - **rows** (_List[dict]_) - rows from current check run
-    - **metrics** (_List[str]_) - the metrics to compute for each row
+    - **metrics** (_Set[str]_) - the metrics to compute for each row
     - **key** (_callable_) - function for an ID which uniquely identifies a query row across runs
     """
 
     queries_by_key = {}
     for row in rows:
-        merged_row = dict(row)
-
-        query_key = key(merged_row)
+        query_key = key(row)
 
-        if query_key in queries_by_key:
-            merged_state = queries_by_key[query_key]
+        merged_state = queries_by_key.get(query_key)
+        if merged_state is None:
+            queries_by_key[query_key] = row
+        else:
             queries_by_key[query_key] = {
-                k: merged_row[k] + merged_state[k] if k in metrics else merged_state[k] for k in merged_state.keys()
+                k: row[k] + merged_state[k] if k in metrics else merged_state[k] for k in merged_state.keys()
             }
-        else:
-            queries_by_key[query_key] = merged_row
 
-    return list(queries_by_key.values())
+    return queries_by_key
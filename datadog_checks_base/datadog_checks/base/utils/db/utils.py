@@ -4,13 +4,15 @@
 import datetime
 import decimal
 import functools
+import heapq
 import logging
 import os
 import socket
 import threading
 import time
+from concurrent.futures import Future
 from concurrent.futures.thread import ThreadPoolExecutor
-from itertools import chain
+from itertools import chain, count
 from typing import Any, Callable, Dict, List, Tuple  # noqa: F401
 
 from cachetools import TTLCache
@@ -69,8 +71,8 @@ def _traced_dbm_async_job_method(f):
     return f
 
 
-def create_submission_transformer(submit_method):
-    # type: (Any) -> Callable[[Any, Any, Any], Callable[[Any, List, Dict], Callable[[Any, Any, Any], Transformer]]]
+def create_submission_transformer(submit_method, batch_submit_method=None):
+    # type: (Any, Any) -> Callable[[Any, Any, Any], Callable[[Any, List, Dict], Callable[[Any, Any, Any], Transformer]]]
     # During the compilation phase every transformer will have access to all the others and may be
     # passed the first arguments (e.g. name) that will be forwarded the actual AgentCheck methods.
     def get_transformer(_transformers, *creation_args, **modifiers):
@@ -84,6 +86,10 @@ def create_submission_transformer(submit_method):
             # submit_method(*creation_args, *call_args, **kwargs)
             submit_method(*chain(creation_args, call_args), **kwargs)
 
+        # Plain metrics i.e. only a name and a value may be submitted along with others at once
+        if batch_submit_method is not None and len(creation_args) == 1 and set(modifiers).issubset(('raw',)):
+            transformer.batch_submission = (batch_submit_method, creation_args[0], modifiers.get('raw', False))
+
         return transformer
 
     return get_transformer
@@ -212,12 +218,118 @@ def obfuscate_sql_with_metadata(query, options=None):
     return statement_with_metadata
 
 
+class DBMAsyncJobScheduler(object):
+    """
+    Runs the job loops of any number of `DBMAsyncJob`s on a bounded number of shared worker threads.
+
+    Rather than looping on its own thread, every job is queued by the time its next iteration is due and
+    is only queued again once that iteration is done. Iterations that are due run in the order in which
+    they became due, so jobs of every instance get their turn regardless of how many jobs are scheduled.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._queue = []  # type: List[Tuple[float, int, DBMAsyncJob]]
+        self._counter = count()
+        self._condition = threading.Condition()
+        self._workers = []  # type: List[threading.Thread]
+        self._idle_workers = 0
+        self._shutdown = False
+
+    def schedule(self, job, due=None):
+        """
+        Queue the next iteration of a job, by default as soon as possible.
+        """
+        with self._condition:
+            heapq.heappush(self._queue, (time.time() if due is None else due, next(self._counter), job))
+
+            # Workers are created lazily, only when there are more queued iterations than idle workers
+            if len(self._workers) < self.max_workers and self._idle_workers < len(self._queue):
+                worker = threading.Thread(target=self._work, name='dbm-async-job-{}'.format(len(self._workers)))
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+            else:
+                self._condition.notify()
+
+    def shutdown(self, wait=True):
+        """
+        Stop every worker, jobs that are still queued are dropped.
+        """
+        with self._condition:
+            self._shutdown = True
+            del self._queue[:]
+            self._condition.notify_all()
+
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _next_job(self):
+        with self._condition:
+            while not self._shutdown:
+                if not self._queue:
+                    remaining = None
+                else:
+                    due = self._queue[0][0]
+                    remaining = due - time.time()
+                    if remaining <= 0:
+                        _, _, job = heapq.heappop(self._queue)
+                        return due, job
+
+                self._idle_workers += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._idle_workers -= 1
+
+        return None, None
+
+    def _work(self):
+        while True:
+            due, job = self._next_job()
+            if job is None:
+                return
+
+            try:
+                next_due = job._run_job_scheduled(due)
+            except Exception:
+                logger.exception('Unexpected error running scheduled DBM async job')
+            else:
+                if next_due is not None:
+                    self.schedule(job, next_due)
+
+
+def get_scheduler_workers():
+    # type: () -> int
+    """
+    Return the number of workers of the scheduler shared by all DBM async jobs, `0` if it should not be used.
+    """
+    workers = datadog_agent.get_config('dbm_async_job_scheduler_workers')
+    if workers is None or workers == '':
+        return 0
+
+    try:
+        return int(workers)
+    except (TypeError, ValueError):
+        logger.warning(
+            'Invalid value for `dbm_async_job_scheduler_workers`, running each DBM async job on its own thread: %r',
+            workers,
+        )
+        return 0
+
+
 class DBMAsyncJob(object):
     # Set an arbitrary high limit so that dbm async jobs (which aren't CPU bound) don't
     # get artificially limited by the default max_workers count. Note that since threads are
     # created lazily, it's safe to set a high maximum
     executor = ThreadPoolExecutor(100000)
 
+    # When the `dbm_async_job_scheduler_workers` Agent setting is a positive number, job loops run on a scheduler
+    # shared by all jobs with that many workers rather than each on their own thread
+    scheduler = None  # type: DBMAsyncJobScheduler
+    scheduler_lock = threading.Lock()
+
     """
     Runs Async Jobs
     """
@@ -234,6 +346,7 @@ class DBMAsyncJob(object):
         expected_db_exceptions=(),
         shutdown_callback=None,
         job_name=None,
+        job_deadline=None,
     ):
         self._check = check
         self._config_host = config_host
@@ -254,6 +367,26 @@ class DBMAsyncJob(object):
         self._enabled = enabled
         self._expected_db_exceptions = expected_db_exceptions
         self._job_name = job_name
+        # The number of seconds a single iteration of the job may take when running on the shared scheduler,
+        # defaults to the rate limit's period
+        self._job_deadline = job_deadline
+
+    @classmethod
+    def get_scheduler(cls):
+        # type: () -> DBMAsyncJobScheduler
+        """
+        Return the scheduler shared by all jobs, or `None` if each job loop should run on its own thread.
+        """
+        if cls.scheduler is None:
+            max_workers = get_scheduler_workers()
+            if max_workers <= 0:
+                return None
+
+            with cls.scheduler_lock:
+                if DBMAsyncJob.scheduler is None:
+                    DBMAsyncJob.scheduler = DBMAsyncJobScheduler(max_workers)
+
+        return cls.scheduler
 
     def cancel(self):
         self._cancel_event.set()
@@ -277,58 +410,112 @@ class DBMAsyncJob(object):
             self._log.debug("Running threaded job synchronously. job=%s", self._job_name)
             self._run_job_rate_limited()
         elif self._job_loop_future is None or not self._job_loop_future.running():
-            self._job_loop_future = DBMAsyncJob.executor.submit(self._job_loop)
+            scheduler = self.get_scheduler()
+            if scheduler is None:
+                self._job_loop_future = DBMAsyncJob.executor.submit(self._job_loop)
+            else:
+                self._log.info("[%s] Starting scheduled job loop", self._job_tags_str)
+                self._job_loop_future = Future()
+                self._job_loop_future.set_running_or_notify_cancel()
+                scheduler.schedule(self)
         else:
             self._log.debug("Job loop already running. job=%s", self._job_name)
 
     def _job_loop(self):
         try:
             self._log.info("[%s] Starting job loop", self._job_tags_str)
-            while True:
-                if self._cancel_event.isSet():
-                    self._log.info("[%s] Job loop cancelled", self._job_tags_str)
-                    self._check.count("dd.{}.async_job.cancel".format(self._dbms), 1, tags=self._job_tags, raw=True)
-                    break
-                if time.time() - self._last_check_run > self._min_collection_interval * 2:
-                    self._log.info("[%s] Job loop stopping due to check inactivity", self._job_tags_str)
-                    self._check.count(
-                        "dd.{}.async_job.inactive_stop".format(self._dbms), 1, tags=self._job_tags, raw=True
-                    )
-                    break
+            while not self._job_loop_should_stop():
                 self._run_job_rate_limited()
         except Exception as e:
-            if self._cancel_event.isSet():
-                # canceling can cause exceptions if the connection is closed the middle of the check run
-                # in this case we still want to report it as a cancellation instead of a crash
-                self._log.debug("[%s] Job loop error after cancel: %s", self._job_tags_str, e)
-                self._log.info("[%s] Job loop cancelled", self._job_tags_str)
-                self._check.count("dd.{}.async_job.cancel".format(self._dbms), 1, tags=self._job_tags, raw=True)
-            elif isinstance(e, self._expected_db_exceptions):
-                self._log.warning(
-                    "[%s] Job loop database error: %s",
-                    self._job_tags_str,
-                    e,
-                    exc_info=self._log.getEffectiveLevel() == logging.DEBUG,
-                )
-                self._check.count(
-                    "dd.{}.async_job.error".format(self._dbms),
-                    1,
-                    tags=self._job_tags + ["error:database-{}".format(type(e))],
-                    raw=True,
-                )
-            else:
-                self._log.exception("[%s] Job loop crash", self._job_tags_str)
-                self._check.count(
-                    "dd.{}.async_job.error".format(self._dbms),
-                    1,
-                    tags=self._job_tags + ["error:crash-{}".format(type(e))],
-                    raw=True,
-                )
+            self._handle_job_loop_error(e)
         finally:
             self._log.info("[%s] Shutting down job loop", self._job_tags_str)
             if self._shutdown_callback:
                 self._shutdown_callback()
 
+    def _run_job_scheduled(self, due):
+        """
+        Run a single iteration of the job loop on a worker of the shared scheduler.
+
+        Returns the time at which the next iteration is due, or `None` if the job loop stopped.
+        """
+        start = time.time()
+        self._check.histogram(
+            "dd.{}.async_job.queue_wait".format(self._dbms),
+            (start - due) * 1000,
+            tags=self._job_tags,
+            raw=True,
+        )
+
+        try:
+            if not self._job_loop_should_stop():
+                self._run_job_traced()
+
+                end = time.time()
+                period = self._rate_limiter.period_s
+                deadline = self._job_deadline if self._job_deadline is not None else period
+                if deadline and end - start > deadline:
+                    self._log.debug(
+                        "[%s] Job run took %.3fs, exceeding its deadline of %.3fs",
+                        self._job_tags_str,
+                        end - start,
+                        deadline,
+                    )
+                    self._check.count("dd.{}.async_job.overrun".format(self._dbms), 1, tags=self._job_tags, raw=True)
+
+                return max(start + period, end)
+        except Exception as e:
+            self._handle_job_loop_error(e)
+
+        self._log.info("[%s] Shutting down job loop", self._job_tags_str)
+        try:
+            if self._shutdown_callback:
+                self._shutdown_callback()
+        except Exception as e:
+            self._job_loop_future.set_exception(e)
+        else:
+            self._job_loop_future.set_result(None)
+
+    def _job_loop_should_stop(self):
+        if self._cancel_event.isSet():
+            self._log.info("[%s] Job loop cancelled", self._job_tags_str)
+            self._check.count("dd.{}.async_job.cancel".format(self._dbms), 1, tags=self._job_tags, raw=True)
+            return True
+        if time.time() - self._last_check_run > self._min_collection_interval * 2:
+            self._log.info("[%s] Job loop stopping due to check inactivity", self._job_tags_str)
+            self._check.count("dd.{}.async_job.inactive_stop".format(self._dbms), 1, tags=self._job_tags, raw=True)
+            return True
+        return False
+
+    def _handle_job_loop_error(self, e):
+        if self._cancel_event.isSet():
+            # canceling can cause exceptions if the connection is closed the middle of the check run
+            # in this case we still want to report it as a cancellation instead of a crash
+            self._log.debug("[%s] Job loop error after cancel: %s", self._job_tags_str, e)
+            self._log.info("[%s] Job loop cancelled", self._job_tags_str)
+            self._check.count("dd.{}.async_job.cancel".format(self._dbms), 1, tags=self._job_tags, raw=True)
+        elif isinstance(e, self._expected_db_exceptions):
+            self._log.warning(
+                "[%s] Job loop database error: %s",
+                self._job_tags_str,
+                e,
+                exc_info=self._log.getEffectiveLevel() == logging.DEBUG,
+            )
+            self._check.count(
+                "dd.{}.async_job.error".format(self._dbms),
+                1,
+                tags=self._job_tags + ["error:database-{}".format(type(e))],
+                raw=True,
+            )
+        else:
+            self._log.exception("[%s] Job loop crash", self._job_tags_str)
+            self._check.count(
+                "dd.{}.async_job.error".format(self._dbms),
+                1,
+                tags=self._job_tags + ["error:crash-{}".format(type(e))],
+                raw=True,
+            )
+
     def _set_rate_limit(self, rate_limit):
         if self._rate_limiter.rate_limit_s != rate_limit:
             self._rate_limiter = ConstantRateLimiter(rate_limit)
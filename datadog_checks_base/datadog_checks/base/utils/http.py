@@ -27,6 +27,8 @@ from ..config import is_affirmative
 from ..errors import ConfigurationError
 from .common import ensure_bytes, ensure_unicode
 from .headers import get_default_headers, update_headers
+from .http_cache import ResponseCache
+from .json_stream import iter_json_items
 from .network import CertAdapter, closing, create_socket_connection
 from .time import get_timestamp
 
@@ -60,6 +62,9 @@ DEFAULT_TIMEOUT = 10
 # https://www.bittorrent.org/beps/bep_0003.html
 DEFAULT_CHUNK_SIZE = 16
 
+# The number of kibibytes (KiB) of responses kept for the requests made with `cache_ttl`
+DEFAULT_RESPONSE_CACHE_SIZE = 10240
+
 # https://github.com/python/cpython/blob/ef516d11c1a0f885dba0aba8cf5366502077cdd4/Lib/ssl.py#L158-L165
 DEFAULT_PROTOCOL_VERSIONS = {'SSLv3', 'TLSv1.2', 'TLSv1.3'}
 SUPPORTED_PROTOCOL_VERSIONS = {'SSLv3', 'TLSv1', 'TLSv1.1', 'TLSv1.2', 'TLSv1.3'}
@@ -88,6 +93,7 @@ STANDARD_FIELDS = {
     'proxy': None,
     'read_timeout': None,
     'request_size': DEFAULT_CHUNK_SIZE,
+    'response_cache_size': DEFAULT_RESPONSE_CACHE_SIZE,
     'skip_proxy': False,
     'tls_ca_cert': None,
     'tls_cert': None,
@@ -139,6 +145,13 @@ class ResponseWrapper(ObjectProxy):
 
         return self.__wrapped__.iter_lines(chunk_size=chunk_size, decode_unicode=decode_unicode, delimiter=delimiter)
 
+    def iter_json(self, path=None, chunk_size=None):
+        """
+        Yield the items of the JSON array, or the `(key, value)` pairs of the JSON object, found at `path` in the
+        body as it is read. Only one item is decoded at a time, so the request should be made with `stream=True`.
+        """
+        return iter_json_items(self.iter_content(chunk_size=chunk_size), path)
+
     def __enter__(self):
         return self
 
@@ -156,6 +169,7 @@ class RequestsWrapper(object):
         'request_hooks',
         'auth_token_handler',
         'request_size',
+        'response_cache',
         'tls_protocols_allowed',
     )
 
@@ -320,6 +334,10 @@ class RequestsWrapper(object):
 
         self.request_size = int(float(config['request_size']) * KIBIBYTE)
 
+        # Only used by the requests made with the `cache_ttl` option
+        response_cache_size = int(float(config['response_cache_size']) * KIBIBYTE)
+        self.response_cache = ResponseCache(response_cache_size) if response_cache_size > 0 else None
+
         self.tls_protocols_allowed = []
         for protocol in config['tls_protocols_allowed']:
             if protocol in SUPPORTED_PROTOCOL_VERSIONS:
@@ -372,6 +390,16 @@ class RequestsWrapper(object):
     def options_method(self, url, **options):
         return self._request('options', url, options)
 
+    def iter_json(self, url, path=None, **options):
+        """
+        Stream the JSON body of a GET request, see `ResponseWrapper.iter_json`.
+        """
+        options.setdefault('stream', True)
+        with self._request('get', url, options) as response:
+            response.raise_for_status()
+            for item in response.iter_json(path):
+                yield item
+
     def _request(self, method, url, options):
         if self.log_requests:
             self.logger.debug(u'Sending %s request to %s', method.upper(), url)
@@ -383,6 +411,8 @@ class RequestsWrapper(object):
         if persist is None:
             persist = self.persist_connections
 
+        cache_ttl = options.pop('cache_ttl', None)
+
         new_options = self.populate_options(options)
 
         if url.startswith('https') and not self.ignore_tls_warning and not new_options['verify']:
@@ -399,6 +429,26 @@ class RequestsWrapper(object):
 
         self.handle_auth_token(method=method, url=url, default_options=self.options)
 
+        cache_key = cached = None
+        if (
+            cache_ttl is not None
+            and self.response_cache is not None
+            and method == 'get'
+            and not new_options.get('stream')
+        ):
+            cache_key = self.response_cache.make_key(url, new_options)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                if cached.is_fresh():
+                    return ResponseWrapper(cached.to_response(), self.request_size)
+
+                # Make the request conditional, without modifying the default options
+                validators = cached.validators()
+                if validators:
+                    headers = new_options['headers'].copy()
+                    headers.update(validators)
+                    new_options = dict(new_options, headers=headers)
+
         with ExitStack() as stack:
             for hook in self.request_hooks:
                 stack.enter_context(hook())
@@ -418,6 +468,9 @@ class RequestsWrapper(object):
             else:
                 response = self.make_request_aia_chasing(request_method, method, url, new_options, persist)
 
+            if cache_key is not None:
+                response = self.response_cache.update(cache_key, cached, response, cache_ttl)
+
             return ResponseWrapper(response, self.request_size)
 
     def make_request_aia_chasing(self, request_method, method, url, new_options, persist):
@@ -0,0 +1,164 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+"""
+In-memory caching of HTTP responses for the endpoints that checks mark as cacheable.
+"""
+import threading
+from collections import OrderedDict
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from six import iteritems
+
+from .time import get_precise_time
+
+# Response headers identifying a version of a resource, and the request headers to send them back with
+VALIDATOR_HEADERS = (('ETag', 'If-None-Match'), ('Last-Modified', 'If-Modified-Since'))
+
+
+class CachedResponse(object):
+    __slots__ = ('status_code', 'reason', 'url', 'encoding', 'headers', 'content', 'expiration', 'size')
+
+    def __init__(self, response, ttl):
+        self.status_code = response.status_code
+        self.reason = response.reason
+        self.url = response.url
+        self.encoding = response.encoding
+        self.headers = CaseInsensitiveDict(response.headers)
+        self.content = response.content
+        self.expiration = get_precise_time() + ttl
+        self.size = len(self.content) + sum(len(key) + len(value) for key, value in iteritems(self.headers))
+
+    def is_fresh(self):
+        return get_precise_time() < self.expiration
+
+    def validators(self):
+        """Return the headers making a request conditional on the response having changed."""
+        return {
+            request_header: self.headers[response_header]
+            for response_header, request_header in VALIDATOR_HEADERS
+            if response_header in self.headers
+        }
+
+    def revalidate(self, response, ttl):
+        """Keep using the response after the server reported it did not change."""
+        self.expiration = get_precise_time() + ttl
+
+        # https://www.rfc-editor.org/rfc/rfc9110#section-15.4.5
+        for response_header, _ in VALIDATOR_HEADERS:
+            if response_header in response.headers:
+                self.headers[response_header] = response.headers[response_header]
+
+    def to_response(self):
+        response = Response()
+        response.status_code = self.status_code
+        response.reason = self.reason
+        response.url = self.url
+        response.encoding = self.encoding
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response._content_consumed = True
+        response.from_cache = True
+        return response
+
+
+class ResponseCache(object):
+    """
+    A least recently used cache of successful GET responses, holding at most `max_size` bytes of content and headers.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url, options):
+        """Identify a request by its URL, parameters, headers and credentials."""
+        params = options.get('params')
+        if isinstance(params, dict):
+            params = tuple(sorted(iteritems(params)))
+        elif isinstance(params, list):
+            params = tuple(params)
+
+        auth = options.get('auth')
+        if auth is not None and not isinstance(auth, tuple):
+            # Basic and digest credentials, other authentication methods are specific to the wrapper making requests
+            if hasattr(auth, 'username') and hasattr(auth, 'password'):
+                auth = (type(auth).__name__, auth.username, auth.password)
+            else:
+                auth = id(auth)
+
+        headers = tuple(sorted(iteritems(options.get('headers') or {})))
+        return url, params, headers, auth
+
+    def get(self, key):
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is not None:
+                # Mark as recently used, `move_to_end` is not available on Python 2
+                self._responses[key] = self._responses.pop(key)
+
+            return cached
+
+    def update(self, key, cached, response, ttl):
+        """
+        Cache the `response` to the request `key` and return the response to use, which is the `cached` one if
+        the server reported it did not change.
+        """
+        if response.status_code == 304 and cached is not None:
+            with self._lock:
+                cached.revalidate(response, ttl)
+
+            response.close()
+            return cached.to_response()
+
+        if response.status_code != 200 or 'no-store' in response.headers.get('Cache-Control', ''):
+            self.pop(key)
+            return response
+
+        # Do not read the content of large responses just to discard them
+        content_length = response.headers.get('Content-Length')
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_size:
+            self.pop(key)
+            return response
+
+        cached = CachedResponse(response, ttl)
+        with self._lock:
+            self._store(key, cached)
+
+        return response
+
+    def pop(self, key):
+        with self._lock:
+            cached = self._responses.pop(key, None)
+            if cached is not None:
+                self.size -= cached.size
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+            self.size = 0
+
+    def _store(self, key, cached):
+        previous = self._responses.pop(key, None)
+        if previous is not None:
+            self.size -= previous.size
+
+        if cached.size > self.max_size:
+            return
+
+        while self._responses and self.size + cached.size > self.max_size:
+            _, evicted = self._responses.popitem(last=False)
+            self.size -= evicted.size
+
+        self._responses[key] = cached
+        self.size += cached.size
+
+    def __contains__(self, key):
+        return key in self._responses
+
+    def __len__(self):
+        return len(self._responses)
@@ -0,0 +1,218 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+"""
+Incremental decoding of large JSON documents.
+
+Only the items of the array or object selected by a path are decoded, one at a time, so that payloads of hundreds of
+megabytes can be processed with memory bounded by the size of their largest item.
+"""
+import codecs
+import re
+from json import JSONDecoder
+
+from six import string_types
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+STRUCTURAL_CHARACTER = re.compile(r'["\[\]{}]')
+# The characters that can follow a value in a valid document
+VALUE_TERMINATORS = frozenset(' \t\n\r,:]}')
+DECODER = JSONDecoder()
+
+
+def iter_json_items(chunks, path=None):
+    """
+    Yield the items of the JSON array, or the `(key, value)` pairs of the JSON object, found at `path` in the
+    UTF-8 encoded document made of the byte `chunks`.
+
+    The `path` is a sequence of object keys and array indices, or a string of keys separated by dots. The document
+    itself is selected by default. Nothing is yielded if the path does not exist, and a `ValueError` is raised if the
+    document is malformed or if the value selected is neither an array nor an object.
+    """
+    if path is None:
+        path = ()
+    elif isinstance(path, string_types):
+        path = path.split('.') if path else ()
+
+    reader = JSONStreamReader(chunks)
+    for segment in path:
+        if not reader.enter(segment):
+            return
+
+    for item in reader.iter_items():
+        yield item
+
+
+class JSONStreamReader(object):
+    """
+    A cursor over a JSON document that reads chunks only when it needs to and forgets what it went past.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._text = u''
+        self._pos = 0
+        self._eof = False
+
+    def enter(self, segment):
+        """Move to the value of the key or index `segment` of the current value, return whether it exists."""
+        char = self._next_char()
+        if char == '{':
+            key = segment if isinstance(segment, string_types) else str(segment)
+            for current_key in self._iter_keys():
+                if current_key == key:
+                    return True
+                self._skip_value()
+        elif char == '[':
+            index = str(segment)
+            for current_index in self._iter_indices():
+                if str(current_index) == index:
+                    return True
+                self._skip_value()
+        else:
+            self._skip_value()
+
+        return False
+
+    def iter_items(self):
+        """Yield the items or `(key, value)` pairs of the current value."""
+        char = self._next_char()
+        if char == '{':
+            for key in self._iter_keys():
+                yield key, self._read_value()
+        elif char == '[':
+            for _ in self._iter_indices():
+                yield self._read_value()
+        else:
+            self._raise_unexpected('an array or an object')
+
+    def _iter_keys(self):
+        self._pos += 1
+        if self._next_char() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            if self._next_char() != '"':
+                self._raise_unexpected('an object key')
+            key = self._read_value()
+            if self._next_char() != ':':
+                self._raise_unexpected('`:`')
+            self._pos += 1
+
+            # The value is consumed by the caller
+            yield key
+
+            char = self._next_char()
+            self._pos += 1
+            if char == '}':
+                return
+            elif char != ',':
+                self._raise_unexpected('`,` or `}`', -1)
+
+    def _iter_indices(self):
+        self._pos += 1
+        if self._next_char() == ']':
+            self._pos += 1
+            return
+
+        index = 0
+        while True:
+            # The value is consumed by the caller
+            yield index
+            index += 1
+
+            char = self._next_char()
+            self._pos += 1
+            if char == ']':
+                return
+            elif char != ',':
+                self._raise_unexpected('`,` or `]`', -1)
+
+    def _read_value(self):
+        if not self._next_char():
+            self._raise_unexpected('a value')
+
+        while True:
+            if self._eof:
+                value, self._pos = DECODER.raw_decode(self._text, self._pos)
+                return value
+
+            try:
+                value, end = DECODER.raw_decode(self._text, self._pos)
+            except ValueError:
+                pass
+            else:
+                # Numbers can continue in the next chunk
+                if end < len(self._text) and self._text[end] in VALUE_TERMINATORS:
+                    self._pos = end
+                    return value
+
+            # Read at least as much text again so that large values are not decoded too many times
+            self._fill(len(self._text) - self._pos)
+
+    def _skip_value(self):
+        if self._next_char() in ('[', '{'):
+            self._skip_container()
+        else:
+            self._read_value()
+
+    def _skip_container(self):
+        """Move past the array or object at the current position without decoding it."""
+        depth = 0
+        while True:
+            match = STRUCTURAL_CHARACTER.search(self._text, self._pos)
+            if match is None:
+                self._pos = len(self._text)
+            elif match.group() == '"':
+                self._pos = match.start()
+                string = STRING.match(self._text, self._pos)
+                if string is not None:
+                    self._pos = string.end()
+                    continue
+            else:
+                self._pos = match.end()
+                depth += 1 if match.group() in '[{' else -1
+                if depth == 0:
+                    return
+                continue
+
+            # The end of the text or an incomplete string was reached
+            if not self._fill():
+                self._raise_unexpected('the end of an array or an object')
+
+    def _next_char(self):
+        """Skip whitespace and return the next character, or an empty string at the end of the document."""
+        while True:
+            self._pos = WHITESPACE.match(self._text, self._pos).end()
+            if self._pos < len(self._text):
+                return self._text[self._pos]
+            if not self._fill():
+                return ''
+
+    def _fill(self, size=1):
+        """Read at least `size` more characters, dropping the text before the current position.
+        Return `False` if nothing could be read."""
+        chunks = [self._text[self._pos :]]
+        read = 0
+        while read < size and not self._eof:
+            try:
+                chunk = self._decoder.decode(next(self._chunks))
+            except StopIteration:
+                self._eof = True
+                chunk = self._decoder.decode(b'', final=True)
+
+            chunks.append(chunk)
+            read += len(chunk)
+
+        self._text = u''.join(chunks)
+        self._pos = 0
+        return read > 0
+
+    def _raise_unexpected(self, expected, offset=0):
+        position = self._pos + offset
+        raise ValueError(
+            'Expected {} but got: {!r}'.format(expected, self._text[position : position + 20] or 'end of document')
+        )
@@ -80,3 +80,34 @@ def test_label_joins_old(benchmark, dd_run_check, mock_http_response, fixture_ks
     dd_run_check(c)
 
     benchmark(c.check, instance)
+
+
+def test_label_joins_kubernetes_state_old(benchmark, dd_run_check, mock_http_response, fixture_ksm):
+    mock_http_response(file_path=fixture_ksm)
+    instance = {
+        'prometheus_url': 'foo',
+        'namespace': 'bar',
+        'label_to_hostname': 'node',
+        'metrics': ['*'],
+        # The joins of the `kubernetes_state` check, on distinct labels
+        'label_joins': {
+            'kube_pod_info': {'labels_to_match': ['pod', 'namespace'], 'labels_to_get': ['node']},
+            'kube_pod_status_phase': {'labels_to_match': ['pod', 'namespace'], 'labels_to_get': ['phase']},
+            'kube_persistentvolume_info': {'labels_to_match': ['persistentvolume'], 'labels_to_get': ['storageclass']},
+            'kube_persistentvolumeclaim_info': {
+                'labels_to_match': ['persistentvolumeclaim', 'namespace'],
+                'labels_to_get': ['storageclass'],
+            },
+            'kube_pod_labels': {'labels_to_match': ['pod', 'namespace'], 'labels_to_get': ['*']},
+            'kube_deployment_labels': {'labels_to_match': ['deployment', 'namespace'], 'labels_to_get': ['*']},
+            'kube_daemonset_labels': {'labels_to_match': ['daemonset', 'namespace'], 'labels_to_get': ['*']},
+            'kube_node_labels': {'labels_to_match': ['node'], 'labels_to_get': ['*']},
+            'kube_service_labels': {'labels_to_match': ['service', 'namespace'], 'labels_to_get': ['*']},
+        },
+    }
+    c = OpenMetricsBaseCheck('test', {}, [instance])
+
+    # Run once to get initialization steps out of the way.
+    dd_run_check(c)
+
+    benchmark(c.check, instance)
@@ -2300,7 +2300,7 @@ def test_label_joins_gc(aggregator, mocked_prometheus_check, mocked_prometheus_s
         count=1,
     )
 
-    assert 15 == len(mocked_prometheus_scraper_config['_label_mapping']['pod'])
+    assert 15 == len(mocked_prometheus_scraper_config['_label_mapping'][('pod',)])
     text_data = mock_get.replace('dd-agent-62bgh', 'dd-agent-1337')
     pvc_replace = re.compile(r'^kube_persistentvolumeclaim_.*\n', re.MULTILINE)
     text_data = pvc_replace.sub('', text_data)
@@ -2310,9 +2310,9 @@ def test_label_joins_gc(aggregator, mocked_prometheus_check, mocked_prometheus_s
     )
     with mock.patch('requests.get', return_value=mock_response, __name__="get"):
         check.process(mocked_prometheus_scraper_config)
-        assert 'dd-agent-1337' in mocked_prometheus_scraper_config['_label_mapping']['pod']
-        assert 'dd-agent-62bgh' not in mocked_prometheus_scraper_config['_label_mapping']['pod']
-        assert 15 == len(mocked_prometheus_scraper_config['_label_mapping']['pod'])
+        assert ('dd-agent-1337',) in mocked_prometheus_scraper_config['_label_mapping'][('pod',)]
+        assert ('dd-agent-62bgh',) not in mocked_prometheus_scraper_config['_label_mapping'][('pod',)]
+        assert 15 == len(mocked_prometheus_scraper_config['_label_mapping'][('pod',)])
 
 
 def test_label_joins_missconfigured(aggregator, mocked_prometheus_check, mocked_prometheus_scraper_config, mock_get):
@@ -2456,8 +2456,8 @@ def test_label_join_state_change(aggregator, mocked_prometheus_check, mocked_pro
     check.process(mocked_prometheus_scraper_config)
 
     # check that 15 pods are in phase:Running
-    assert 15 == len(mocked_prometheus_scraper_config['_label_mapping']['pod'])
-    for _, tags in iteritems(mocked_prometheus_scraper_config['_label_mapping']['pod']):
+    assert 15 == len(mocked_prometheus_scraper_config['_label_mapping'][('pod',)])
+    for _, tags in iteritems(mocked_prometheus_scraper_config['_label_mapping'][('pod',)]):
         assert tags.get('phase') == 'Running'
 
     text_data = mock_get.replace(
@@ -2470,8 +2470,8 @@ def test_label_join_state_change(aggregator, mocked_prometheus_check, mocked_pro
     )
     with mock.patch('requests.get', return_value=mock_response, __name__="get"):
         check.process(mocked_prometheus_scraper_config)
-        assert 15 == len(mocked_prometheus_scraper_config['_label_mapping']['pod'])
-        assert mocked_prometheus_scraper_config['_label_mapping']['pod']['dd-agent-62bgh']['phase'] == 'Test'
+        assert 15 == len(mocked_prometheus_scraper_config['_label_mapping'][('pod',)])
+        assert mocked_prometheus_scraper_config['_label_mapping'][('pod',)][('dd-agent-62bgh',)]['phase'] == 'Test'
 
 
 def test_label_to_match_single(benchmark, mocked_prometheus_check, mocked_prometheus_scraper_config, mock_get):
@@ -37,6 +37,20 @@ def test_ksm_new(benchmark, dd_run_check, mock_http_response, fixture_ksm):
     benchmark(c.check, None)
 
 
+def test_ksm_new_streaming(benchmark, dd_run_check, mock_http_response, fixture_ksm):
+    mock_http_response(file_path=fixture_ksm)
+    c = OpenMetricsBaseCheckV2(
+        'test',
+        {},
+        [{'openmetrics_endpoint': 'foo', 'namespace': 'bar', 'metrics': ['.+'], 'use_streaming_parser': True}],
+    )
+
+    # Run once to get initialization steps out of the way.
+    dd_run_check(c)
+
+    benchmark(c.check, None)
+
+
 def test_amazon_msk_jmx_metrics_new(benchmark, dd_run_check, mock_http_response, fixture_amazon_msk_jmx_metrics):
     mock_http_response(file_path=fixture_amazon_msk_jmx_metrics)
 
@@ -433,3 +433,19 @@ class TestUseLatestSpec:
             'application/openmetrics-text;version=1.0.0,application/openmetrics-text;version=0.0.1;q=0.75,'
             'text/plain;version=0.0.4;q=0.5,*/*;q=0.1'
         )
+
+    def test_protobuf(self, dd_run_check):
+        check = get_check({'use_protobuf': True})
+        check.configure_scrapers()
+        scraper = check.scrapers['test']
+        assert scraper.http.options['headers']['Accept'] == (
+            'application/vnd.google.protobuf;proto=io.prometheus.client.MetricFamily;encoding=delimited,'
+            'application/openmetrics-text;version=1.0.0;q=0.8,application/openmetrics-text;version=0.0.1;q=0.75,'
+            'text/plain;version=0.0.4;q=0.5,*/*;q=0.1'
+        )
+
+    def test_protobuf_with_latest_spec(self, dd_run_check):
+        check = get_check({'use_latest_spec': True, 'use_protobuf': True})
+
+        with pytest.raises(Exception, match='^Settings `use_latest_spec` and `use_protobuf` are mutually exclusive$'):
+            dd_run_check(check, extract_message=True)
@@ -1,10 +1,14 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+from textwrap import dedent
+
+import mock
 import pytest
 from mock import Mock
 
 from datadog_checks.base.constants import ServiceCheck
+from datadog_checks.dev.http import MockResponse
 from datadog_checks.dev.testing import requires_py3
 
 from .utils import get_check
@@ -320,6 +324,135 @@ class TestRawLineFilters:
         aggregator.assert_all_metrics_covered()
 
 
+class TestUseStreamingParser:
+    def test(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            # HELP go_memstats_gc_sys_bytes Number of bytes used for garbage collection system metadata.
+            # TYPE go_memstats_gc_sys_bytes gauge
+            go_memstats_gc_sys_bytes{bar="foo"} 901120
+            # HELP go_memstats_free_bytes Number of bytes free and available for use.
+            # TYPE go_memstats_free_bytes gauge
+            go_memstats_free_bytes{foo=""} 6.396288e+06
+            """
+        )
+        check = get_check(
+            {
+                'metrics': ['.+'],
+                'use_streaming_parser': True,
+                'exclude_metrics': ['go_memstats_alloc_bytes'],
+                'raw_line_filters': ['=""'],
+                'telemetry': True,
+            }
+        )
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_gc_sys_bytes', 901120, metric_type=aggregator.GAUGE, tags=['endpoint:test', 'bar:foo']
+        )
+        aggregator.assert_metric('test.telemetry.metrics.input.count', 2, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.ignored.count', 1, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.processed.count', 1, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.blacklist.count', 1, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.payload.size', tags=['endpoint:test'])
+
+        aggregator.assert_all_metrics_covered()
+
+    def test_undefined_metrics(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            # HELP go_memstats_gc_sys_bytes Number of bytes used for garbage collection system metadata.
+            # TYPE go_memstats_gc_sys_bytes gauge
+            go_memstats_gc_sys_bytes{bar="foo"} 901120
+            go_memstats_gc_sys_bytes{bar="baz"} 901120
+            # HELP go_gc_duration_seconds A summary of the GC invocation durations.
+            # TYPE go_gc_duration_seconds summary
+            go_gc_duration_seconds{quantile="0"} 9.5e-05
+            go_gc_duration_seconds_sum 0.001
+            go_gc_duration_seconds_count 4
+            """
+        )
+        check = get_check(
+            {'metrics': ['go_memstats_alloc_bytes', 'go_gc_.+'], 'use_streaming_parser': True, 'telemetry': True}
+        )
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes', 6396288, metric_type=aggregator.GAUGE, tags=['endpoint:test', 'foo:bar']
+        )
+        aggregator.assert_metric('test.go_gc_duration_seconds.quantile', tags=['endpoint:test', 'quantile:0'])
+        aggregator.assert_metric('test.go_gc_duration_seconds.sum', tags=['endpoint:test'])
+        aggregator.assert_metric('test.go_gc_duration_seconds.count', tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.input.count', 6, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.ignored.count', 2, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.processed.count', 4, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.payload.size', tags=['endpoint:test'])
+
+        aggregator.assert_all_metrics_covered()
+
+        scraper = check.scrapers['test']
+        assert scraper.metric_transformer.defined_metrics == {
+            'go_memstats_alloc_bytes': True,
+            'go_memstats_gc_sys_bytes': False,
+            'go_gc_duration_seconds': True,
+        }
+
+    def test_openmetrics(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            # EOF
+            """,
+            headers={'Content-Type': 'application/openmetrics-text; version=1.0.0; charset=utf-8'},
+        )
+        check = get_check({'metrics': ['.+'], 'use_streaming_parser': True})
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes', 6396288, metric_type=aggregator.GAUGE, tags=['endpoint:test', 'foo:bar']
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+    def test_excluded_metric_with_shared_labels(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            # HELP go_memstats_gc_sys_bytes Number of bytes used for garbage collection system metadata.
+            # TYPE go_memstats_gc_sys_bytes gauge
+            go_memstats_gc_sys_bytes{bar="foo"} 901120
+            """
+        )
+        check = get_check(
+            {
+                'metrics': ['.+'],
+                'use_streaming_parser': True,
+                'share_labels': {'go_memstats_alloc_bytes': True},
+                'exclude_metrics': ['go_memstats_alloc_bytes'],
+            }
+        )
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_gc_sys_bytes',
+            901120,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'bar:foo', 'foo:bar'],
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+
 class TestMetrics:
     def test_unknown_type_override(self, aggregator, dd_run_check, mock_http_response):
         mock_http_response(
@@ -684,6 +817,112 @@ class TestShareLabels:
 
         aggregator.assert_all_metrics_covered()
 
+    @pytest.mark.parametrize('use_streaming_parser', [False, True])
+    @pytest.mark.parametrize('cache_shared_labels', [False, True])
+    def test_prefetch_shared_labels(self, aggregator, dd_run_check, use_streaming_parser, cache_shared_labels):
+        payload = dedent(
+            """
+            # HELP go_memstats_gc_sys_bytes Number of bytes used for garbage collection system metadata.
+            # TYPE go_memstats_gc_sys_bytes gauge
+            go_memstats_gc_sys_bytes{bar="foo"} 901120
+            # HELP go_memstats_alloc_bytes_peak Maximum number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes_peak gauge
+            go_memstats_alloc_bytes_peak{bar="baz"} 9.339544592e+09
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            """
+        )
+        check = get_check(
+            {
+                'metrics': ['go_memstats_gc_sys_bytes', 'go_memstats_alloc_bytes_peak'],
+                'share_labels': {'go_memstats_alloc_bytes': True},
+                'cache_shared_labels': cache_shared_labels,
+                'prefetch_shared_labels': True,
+                'use_streaming_parser': use_streaming_parser,
+            }
+        )
+
+        # Every request must get its own response
+        with mock.patch('requests.get', side_effect=lambda *args, **kwargs: MockResponse(payload)) as get:
+            dd_run_check(check)
+
+        assert get.call_count == 2
+        aggregator.assert_metric(
+            'test.go_memstats_gc_sys_bytes',
+            901120,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'bar:foo', 'foo:bar'],
+        )
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes_peak',
+            9339544592,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'bar:baz', 'foo:bar'],
+        )
+        aggregator.assert_all_metrics_covered()
+
+    def test_match_indexed_label_sets(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP kube_pod_info Information about pod.
+            # TYPE kube_pod_info gauge
+            kube_pod_info{namespace="ns1",pod="p1",node="n1"} 1
+            kube_pod_info{namespace="ns1",pod="p2",node="n2"} 1
+            kube_pod_info{pod="p3",node="n3"} 1
+            # HELP kube_pod_owner Information about the Pod's owner.
+            # TYPE kube_pod_owner gauge
+            kube_pod_owner{namespace="ns1",pod="p1",owner="o1"} 1
+            # HELP kube_pod_status_ready Describes whether the pod is ready to serve requests.
+            # TYPE kube_pod_status_ready gauge
+            kube_pod_status_ready{namespace="ns1",pod="p1"} 1
+            kube_pod_status_ready{namespace="ns1",pod="p3"} 1
+            kube_pod_status_ready{namespace="ns2",pod="p4"} 1
+            """
+        )
+        check = get_check(
+            {
+                'metrics': ['.+'],
+                'share_labels': {
+                    'kube_pod_info': {'match': ['namespace', 'pod'], 'labels': ['node']},
+                    'kube_pod_owner': {'match': ['namespace', 'pod'], 'labels': ['owner']},
+                },
+                'telemetry': True,
+            }
+        )
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.kube_pod_status_ready',
+            1,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'namespace:ns1', 'pod:p1', 'node:n1', 'owner:o1'],
+        )
+        # Source samples missing some of the labels to match share labels with more samples
+        aggregator.assert_metric(
+            'test.kube_pod_status_ready',
+            1,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'namespace:ns1', 'pod:p3', 'node:n3'],
+        )
+        aggregator.assert_metric(
+            'test.kube_pod_status_ready',
+            1,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'namespace:ns2', 'pod:p4'],
+        )
+        aggregator.assert_metric('test.telemetry.shared_labels.index.build_time', tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.shared_labels.lookups.count', 7, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.shared_labels.hits.count', 6, tags=['endpoint:test'])
+
+        # The index is only built once
+        aggregator.reset()
+        dd_run_check(check)
+
+        aggregator.assert_metric('test.telemetry.shared_labels.index.build_time', count=0)
+        aggregator.assert_metric('test.telemetry.shared_labels.lookups.count', 7, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.shared_labels.hits.count', 6, tags=['endpoint:test'])
+
 
 class TestIgnoreTags:
     def test_simple_match(self, aggregator, dd_run_check, mock_http_response):
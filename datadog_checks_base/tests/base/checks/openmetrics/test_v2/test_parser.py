@@ -0,0 +1,95 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import os
+from textwrap import dedent
+
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+from datadog_checks.base.checks.openmetrics.v2.parser import StreamingTextParser
+from datadog_checks.dev import get_here
+from datadog_checks.dev.testing import requires_py3
+
+pytestmark = [requires_py3]
+
+HERE = get_here()
+FIXTURE_PATH = os.path.abspath(os.path.join(os.path.dirname(HERE), '..', '..', '..', 'fixtures', 'prometheus'))
+
+
+def parse(text, family_filter=None):
+    parser = StreamingTextParser(family_filter)
+    return list(parser(dedent(text).encode('utf-8').splitlines())), parser
+
+
+@pytest.mark.parametrize('fixture', ['ksm.txt', 'amazon_msk_jmx_metrics.txt', 'metrics.txt', 'deprecated.txt'])
+def test_parity_with_prometheus_client(fixture):
+    with open(os.path.join(FIXTURE_PATH, fixture), 'rb') as f:
+        content = f.read()
+
+    expected = list(text_string_to_metric_families(content.decode('utf-8')))
+    metrics = list(StreamingTextParser()(content.splitlines()))
+
+    assert metrics == expected
+
+
+def test_parity_edge_cases():
+    text = """
+    # HELP foo_total A counter with\\nescaped help.
+    # TYPE foo_total counter
+    foo_total{bar="b\\"a\\\\z\\n", baz = "qux" ,} 3 1601280000000
+    # TYPE bar counter
+    bar 5
+    # HELP baz A histogram.
+    # TYPE baz histogram
+    baz_bucket{le="1.0"} 1
+    baz_bucket{le="+Inf"} 2
+    baz_sum 3.5
+    baz_count 2
+    # TYPE qux summary
+    qux{quantile="0.5"} 2.5
+    qux_sum 1e+06
+    qux_count 1
+    untyped_metric{label="value"} -Inf
+
+    # TYPE empty gauge
+    # TYPE tabs gauge
+    tabs\t4
+    """
+    metrics, _ = parse(text)
+
+    assert metrics == list(text_string_to_metric_families(dedent(text)))
+
+
+def test_family_filter():
+    text = """
+    # HELP foo Foo.
+    # TYPE foo gauge
+    foo{bar="baz"} 1
+    foo{bar="qux"} 2
+    # TYPE bar_total counter
+    bar_total 5
+    baz 3
+    """
+    filtered = []
+
+    def family_filter(name):
+        filtered.append(name)
+        return name != 'foo'
+
+    metrics, parser = parse(text, family_filter)
+
+    assert [metric.name for metric in metrics] == ['foo']
+    assert [sample.labels for sample in metrics[0].samples] == [{'bar': 'baz'}, {'bar': 'qux'}]
+    assert filtered == ['foo', 'bar', 'baz']
+    assert parser.skipped_samples == 2
+
+
+def test_skipped_samples_reset():
+    parser = StreamingTextParser(lambda name: True)
+
+    assert list(parser([b'foo 1', b'bar 2'])) == []
+    assert parser.skipped_samples == 2
+
+    assert list(parser([b'foo 1'])) == []
+    assert parser.skipped_samples == 1
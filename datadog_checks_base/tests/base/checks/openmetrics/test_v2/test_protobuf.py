@@ -0,0 +1,325 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import os
+import struct
+from textwrap import dedent
+
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+from datadog_checks.base.checks.openmetrics.v2.protobuf import ProtobufParser
+from datadog_checks.dev import get_here
+from datadog_checks.dev.testing import requires_py3
+
+from .utils import get_check
+
+pytestmark = [requires_py3]
+
+HERE = get_here()
+FIXTURE_PATH = os.path.abspath(os.path.join(os.path.dirname(HERE), '..', '..', '..', 'fixtures', 'prometheus'))
+
+COUNTER, GAUGE, SUMMARY, UNTYPED, HISTOGRAM, GAUGE_HISTOGRAM = range(6)
+
+
+def varint(value):
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append(value & 0x7F | 0x80)
+        value >>= 7
+    encoded.append(value)
+
+    return bytes(encoded)
+
+
+def field(number, value):
+    # Integers are varints, floats are doubles and the rest is length-delimited
+    if isinstance(value, int):
+        return varint(number << 3) + varint(value % (1 << 64))
+    elif isinstance(value, float):
+        return varint(number << 3 | 1) + struct.pack('<d', value)
+
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return varint(number << 3 | 2) + varint(len(value)) + value
+
+
+def zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def message(*fields):
+    return b''.join(fields)
+
+
+def metric_family(name, metric_type, *metrics, documentation=''):
+    family = message(field(1, name), field(2, documentation), field(3, metric_type), *(field(4, m) for m in metrics))
+    return varint(len(family)) + family
+
+
+def metric(*fields, labels=None):
+    label_pairs = [field(1, message(field(1, name), field(2, value))) for name, value in (labels or {}).items()]
+    return message(*label_pairs, *fields)
+
+
+def parse(payload, family_filter=None, chunk_size=None):
+    if chunk_size is None:
+        chunks = [payload]
+    else:
+        chunks = [payload[i : i + chunk_size] for i in range(0, len(payload), chunk_size)]
+
+    parser = ProtobufParser(family_filter)
+    return list(parser(chunks)), parser
+
+
+def assert_families_equal(families, text):
+    expected = list(text_string_to_metric_families(dedent(text)))
+    assert [(f.name, f.documentation, f.type, f.samples) for f in families] == [
+        (f.name, f.documentation, f.type, f.samples) for f in expected
+    ]
+
+
+CLASSIC_PAYLOAD = b''.join(
+    [
+        metric_family(
+            'http_requests_total',
+            COUNTER,
+            metric(field(3, message(field(1, 1027.0))), labels={'method': 'post', 'code': '200'}),
+            metric(field(3, message(field(1, 3.0))), field(6, 1395066363000), labels={'method': 'post', 'code': '400'}),
+            documentation='The total number of HTTP requests.',
+        ),
+        metric_family('go_goroutines', GAUGE, metric(field(2, message(field(1, 23.0)))), documentation='Goroutines.'),
+        metric_family('process_start', UNTYPED, metric(field(5, message(field(1, -1.5))))),
+        metric_family(
+            'rpc_duration_seconds',
+            SUMMARY,
+            metric(
+                field(
+                    4,
+                    message(
+                        field(1, 2693),
+                        field(2, 17560473.0),
+                        field(3, message(field(1, 0.01), field(2, 3102.0))),
+                        field(3, message(field(1, 0.5), field(2, 4773.0))),
+                        field(3, message(field(1, 1.0), field(2, 76656.0))),
+                    ),
+                ),
+                labels={'service': 'a'},
+            ),
+            documentation='A summary of the RPC duration in seconds.',
+        ),
+        metric_family(
+            'http_request_duration_seconds',
+            HISTOGRAM,
+            metric(
+                field(
+                    7,
+                    message(
+                        field(1, 144320),
+                        field(2, 53423.0),
+                        field(3, message(field(1, 24054), field(2, 1e-05))),
+                        field(3, message(field(1, 129389), field(2, 0.05))),
+                        field(3, message(field(1, 133988), field(2, 1.0))),
+                    ),
+                )
+            ),
+            documentation='A histogram of the request duration.',
+        ),
+    ]
+)
+
+CLASSIC_TEXT = """
+    # HELP http_requests_total The total number of HTTP requests.
+    # TYPE http_requests_total counter
+    http_requests_total{method="post",code="200"} 1027
+    http_requests_total{method="post",code="400"} 3 1395066363000
+    # HELP go_goroutines Goroutines.
+    # TYPE go_goroutines gauge
+    go_goroutines 23
+    process_start -1.5
+    # HELP rpc_duration_seconds A summary of the RPC duration in seconds.
+    # TYPE rpc_duration_seconds summary
+    rpc_duration_seconds{service="a",quantile="0.01"} 3102
+    rpc_duration_seconds{service="a",quantile="0.5"} 4773
+    rpc_duration_seconds{service="a",quantile="1"} 76656
+    rpc_duration_seconds_sum{service="a"} 1.7560473e+07
+    rpc_duration_seconds_count{service="a"} 2693
+    # HELP http_request_duration_seconds A histogram of the request duration.
+    # TYPE http_request_duration_seconds histogram
+    http_request_duration_seconds_bucket{le="1e-05"} 24054
+    http_request_duration_seconds_bucket{le="0.05"} 129389
+    http_request_duration_seconds_bucket{le="1"} 133988
+    http_request_duration_seconds_bucket{le="+Inf"} 144320
+    http_request_duration_seconds_sum 53423
+    http_request_duration_seconds_count 144320
+    """
+
+
+def test_parity_with_text_format():
+    families, _ = parse(CLASSIC_PAYLOAD)
+
+    assert_families_equal(families, CLASSIC_TEXT)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 100])
+def test_chunk_boundaries(chunk_size):
+    families, _ = parse(CLASSIC_PAYLOAD, chunk_size=chunk_size)
+
+    assert_families_equal(families, CLASSIC_TEXT)
+
+
+def test_fixture():
+    with open(os.path.join(FIXTURE_PATH, 'protobuf.bin'), 'rb') as f:
+        families, _ = parse(f.read())
+
+    assert len(families) == 61
+    family = next(family for family in families if family.name == 'go_gc_duration_seconds')
+    assert family.type == 'summary'
+    assert [sample.labels['quantile'] for sample in family.samples[:-2]] == ['0', '0.25', '0.5', '0.75', '1']
+
+
+def test_family_filter():
+    families, parser = parse(CLASSIC_PAYLOAD, lambda name: name in ('http_requests', 'rpc_duration_seconds'))
+
+    assert [family.name for family in families] == ['go_goroutines', 'process_start', 'http_request_duration_seconds']
+    assert parser.skipped_samples == 3
+
+
+def test_truncated_message():
+    # The last message is announced as 10 bytes long but only has 2
+    with pytest.raises(ValueError, match='^Truncated protobuf message: 3 trailing bytes$'):
+        parse(CLASSIC_PAYLOAD + b'\x0a\x0a\x01')
+
+
+def test_unknown_fields():
+    families, _ = parse(
+        metric_family(
+            'go_goroutines', GAUGE, metric(field(2, message(field(1, 23.0), field(9, 'foo'))), field(15, 1.0))
+        )
+        + CLASSIC_PAYLOAD
+    )
+
+    assert families[0].samples[0].value == 23
+    assert len(families) == 6
+
+
+def test_native_histogram():
+    histogram = message(
+        field(1, 9),
+        field(2, 10.5),
+        field(5, zigzag(0)),
+        field(6, 0.001),
+        field(7, 1),
+        # Negative buckets, with deltas encoded one field at a time
+        field(9, message(field(1, zigzag(1)), field(2, 1))),
+        field(10, zigzag(1)),
+        # Positive buckets, with packed deltas
+        field(12, message(field(1, zigzag(0)), field(2, 2))),
+        field(12, message(field(1, zigzag(1)), field(2, 1))),
+        field(13, b''.join(varint(zigzag(delta)) for delta in (2, -1, 3))),
+    )
+    families, _ = parse(metric_family('rpc_latency_seconds', HISTOGRAM, metric(field(7, histogram))))
+
+    assert_families_equal(
+        families,
+        """
+        # TYPE rpc_latency_seconds histogram
+        rpc_latency_seconds_bucket{le="-1"} 1
+        rpc_latency_seconds_bucket{le="-0.001"} 1
+        rpc_latency_seconds_bucket{le="0.001"} 2
+        rpc_latency_seconds_bucket{le="0.5"} 2
+        rpc_latency_seconds_bucket{le="1"} 4
+        rpc_latency_seconds_bucket{le="2"} 5
+        rpc_latency_seconds_bucket{le="4"} 5
+        rpc_latency_seconds_bucket{le="8"} 9
+        rpc_latency_seconds_bucket{le="+Inf"} 9
+        rpc_latency_seconds_sum 10.5
+        rpc_latency_seconds_count 9
+        """,
+    )
+
+
+def test_native_float_histogram():
+    histogram = message(
+        field(4, 3.5),
+        field(2, 1.25),
+        field(5, zigzag(1)),
+        field(12, message(field(1, zigzag(-1)), field(2, 2))),
+        field(14, struct.pack('<2d', 1.0, 2.5)),
+    )
+    families, _ = parse(metric_family('rpc_latency_seconds', HISTOGRAM, metric(field(7, histogram))))
+
+    assert_families_equal(
+        families,
+        """
+        # TYPE rpc_latency_seconds histogram
+        rpc_latency_seconds_bucket{le="0.7071067811865476"} 1
+        rpc_latency_seconds_bucket{le="1"} 3.5
+        rpc_latency_seconds_bucket{le="+Inf"} 3.5
+        rpc_latency_seconds_sum 1.25
+        rpc_latency_seconds_count 3.5
+        """,
+    )
+
+
+def test_native_histogram_with_classic_buckets():
+    histogram = message(
+        field(1, 3),
+        field(2, 4.0),
+        field(3, message(field(1, 1), field(2, 1.0))),
+        field(12, message(field(1, zigzag(1)), field(2, 1))),
+        field(13, zigzag(3)),
+    )
+    families, _ = parse(metric_family('rpc_latency_seconds', GAUGE_HISTOGRAM, metric(field(7, histogram))))
+
+    assert [(sample.name, sample.labels, sample.value) for sample in families[0].samples] == [
+        ('rpc_latency_seconds_bucket', {'le': '1'}, 1),
+        ('rpc_latency_seconds_bucket', {'le': '+Inf'}, 3),
+        ('rpc_latency_seconds_gsum', {}, 4),
+        ('rpc_latency_seconds_gcount', {}, 3),
+    ]
+
+
+def test_scraper(aggregator, dd_run_check, mock_http_response, tmp_path):
+    histogram = message(
+        field(1, 3),
+        field(2, 4.0),
+        field(5, zigzag(0)),
+        field(12, message(field(1, zigzag(0)), field(2, 2))),
+        field(13, b''.join(varint(zigzag(delta)) for delta in (1, 1))),
+    )
+    payload = CLASSIC_PAYLOAD + metric_family('rpc_latency_seconds', HISTOGRAM, metric(field(7, histogram)))
+    file_path = tmp_path / 'metrics.bin'
+    file_path.write_bytes(payload)
+
+    mock_http_response(
+        file_path=str(file_path),
+        headers={
+            'Content-Type': (
+                'application/vnd.google.protobuf; proto=io.prometheus.client.MetricFamily; encoding=delimited'
+            )
+        },
+    )
+    check = get_check(
+        {'metrics': ['go_goroutines', 'rpc_.+'], 'use_protobuf': True, 'telemetry': True, 'raw_line_filters': ['^go_']}
+    )
+    dd_run_check(check)
+
+    aggregator.assert_metric('test.go_goroutines', 23, metric_type=aggregator.GAUGE, tags=['endpoint:test'])
+    aggregator.assert_metric(
+        'test.rpc_duration_seconds.quantile', 3102, tags=['endpoint:test', 'service:a', 'quantile:0.01']
+    )
+    aggregator.assert_metric('test.rpc_duration_seconds.sum', 17560473, tags=['endpoint:test', 'service:a'])
+    aggregator.assert_metric('test.rpc_duration_seconds.count', 2693, tags=['endpoint:test', 'service:a'])
+    for upper_bound, value in (('1.0', 1), ('2.0', 3)):
+        aggregator.assert_metric(
+            'test.rpc_latency_seconds.bucket', value, tags=['endpoint:test', f'upper_bound:{upper_bound}']
+        )
+    aggregator.assert_metric('test.rpc_latency_seconds.sum', 4, tags=['endpoint:test'])
+    aggregator.assert_metric('test.rpc_latency_seconds.count', 3, tags=['endpoint:test'])
+    aggregator.assert_metric('test.telemetry.metrics.input.count', 15, tags=['endpoint:test'])
+    aggregator.assert_metric('test.telemetry.metrics.ignored.count', 4, tags=['endpoint:test'])
+    aggregator.assert_metric('test.telemetry.metrics.processed.count', 11, tags=['endpoint:test'])
+    aggregator.assert_metric('test.telemetry.payload.size', tags=['endpoint:test'])
+
+    aggregator.assert_all_metrics_covered()
@@ -5,6 +5,9 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import json
 import logging
+import re
+import sys
+import threading
 from typing import Any  # noqa: F401
 
 import mock
@@ -456,6 +459,73 @@ class TestMetrics:
         aggregator.assert_metric(metric_name, count=0)
 
 
+class TestMetricsBatch:
+    def test_single_name(self, aggregator):
+        check = AgentCheck()
+        check.__NAMESPACE__ = 'test'
+
+        check.submit_metrics_batch('gauge', 'metric', [1, 2, None], [['foo:bar'], None, ['baz:qux']], 'host')
+
+        aggregator.assert_metric('test.metric', 1, tags=['foo:bar'], hostname='host', count=1)
+        aggregator.assert_metric('test.metric', 2, tags=[], hostname='host', count=1)
+        aggregator.assert_metric('test.metric', count=2)
+
+    def test_multiple_names(self, aggregator):
+        check = AgentCheck()
+
+        check.submit_metrics_batch(
+            'monotonic_count', ['foo', 'bar', 'foo'], [1, 2, 3], [[], [], []], ['a', None, 'b'], raw=True
+        )
+
+        aggregator.assert_metric('foo', 1, metric_type=aggregator.MONOTONIC_COUNT, hostname='a', count=1)
+        aggregator.assert_metric('foo', 3, metric_type=aggregator.MONOTONIC_COUNT, hostname='b', count=1)
+        aggregator.assert_metric('bar', 2, metric_type=aggregator.MONOTONIC_COUNT, hostname='', count=1)
+
+    @pytest.mark.parametrize('metric_type', ['gauge', 'count', 'monotonic_count', 'rate', 'histogram', 'historate'])
+    def test_parity(self, aggregator, metric_type):
+        check = AgentCheck()
+        check.__NAMESPACE__ = 'test'
+
+        getattr(check, metric_type)('metric', 5, tags=['foo:bar'], hostname='host')
+        expected = aggregator.metrics('test.metric')
+        aggregator.reset()
+
+        check.submit_metrics_batch(metric_type, 'metric', [5], [['foo:bar']], 'host')
+
+        assert aggregator.metrics('test.metric') == expected
+
+    def test_unknown_metric_type(self, aggregator):
+        check = AgentCheck()
+
+        with pytest.raises(ValueError, match='Unknown metric type `foo`'):
+            check.submit_metrics_batch('foo', 'metric', [1], [[]])
+
+    def test_filtering(self, aggregator):
+        check = AgentCheck('test', {}, [{'metric_patterns': {'include': ['test.*'], 'exclude': ['test.excluded']}}])
+        check.__NAMESPACE__ = 'test'
+
+        check.submit_metrics_batch('gauge', ['metric', 'excluded', 'metric'], [1, 2, 3], [[], [], []])
+
+        aggregator.assert_metric('test.metric', count=2)
+        aggregator.assert_metric('test.excluded', count=0)
+
+    def test_metric_limit(self, aggregator):
+        check = LimitedCheck()
+
+        check.submit_metrics_batch('gauge', 'metric', [0] * 20, [[]] * 20)
+
+        assert len(check.get_warnings()) == 1
+        assert len(aggregator.metrics('metric')) == 10
+
+    def test_non_float_metric(self, aggregator):
+        check = AgentCheck()
+
+        with pytest.raises(ValueError):
+            check.submit_metrics_batch('gauge', 'metric', [1, '85k'], [[], []])
+
+        aggregator.assert_metric('metric', count=1)
+
+
 class TestEvents:
     def test_valid_event(self, aggregator):
         check = AgentCheck()
@@ -610,7 +680,7 @@ class TestTags:
         tags = [None, 'tag:foo']
 
         normalized_tags = check._normalize_tags_type(tags, None)
-        assert normalized_tags == ['tag:foo']
+        assert list(normalized_tags) == ['tag:foo']
         assert 'Error encoding tag' not in caplog.text
 
     def test_external_host_tag_normalization(self):
@@ -646,6 +716,86 @@ class TestTags:
         tags = check._normalize_tags_type(tags=["foo:bar", "cluster:my_cluster", "version", "bar"])
         assert set(tags) == expected_tags
 
+    def test_cache(self):
+        check = AgentCheck('myintegration', {}, [{'disable_generic_tags': True}])
+        tags = ['foo:bar', b'cluster:my_cluster', None]
+
+        normalized_tags = check._normalize_tags_type(tags)
+        assert normalized_tags == ('foo:bar', 'myintegration_cluster:my_cluster')
+        assert (check._tags_cache_hits, check._tags_cache_misses) == (0, 1)
+
+        # The normalized tags are shared rather than copied on every submission
+        assert check._normalize_tags_type(list(tags)) is normalized_tags
+        assert (check._tags_cache_hits, check._tags_cache_misses) == (1, 1)
+
+    def test_cache_eviction(self):
+        class TestCheck(AgentCheck):
+            TAGS_CACHE_SIZE = 2
+
+        check = TestCheck()
+        for tags in (['foo'], ['bar'], ['foo'], ['baz'], ['bar']):
+            check._normalize_tags_type(tags)
+
+        assert (check._tags_cache_hits, check._tags_cache_misses) == (1, 4)
+        assert len(check._tags_cache) == 2
+
+    @pytest.mark.skipif(not PY3, reason='Thread switch interval is only configurable on Python 3')
+    def test_cache_concurrent_submissions(self, aggregator):
+        class TestCheck(AgentCheck):
+            TAGS_CACHE_SIZE = 2
+
+        check = TestCheck()
+        errors = []
+
+        def submit(thread_id):
+            try:
+                for i in range(1000):
+                    check.gauge('metric', 1, tags=['thread:{}'.format(thread_id), 'tag:{}'.format(i % 5)])
+            except Exception as e:
+                errors.append(e)
+
+        # Switch threads as often as possible to expose races
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=submit, args=(thread_id,)) for thread_id in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        assert not errors
+        assert len(aggregator.metrics('metric')) == 8000
+        assert check._tags_cache_hits + check._tags_cache_misses == 8000
+        assert len(check._tags_cache) == 2
+
+    def test_cache_disabled(self):
+        class TestCheck(AgentCheck):
+            TAGS_CACHE_SIZE = 0
+
+        check = TestCheck()
+        check._normalize_tags_type(['foo'])
+        check._normalize_tags_type(['foo'])
+
+        assert check._tags_cache is None
+        assert (check._tags_cache_hits, check._tags_cache_misses) == (0, 0)
+
+    def test_cache_debug_metrics(self, aggregator, dd_run_check):
+        class TestCheck(AgentCheck):
+            def check(self, _):
+                for _ in range(3):
+                    self.gauge('foo', 0, tags=['bar:baz'])
+
+        check = TestCheck('test', {}, [{'debug_metrics': {'tags_cache': True}}])
+        dd_run_check(check)
+
+        aggregator.assert_metric('datadog.agent.metrics.tags_cache.hits', 2)
+        aggregator.assert_metric('datadog.agent.metrics.tags_cache.misses', 1)
+        aggregator.assert_metric('datadog.agent.metrics.tags_cache.size', 1)
+        assert (check._tags_cache_hits, check._tags_cache_misses) == (0, 0)
+
     @pytest.mark.parametrize(
         "exclude_metrics_filters, include_metrics_filters, expected_metrics",
         [
@@ -710,6 +860,51 @@ class TestTags:
         aggregator.assert_service_check('ns.test.can_check', status=AgentCheck.OK)
         aggregator.assert_all_metrics_covered()
 
+    def test_metrics_filters_cache(self, aggregator):
+        check = AgentCheck('myintegration', {}, [{'metric_patterns': {'exclude': ['foo']}}])
+
+        with mock.patch.object(check, '_metric_excluded', wraps=check._metric_excluded) as metric_excluded:
+            for _ in range(3):
+                check.gauge('foo', 0)
+                check.gauge('bar', 0)
+
+            assert metric_excluded.call_count == 2
+
+        # Decisions are invalidated when patterns change
+        check.exclude_metrics_pattern = None
+        check.include_metrics_pattern = re.compile('foo')
+        check.gauge('foo', 0)
+        check.gauge('bar', 0)
+
+        aggregator.assert_metric('foo', count=1)
+        aggregator.assert_metric('bar', count=3)
+
+    def test_metrics_filters_cache_size(self):
+        class TestCheck(AgentCheck):
+            METRIC_DECISIONS_CACHE_SIZE = 1
+
+        check = TestCheck('myintegration', {}, [{'metric_patterns': {'exclude': ['foo']}}])
+
+        assert check.should_send_metric('foo') is False
+        assert check.should_send_metric('bar') is True
+        assert check._metric_decisions == {'foo': False}
+
+    def test_resolve_metric_decisions(self, aggregator):
+        check = AgentCheck('myintegration', {}, [{'metric_patterns': {'include': [r'^ns\.foo']}}])
+        check.__NAMESPACE__ = 'ns'
+
+        assert check.resolve_metric_decisions(['foo', 'bar']) == {'foo': True, 'bar': False}
+        assert check.resolve_metric_decisions(['ns.foo'], raw=True) == {'ns.foo': True}
+
+        with mock.patch.object(check, '_metric_included') as metric_included:
+            check.gauge('foo', 0)
+            check.gauge('bar', 0)
+
+            metric_included.assert_not_called()
+
+        aggregator.assert_metric('ns.foo', count=1)
+        aggregator.assert_all_metrics_covered()
+
     @pytest.mark.parametrize(
         "exclude_metrics_filters, include_metrics_filters, expected_error",
         [
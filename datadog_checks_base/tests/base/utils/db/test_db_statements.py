@@ -181,3 +181,50 @@ class TestStatementMetrics:
         ]
 
         assert expected_merged_metrics == metrics
+
+    def test_compute_derivative_rows_removed_rows(self):
+        sm = StatementMetrics()
+
+        def key(row):
+            return row['query']
+
+        metrics = ['count', 'time']
+
+        rows1 = [{'count': 1, 'time': 1, 'query': 'COMMIT'}, {'count': 1, 'time': 1, 'query': 'ROLLBACK'}]
+        rows2 = [{'count': 2, 'time': 2, 'query': 'ROLLBACK'}]
+        rows3 = [{'count': 3, 'time': 3, 'query': 'ROLLBACK'}, {'count': 5, 'time': 5, 'query': 'COMMIT'}]
+
+        assert [] == sm.compute_derivative_rows(rows1, metrics, key=key)
+        assert [{'count': 1, 'time': 1, 'query': 'ROLLBACK'}] == sm.compute_derivative_rows(rows2, metrics, key=key)
+        # Rows absent from the previous run are tracked from this run forward
+        assert [{'count': 1, 'time': 1, 'query': 'ROLLBACK'}] == sm.compute_derivative_rows(rows3, metrics, key=key)
+
+    def test_compute_derivative_rows_columns_change(self):
+        sm = StatementMetrics()
+
+        def key(row):
+            return row['query']
+
+        metrics = ['count', 'time']
+
+        rows1 = [{'count': 1, 'query': 'COMMIT'}]
+        rows2 = [{'count': 2, 'time': 2, 'query': 'COMMIT'}]
+        rows3 = [{'count': 3, 'time': 3, 'query': 'COMMIT'}]
+
+        assert [] == sm.compute_derivative_rows(rows1, metrics, key=key)
+        # The previous values are discarded when the available metrics change
+        assert [] == sm.compute_derivative_rows(rows2, metrics, key=key)
+        assert [{'count': 1, 'time': 1, 'query': 'COMMIT'}] == sm.compute_derivative_rows(rows3, metrics, key=key)
+
+    def test_compute_derivative_rows_does_not_mutate_rows(self):
+        sm = StatementMetrics()
+
+        def key(row):
+            return row['query']
+
+        rows1 = [{'count': 1, 'query': 'COMMIT'}, {'count': 1, 'query': 'COMMIT'}]
+        rows2 = [{'count': 2, 'query': 'COMMIT'}, {'count': 3, 'query': 'COMMIT'}]
+
+        sm.compute_derivative_rows(rows1, ['count'], key=key)
+        assert [{'count': 3, 'query': 'COMMIT'}] == sm.compute_derivative_rows(rows2, ['count'], key=key)
+        assert rows2 == [{'count': 2, 'query': 'COMMIT'}, {'count': 3, 'query': 'COMMIT'}]
@@ -3,6 +3,7 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import logging
 
+import mock
 import pytest
 
 from datadog_checks.base import AgentCheck
@@ -1210,3 +1211,124 @@ class TestSubmission:
             )
 
         aggregator.assert_all_metrics_covered()
+
+
+class TestColumnarSubmission:
+    @pytest.mark.parametrize(
+        'metric_type_name, metric_type_id',
+        [item for item in AggregatorStub.METRIC_ENUM_MAP.items() if item[0] != 'counter'],
+        ids=[metric_type for metric_type in AggregatorStub.METRIC_ENUM_MAP if metric_type != 'counter'],
+    )
+    def test_basic(self, metric_type_name, metric_type_id, aggregator):
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [{'name': 'level', 'type': 'tag'}, None, {'name': 'test.foo', 'type': metric_type_name}],
+                'tags': ['test:bar'],
+            },
+            executor=mock_executor([['over', 'stuff', 9000]]),
+            tags=['test:foo'],
+            columnar=True,
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        aggregator.assert_metric(
+            'test.foo', 9000, metric_type=metric_type_id, tags=['test:foo', 'test:bar', 'level:over']
+        )
+        aggregator.assert_all_metrics_covered()
+
+    def test_batch_submission(self, aggregator):
+        check = AgentCheck('test', {}, [{}])
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [
+                    {'name': 'test.foo', 'type': 'gauge'},
+                    {'name': 'test.bar', 'type': 'gauge', 'tags': ['override:ok']},
+                    {'name': 'tag', 'type': 'tag'},
+                    {'name': 'tags', 'type': 'tag_list'},
+                ],
+                'tags': ['test:bar'],
+            },
+            check=check,
+            executor=mock_executor([[3, 1, 'tag1', 'a,b'], [7, 2, 'tag2', ['c']], [5, 3, 'tag1', '']]),
+            tags=['test:foo'],
+            hostname='test-hostname',
+            columnar=True,
+        )
+        with mock.patch.object(check, 'submit_metrics_batch', wraps=check.submit_metrics_batch) as batch:
+            query_manager.compile_queries()
+            query_manager.execute()
+
+        # Only the column without a tags override is submitted at once
+        batch.assert_called_once_with(
+            'gauge',
+            ['test.foo', 'test.foo', 'test.foo'],
+            [3, 7, 5],
+            [
+                ['test:foo', 'test:bar', 'tag:tag1', 'tags:a', 'tags:b'],
+                ['test:foo', 'test:bar', 'tag:tag2', 'tags:c'],
+                ['test:foo', 'test:bar', 'tag:tag1', 'tags:'],
+            ],
+            'test-hostname',
+            raw=False,
+        )
+        aggregator.assert_metric(
+            'test.foo', 3, tags=['test:foo', 'test:bar', 'tag:tag1', 'tags:a', 'tags:b'], hostname='test-hostname'
+        )
+        aggregator.assert_metric(
+            'test.foo', 7, tags=['test:foo', 'test:bar', 'tag:tag2', 'tags:c'], hostname='test-hostname'
+        )
+        aggregator.assert_metric(
+            'test.foo', 5, tags=['test:foo', 'test:bar', 'tag:tag1', 'tags:'], hostname='test-hostname'
+        )
+        for value in (1, 2, 3):
+            aggregator.assert_metric('test.bar', value, tags=['override:ok'], hostname='test-hostname')
+        aggregator.assert_all_metrics_covered()
+
+    def test_sources_and_extras(self, aggregator):
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [
+                    {'name': 'test.foo', 'type': 'monotonic_gauge'},
+                    {'name': 'tag', 'type': 'tag'},
+                    {'name': '_source', 'type': 'source'},
+                ],
+                'extras': [{'name': 'test.baz', 'expression': '_source * 1000', 'submit_type': 'gauge'}],
+            },
+            executor=mock_executor([[3, 'tag1', 2], [7, 'tag2', 5], [5, 'tag3', 6]]),
+            columnar=True,
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        for value, source, tag in [(3, 2, 'tag1'), (7, 5, 'tag2'), (5, 6, 'tag3')]:
+            tags = ['tag:{}'.format(tag)]
+            aggregator.assert_metric('test.foo.total', value, metric_type=aggregator.GAUGE, tags=tags)
+            aggregator.assert_metric('test.foo.count', value, metric_type=aggregator.MONOTONIC_COUNT, tags=tags)
+            aggregator.assert_metric('test.baz', source * 1000, metric_type=aggregator.GAUGE, tags=tags)
+
+        aggregator.assert_all_metrics_covered()
+
+    def test_result_length_mismatch(self, caplog, aggregator):
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [{'name': 'test.foo', 'type': 'gauge'}, {'name': 'tag', 'type': 'tag'}],
+            },
+            executor=mock_executor([[1, 'tag1'], [2], [3, 'tag3']]),
+            columnar=True,
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        assert 'Query test query expected 2 columns, got 1' in caplog.text
+        aggregator.assert_metric('test.foo', 1, tags=['tag:tag1'])
+        aggregator.assert_metric('test.foo', 3, tags=['tag:tag3'])
+        aggregator.assert_all_metrics_covered()
@@ -254,3 +254,96 @@ def test_dbm_async_job_inactive_stop(aggregator):
     job.run_job_loop([])
     job._job_loop_future.result()
     aggregator.assert_metric("dd.test-dbms.async_job.inactive_stop", tags=['job:test-job'])
+
+
+@pytest.fixture
+def dbm_async_job_scheduler(monkeypatch):
+    monkeypatch.setitem(datadog_agent._config, 'dbm_async_job_scheduler_workers', '2')
+    monkeypatch.setattr(DBMAsyncJob, 'scheduler', None)
+    yield
+    scheduler = DBMAsyncJob.scheduler
+    if scheduler is not None:
+        scheduler.shutdown(wait=True)
+
+
+@pytest.mark.parametrize('workers', ['', '0', 'auto'])
+def test_dbm_async_job_scheduler_disabled(aggregator, monkeypatch, workers):
+    monkeypatch.setitem(datadog_agent._config, 'dbm_async_job_scheduler_workers', workers)
+    monkeypatch.setattr(DBMAsyncJob, 'scheduler', None)
+    assert DBMAsyncJob.get_scheduler() is None
+
+    job = TestJob(AgentCheck(), rate_limit=100)
+    job.run_job_loop([])
+    assert job._job_loop_future.running()
+    job.cancel()
+    job._job_loop_future.result(timeout=5)
+    assert DBMAsyncJob.scheduler is None
+    assert not aggregator.metrics("dd.test-dbms.async_job.queue_wait")
+
+
+def test_dbm_async_job_scheduled_cancel(aggregator, dbm_async_job_scheduler):
+    job = TestJob(AgentCheck(), rate_limit=100)
+    tags = ["hello:there"]
+    job.run_job_loop(tags)
+    assert job._job_loop_future.running()
+
+    time.sleep(0.1)
+    job.cancel()
+    job._job_loop_future.result(timeout=5)
+
+    expected_tags = tags + ['job:test-job']
+    aggregator.assert_metric("dbm.async_job_test.run_job")
+    aggregator.assert_metric("dd.test-dbms.async_job.queue_wait", tags=expected_tags)
+    aggregator.assert_metric("dd.test-dbms.async_job.cancel", tags=expected_tags)
+    aggregator.assert_metric("dbm.async_job_test.shutdown")
+    assert not aggregator.metrics("dd.test-dbms.async_job.overrun")
+
+
+def test_dbm_async_job_scheduled_bounded_workers(aggregator, dbm_async_job_scheduler):
+    jobs = [TestJob(AgentCheck(), rate_limit=100) for _ in range(5)]
+    for i, job in enumerate(jobs):
+        job.run_job_loop(["job_id:{}".format(i)])
+
+    time.sleep(0.2)
+    for job in jobs:
+        job.cancel()
+    for job in jobs:
+        job._job_loop_future.result(timeout=5)
+
+    assert 1 <= len(DBMAsyncJob.scheduler._workers) <= 2
+    for i in range(5):
+        aggregator.assert_metric("dd.test-dbms.async_job.cancel", tags=["job_id:{}".format(i), 'job:test-job'])
+
+
+def test_dbm_async_job_scheduled_rate_limit(aggregator, dbm_async_job_scheduler):
+    job = TestJob(AgentCheck(), rate_limit=10)
+    job.run_job_loop([])
+
+    time.sleep(0.9)
+    job.cancel()
+    job._job_loop_future.result(timeout=5)
+
+    assert 5 <= len(aggregator.metrics("dbm.async_job_test.run_job")) <= 11
+
+
+def test_dbm_async_job_scheduled_overrun(aggregator, dbm_async_job_scheduler):
+    class SlowJob(TestJob):
+        def run_job(self):
+            time.sleep(0.05)
+
+    job = SlowJob(AgentCheck(), rate_limit=100)
+    job.run_job_loop([])
+
+    time.sleep(0.1)
+    job.cancel()
+    job._job_loop_future.result(timeout=5)
+
+    aggregator.assert_metric("dd.test-dbms.async_job.overrun", tags=['job:test-job'])
+
+
+def test_dbm_async_job_scheduled_inactive_stop(aggregator, dbm_async_job_scheduler):
+    job = TestJob(AgentCheck(), rate_limit=10, min_collection_interval=1)
+    job.run_job_loop([])
+    job._job_loop_future.result(timeout=5)
+    aggregator.assert_metric("dd.test-dbms.async_job.inactive_stop", tags=['job:test-job'])
+    aggregator.assert_metric("dbm.async_job_test.shutdown")
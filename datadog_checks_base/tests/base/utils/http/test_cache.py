@@ -0,0 +1,154 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import mock
+import pytest
+
+from datadog_checks.base.utils.http import RequestsWrapper
+from datadog_checks.base.utils.http_cache import ResponseCache
+from datadog_checks.dev.http import MockResponse
+
+pytestmark = [pytest.mark.unit]
+
+
+def test_config_default():
+    http = RequestsWrapper({}, {})
+
+    assert http.response_cache.max_size == 10485760
+
+
+def test_config_disabled():
+    http = RequestsWrapper({'response_cache_size': 0}, {})
+
+    assert http.response_cache is None
+    with mock.patch('requests.get', return_value=MockResponse('data')) as get:
+        http.get('http://localhost', cache_ttl=60)
+        http.get('http://localhost', cache_ttl=60)
+
+    assert get.call_count == 2
+
+
+def test_opt_in():
+    http = RequestsWrapper({}, {})
+
+    with mock.patch('requests.get', return_value=MockResponse('data')) as get:
+        http.get('http://localhost')
+        http.get('http://localhost')
+
+    assert get.call_count == 2
+    assert len(http.response_cache) == 0
+
+
+def test_ttl():
+    http = RequestsWrapper({}, {})
+
+    with mock.patch('requests.get', side_effect=lambda *args, **kwargs: MockResponse('data')) as get:
+        response = http.get('http://localhost', cache_ttl=60)
+        assert not getattr(response, 'from_cache', False)
+
+        response = http.get('http://localhost', cache_ttl=60)
+        assert response.from_cache
+        assert response.status_code == 200
+        assert response.text == 'data'
+        assert list(response.iter_content()) == [b'data']
+        assert get.call_count == 1
+
+        # Other URLs, parameters and headers are different requests
+        http.get('http://localhost/other', cache_ttl=60)
+        http.get('http://localhost', params={'a': 'b'}, cache_ttl=60)
+        http.get('http://localhost', extra_headers={'a': 'b'}, cache_ttl=60)
+        assert get.call_count == 4
+
+        with mock.patch('datadog_checks.base.utils.http_cache.get_precise_time', return_value=float('inf')):
+            http.get('http://localhost', cache_ttl=60)
+
+    assert get.call_count == 5
+    # Without validators, the request is not conditional
+    assert 'If-None-Match' not in get.call_args[1]['headers']
+
+
+def test_credentials():
+    http = RequestsWrapper({}, {})
+
+    with mock.patch('requests.get', side_effect=lambda *args, **kwargs: MockResponse('data')) as get:
+        http.get('http://localhost', auth=('user', 'pass'), cache_ttl=60)
+        http.get('http://localhost', auth=('user', 'pass'), cache_ttl=60)
+        http.get('http://localhost', auth=('user', 'other'), cache_ttl=60)
+        http.get('http://localhost', cache_ttl=60)
+
+    assert get.call_count == 3
+
+
+@pytest.mark.parametrize(
+    'response_header, value, request_header',
+    [
+        pytest.param('ETag', '"abc"', 'If-None-Match', id='etag'),
+        pytest.param('Last-Modified', 'Wed, 21 Oct 2015 07:28:00 GMT', 'If-Modified-Since', id='last-modified'),
+    ],
+)
+def test_conditional_requests(response_header, value, request_header):
+    http = RequestsWrapper({}, {})
+    responses = [
+        MockResponse('data', headers={response_header: value}),
+        MockResponse(status_code=304),
+        MockResponse('new data'),
+    ]
+
+    with mock.patch('requests.get', side_effect=responses) as get:
+        http.get('http://localhost', cache_ttl=0)
+        assert request_header not in get.call_args[1]['headers']
+
+        response = http.get('http://localhost', cache_ttl=0)
+        assert get.call_args[1]['headers'][request_header] == value
+        assert response.from_cache
+        assert response.status_code == 200
+        assert response.text == 'data'
+
+        response = http.get('http://localhost', cache_ttl=0)
+        assert get.call_args[1]['headers'][request_header] == value
+        assert not getattr(response, 'from_cache', False)
+        assert response.text == 'new data'
+
+    # The default headers are left untouched
+    assert request_header not in http.options['headers']
+
+
+def test_not_cached():
+    http = RequestsWrapper({}, {})
+    responses = [
+        MockResponse(status_code=404),
+        MockResponse('data', headers={'Cache-Control': 'no-store'}),
+        MockResponse('data'),
+    ]
+
+    with mock.patch('requests.get', side_effect=responses) as get:
+        http.get('http://localhost', cache_ttl=60)
+        http.get('http://localhost', cache_ttl=60)
+        http.get('http://localhost', stream=True, cache_ttl=60)
+
+    assert get.call_count == 3
+    assert len(http.response_cache) == 0
+
+
+def test_memory_budget():
+    cache = ResponseCache(30)
+
+    for i, content in enumerate(('a' * 10, 'b' * 10, 'c' * 40, 'd' * 15)):
+        cache.update(i, None, MockResponse(content), 60)
+
+    # The response too large for the cache is ignored, the least recently used one is evicted
+    assert 0 not in cache
+    assert 1 in cache
+    assert 2 not in cache
+    assert 3 in cache
+    assert cache.size == 25
+
+    cache.get(1)
+    cache.update(4, None, MockResponse('e' * 10), 60)
+    assert 1 in cache
+    assert 3 not in cache
+    assert cache.size == 20
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.size == 0
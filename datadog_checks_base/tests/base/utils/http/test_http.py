@@ -1,6 +1,7 @@
 # (C) Datadog, Inc. 2019-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import json
 import logging
 
 import mock
@@ -46,6 +47,31 @@ class TestRequestSize:
         assert len(chunks[1]) == payload_size - chunk_size
 
 
+class TestStreamingJSON:
+    def test_response(self, mock_http_response):
+        http = RequestsWrapper({'request_size': 0.01}, {})
+        mock_http_response(json.dumps({'queues': [{'name': 'queue{}'.format(i)} for i in range(100)]}))
+
+        with http.get('https://www.google.com', stream=True) as response:
+            queues = list(response.iter_json('queues'))
+
+        assert queues == [{'name': 'queue{}'.format(i)} for i in range(100)]
+
+    def test_request(self, mock_http_response):
+        http = RequestsWrapper({}, {})
+        mock_http_response(json.dumps({'nodes': {'node1': {'name': 'test'}}}))
+
+        assert list(http.iter_json('https://www.google.com', 'nodes')) == [('node1', {'name': 'test'})]
+        assert requests.get.call_args[1]['stream'] is True
+
+    def test_request_error(self, mock_http_response):
+        http = RequestsWrapper({}, {})
+        mock_http_response(status_code=500)
+
+        with pytest.raises(requests.HTTPError):
+            list(http.iter_json('https://www.google.com'))
+
+
 class TestUnixDomainSocket:
     @pytest.mark.parametrize(
         'value, expected',
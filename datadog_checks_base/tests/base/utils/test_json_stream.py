@@ -0,0 +1,83 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import json
+
+import pytest
+
+from datadog_checks.base.utils.json_stream import iter_json_items
+
+DOCUMENT = {
+    'cluster_name': 'test',
+    'skipped': {'nested': [1, {'string': '}]"{['}], 'escaped': 'x\\"y'},
+    'nodes': {
+        'node1': {'values': [1, -2.5e3, None, True, False, u'café']},
+        'node2': {},
+    },
+    'items': [1, 'two', [3], {'four': 4}, -5.5, None, 123456789],
+    'empty': [],
+}
+
+
+def make_chunks(document, chunk_size):
+    text = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    return [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 100, 10000])
+@pytest.mark.parametrize(
+    'path, expected',
+    [
+        pytest.param(None, sorted(DOCUMENT.items()), id='document'),
+        pytest.param('nodes', sorted(DOCUMENT['nodes'].items()), id='object'),
+        pytest.param('items', DOCUMENT['items'], id='array'),
+        pytest.param(['items'], DOCUMENT['items'], id='sequence'),
+        pytest.param('skipped.nested', DOCUMENT['skipped']['nested'], id='nested'),
+        pytest.param('items.3', [('four', 4)], id='index'),
+        pytest.param(('items', 2), [3], id='integer index'),
+        pytest.param('empty', [], id='empty'),
+        pytest.param('missing', [], id='missing key'),
+        pytest.param('items.10', [], id='missing index'),
+        pytest.param('cluster_name.missing', [], id='missing in scalar'),
+    ],
+)
+def test_iter_json_items(chunk_size, path, expected):
+    items = list(iter_json_items(make_chunks(DOCUMENT, chunk_size), path))
+    if path is None or path == 'nodes':
+        items.sort()
+
+    assert items == expected
+
+
+def test_iter_json_items_is_lazy():
+    def chunks():
+        yield b'[{"a": 1}, '
+        yield b'{"b": 2}, '
+        raise Exception('Read too much')
+
+    items = iter_json_items(chunks())
+
+    assert next(items) == {'a': 1}
+
+
+@pytest.mark.parametrize(
+    'text, message',
+    [
+        pytest.param(b'', 'Expected an array or an object', id='empty'),
+        pytest.param(b'"string"', 'Expected an array or an object', id='scalar'),
+        pytest.param(b'[1, 2', 'Expected `,` or `]`', id='unterminated array'),
+        pytest.param(b'{"a": 1', 'Expected `,` or `}`', id='unterminated object'),
+        pytest.param(b'[1 2]', 'Expected `,` or `]`', id='missing comma'),
+        pytest.param(b'{"a" 1}', 'Expected `:`', id='missing colon'),
+        pytest.param(b'{1: 2}', 'Expected an object key', id='invalid key'),
+        pytest.param(b'[tru]', 'Expecting value', id='invalid value'),
+    ],
+)
+def test_iter_json_items_malformed(text, message):
+    with pytest.raises(ValueError, match=message):
+        list(iter_json_items([text]))
+
+
+def test_iter_json_items_malformed_skipped_value():
+    with pytest.raises(ValueError, match='Expected the end of an array or an object'):
+        list(iter_json_items([b'{"a": [1, {"c": "]}"', b'}, "b": []'], 'b'))
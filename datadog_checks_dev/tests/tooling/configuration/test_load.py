@@ -2889,6 +2889,7 @@ def test_template_array():
         'connect_timeout',
         'read_timeout',
         'request_size',
+        'response_cache_size',
         'log_requests',
         'persist_connections',
         'allow_redirects',
@@ -107,6 +107,7 @@ class InstanceConfig(BaseModel):
     pshard_stats: Optional[bool]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     service: Optional[str]
     skip_proxy: Optional[bool]
     slm_stats: Optional[bool]
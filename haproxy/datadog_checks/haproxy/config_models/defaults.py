@@ -262,6 +262,10 @@ def instance_persist_connections(field, value):
     return False
 
 
+def instance_prefetch_shared_labels(field, value):
+    return False
+
+
 def instance_prometheus_metrics_prefix(field, value):
     return get_default_field_value(field, value)
 
@@ -294,6 +298,10 @@ def instance_request_size(field, value):
     return 16
 
 
+def instance_response_cache_size(field, value):
+    return 10240
+
+
 def instance_send_distribution_buckets(field, value):
     return False
 
@@ -426,5 +434,13 @@ def instance_use_prometheus(field, value):
     return False
 
 
+def instance_use_protobuf(field, value):
+    return False
+
+
+def instance_use_streaming_parser(field, value):
+    return False
+
+
 def instance_username(field, value):
     return get_default_field_value(field, value)
@@ -78,6 +78,7 @@ class InstanceConfig(BaseModel):
     proxy: Optional[Proxy]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     rmi_client_timeout: Optional[float]
     rmi_connection_timeout: Optional[float]
     rmi_registry_ssl: Optional[bool]
@@ -174,6 +174,10 @@ def instance_request_size(field, value):
     return 16
 
 
+def instance_response_cache_size(field, value):
+    return 10240
+
+
 def instance_reverse_content_match(field, value):
     return False
 
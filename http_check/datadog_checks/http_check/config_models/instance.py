@@ -86,6 +86,7 @@ class InstanceConfig(BaseModel):
     proxy: Optional[Proxy]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     reverse_content_match: Optional[bool]
     seconds_critical: Optional[int]
     seconds_warning: Optional[int]
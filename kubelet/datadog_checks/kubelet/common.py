@@ -3,6 +3,7 @@
 # Licensed under Simplified BSD License (see LICENSE)
 
 from datadog_checks.base.utils.tagging import tagger
+from datadog_checks.base.utils.time import get_precise_time
 
 try:
     from containers import is_excluded as c_is_excluded
@@ -112,9 +113,14 @@ class PodListUtils(object):
 
     Containers that are part of a static pod are not filtered, as we cannot currently
     reliably determine their image name to pass to the filtering logic.
+
+    Pods are indexed by uid and (namespace, name) tuple so that lookups done for every
+    metric sample do not scan the podlist, `stats` keeps track of the time spent building
+    the index and of the lookups done during the check run.
     """
 
     def __init__(self, podlist):
+        start = get_precise_time()
         self.containers = {}
         self.pods = {}
         self.static_pod_uids = set()
@@ -147,6 +153,37 @@ class PodListUtils(object):
                 self.container_id_by_name_tuple[(namespace, pod_name, ctr.get('name'))] = cid
                 self.container_id_to_namespace[cid] = namespace
 
+        self.stats = {
+            'pods': len(self.pods),
+            'containers': len(self.containers),
+            'build_time': get_precise_time() - start,
+            'lookups': 0,
+            'misses': 0,
+        }
+
+    def get_pod_by_uid(self, uid):
+        """
+        Get the pod from its uid
+
+        :param uid: pod uid
+        :return: pod dict object or None
+        """
+        self.stats['lookups'] += 1
+        # Unlike the podlist, the index can hold a pod without uid
+        pod = self.pods.get(uid) if uid is not None else None
+        if pod is None:
+            self.stats['misses'] += 1
+        return pod
+
+    def get_pod_by_name_tuple(self, name_tuple):
+        """
+        Get the pod from the tuple namespace and name
+
+        :param name_tuple: (pod_namespace, pod_name)
+        :return: pod dict object or None
+        """
+        return self.get_pod_by_uid(self.pod_uid_by_name_tuple.get(name_tuple))
+
     def get_uid_by_name_tuple(self, name_tuple):
         """
         Get the pod uid from the tuple namespace and name
@@ -391,11 +391,23 @@ class KubeletCheck(
             self.process(self.probes_scraper_config, metric_transformers=self.transformers)
 
         self.first_run = False
+        self._report_pod_list_telemetry(self.pod_list_utils)
 
         # Free up memory
         self.pod_list = None
         self.pod_list_utils = None
 
+    def _report_pod_list_telemetry(self, pod_list_utils):
+        """
+        Reports the size of the pod list index, the time spent building it
+        and the lookups done during the check run, if `telemetry` is enabled.
+        """
+        stats = pod_list_utils.stats
+        for stat in ('pods', 'containers', 'build_time'):
+            self._send_telemetry_gauge('pod_list.{}'.format(stat), stats[stat], self.kubelet_scraper_config)
+        for stat in ('lookups', 'misses'):
+            self._send_telemetry_counter('pod_list.{}'.format(stat), stats[stat], self.kubelet_scraper_config)
+
     def _retrieve_node_spec(self):
         """
         Retrieve node spec from kubelet.
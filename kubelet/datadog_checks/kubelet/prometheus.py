@@ -12,7 +12,7 @@ from datadog_checks.base.checks.kubelet_base.base import urljoin
 from datadog_checks.base.checks.openmetrics import OpenMetricsBaseCheck
 from datadog_checks.base.utils.tagging import tagger
 
-from .common import get_container_label, get_pod_by_uid, is_static_pending_pod, replace_container_rt_prefix
+from .common import get_container_label, is_static_pending_pod, replace_container_rt_prefix
 
 METRIC_TYPES = ['counter', 'gauge', 'summary']
 
@@ -169,18 +169,27 @@ class CadvisorPrometheusScraperMixin(object):
                 return self._get_pod_uid(labels)
             return self.pod_list_utils.get_cid_by_labels(labels)
 
-    def _get_pod_uid(self, labels):
+    @staticmethod
+    def _get_pod_name_tuple(labels):
         """
-        Return the id of a pod
+        Return the namespace and name of a pod
         :param labels:
-        :return: str or None
+        :return: tuple
         """
         namespace = get_container_label(labels, "namespace")
         pod_name = get_container_label(labels, "pod")
         # k8s < 1.16
         if not pod_name:
             pod_name = get_container_label(labels, "pod_name")
-        return self.pod_list_utils.get_uid_by_name_tuple((namespace, pod_name))
+        return namespace, pod_name
+
+    def _get_pod_uid(self, labels):
+        """
+        Return the id of a pod
+        :param labels:
+        :return: str or None
+        """
+        return self.pod_list_utils.get_uid_by_name_tuple(self._get_pod_name_tuple(labels))
 
     def _get_pod_uid_if_pod_metric(self, labels):
         """
@@ -199,18 +208,17 @@ class CadvisorPrometheusScraperMixin(object):
         :param pod_uid: str
         :return: bool
         """
-        for pod in self.pod_list['items']:
-            if pod.get('metadata', {}).get('uid', '') == pod_uid:
-                return pod.get('spec', {}).get('hostNetwork', False)
-        return False
+        pod = self.pod_list_utils.get_pod_by_uid(pod_uid)
+        if pod is None:
+            return False
+        return pod.get('spec', {}).get('hostNetwork', False)
 
     def _get_pod_by_metric_label(self, labels):
         """
         :param labels: metric labels: iterable
         :return:
         """
-        pod_uid = self._get_pod_uid(labels)
-        return get_pod_by_uid(pod_uid, self.pod_list)
+        return self.pod_list_utils.get_pod_by_name_tuple(self._get_pod_name_tuple(labels))
 
     @staticmethod
     def _get_kube_container_name(labels):
@@ -340,7 +348,7 @@ class CadvisorPrometheusScraperMixin(object):
 
         samples = self._sum_values_by_context(metric, self._get_pod_uid_if_pod_metric)
         for pod_uid, sample in iteritems(samples):
-            pod = get_pod_by_uid(pod_uid, self.pod_list)
+            pod = self.pod_list_utils.get_pod_by_uid(pod_uid)
             namespace = pod.get('metadata', {}).get('namespace', None)
             if self.pod_list_utils.is_namespace_excluded(namespace):
                 continue
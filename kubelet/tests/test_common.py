@@ -130,6 +130,25 @@ def test_pod_by_uid():
     assert pod is None
 
 
+def test_pod_list_utils_index():
+    pods = json.loads(mock_from_file('pods.json'))
+    pod_list_utils = PodListUtils(pods)
+    uid = "2edfd4d9-10ce-11e8-bd5a-42010af00137"
+
+    assert pod_list_utils.stats['pods'] == len(pods['items'])
+    assert pod_list_utils.stats['containers'] == 10
+    assert pod_list_utils.stats['build_time'] >= 0
+
+    assert pod_list_utils.get_pod_by_uid(uid)["metadata"]["name"] == "fluentd-gcp-v2.0.10-9q9t4"
+    assert pod_list_utils.get_pod_by_name_tuple(("kube-system", "fluentd-gcp-v2.0.10-9q9t4"))["metadata"]["uid"] == uid
+    assert pod_list_utils.get_pod_by_uid("unknown") is None
+    assert pod_list_utils.get_pod_by_uid(None) is None
+    assert pod_list_utils.get_pod_by_name_tuple(("default", "unknown")) is None
+
+    assert pod_list_utils.stats['lookups'] == 5
+    assert pod_list_utils.stats['misses'] == 3
+
+
 def test_url_join():
     res = urljoin("https://10.100.0.1:443/api/fargate-XX.us-east-2.compute.internal/proxy", "/pods")
     assert res == 'https://10.100.0.1:443/api/fargate-XX.us-east-2.compute.internal/proxy/pods'
@@ -669,6 +669,23 @@ def test_ignore_metrics(monkeypatch, aggregator):
     assert len(aggregator.metrics('kubernetes.network.tx_bytes')) == 0  # this metric is disabled
 
 
+@pytest.mark.parametrize('telemetry', [True, False])
+def test_pod_list_telemetry(monkeypatch, aggregator, tagger, telemetry):
+    instance = {'telemetry': telemetry, 'tags': ['instance:tag']}
+    check = mock_kubelet_check(monkeypatch, [instance])
+    check.check(instance)
+
+    pod_list_metrics = ('pods', 'containers', 'build_time', 'lookups', 'misses')
+    for stat in pod_list_metrics:
+        aggregator.assert_metric(
+            'kubernetes.telemetry.pod_list.{}'.format(stat), tags=['instance:tag'], count=1 if telemetry else 0
+        )
+    if telemetry:
+        pods = json.loads(mock_from_file('pods.json'))
+        aggregator.assert_metric('kubernetes.telemetry.pod_list.pods', value=len(pods['items']))
+        aggregator.assert_metric('kubernetes.telemetry.pod_list.containers', value=10)
+
+
 def test_kubelet_check_instance_config(monkeypatch):
     def mock_kubelet_check_no_prom():
         check = mock_kubelet_check(monkeypatch, [{}])
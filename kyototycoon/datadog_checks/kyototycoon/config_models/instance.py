@@ -77,6 +77,7 @@ class InstanceConfig(BaseModel):
     read_timeout: Optional[float]
     report_url: str
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     service: Optional[str]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
@@ -142,6 +142,10 @@ def instance_resource_filters(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_response_cache_size(field, value):
+    return 10240
+
+
 def instance_service(field, value):
     return get_default_field_value(field, value)
 
@@ -198,6 +198,10 @@ def instance_request_size(field, value):
     return 10
 
 
+def instance_response_cache_size(field, value):
+    return 10240
+
+
 def instance_send_distribution_buckets(field, value):
     return False
 
@@ -45,6 +45,7 @@ class PostgresConfig:
 
         self.query_timeout = int(instance.get('query_timeout', 5000))
         self.idle_connection_timeout = instance.get('idle_connection_timeout', 60000)
+        self.max_connection_pool_size = int(instance.get('max_connection_pool_size', 30))
         self.relations = instance.get('relations', [])
         if self.relations and not self.dbname:
             raise ConfigurationError('"dbname" parameter must be set when using the "relations" parameter.')
@@ -106,6 +106,10 @@ def instance_log_unobfuscated_queries(field, value):
     return False
 
 
+def instance_max_connection_pool_size(field, value):
+    return 30
+
+
 def instance_max_relations(field, value):
     return 300
 
@@ -3,7 +3,10 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import datetime
 import inspect
+import logging
+import selectors
 import threading
+import time
 from collections import namedtuple
 
 import psycopg2
@@ -21,15 +24,20 @@ class MultiDatabaseConnectionPool(object):
     Even when limited to a single connection per database, an instance with hundreds of
     databases still present a connection overhead risk. This class provides a mechanism
     to prune connections to a database which were not used in the time specified by their
-    TTL.
+    TTL. The total number of connections can also be capped, in which case the least recently
+    used connection is closed whenever a connection to a new database is needed.
     """
 
     class Stats(object):
         def __init__(self):
             self.connection_opened = 0
+            self.connection_reused = 0
             self.connection_pruned = 0
+            self.connection_evicted = 0
+            self.connection_dead = 0
             self.connection_closed = 0
             self.connection_closed_failed = 0
+            self.wait_time_ms = 0.0
 
         def __repr__(self):
             return str(self.__dict__)
@@ -37,10 +45,12 @@ class MultiDatabaseConnectionPool(object):
         def reset(self):
             self.__init__()
 
-    def __init__(self, connect_fn):
+    def __init__(self, connect_fn, max_conns=None):
         self._stats = self.Stats()
         self._mu = threading.Lock()
         self._conns = {}
+        self._max_conns = max_conns
+        self._log = logging.getLogger(__name__)
 
         if hasattr(inspect, 'signature'):
             connect_sig = inspect.signature(connect_fn)
@@ -53,12 +63,28 @@ class MultiDatabaseConnectionPool(object):
 
     def get_connection(self, dbname, ttl_ms):
         self.prune_connections()
+        start = time.time()
         with self._mu:
+            self._stats.wait_time_ms += (time.time() - start) * 1000
             conn = self._conns.pop(dbname, ConnectionWithTTL(None, None))
             db = conn.connection
+            if db is not None and not db.closed and not self._is_alive(db):
+                self._stats.connection_dead += 1
+                self._close_connection_unsafe(dbname, db)
+                db = None
+
             if db is None or db.closed:
+                if self._max_conns is not None:
+                    while self._conns and len(self._conns) >= self._max_conns:
+                        self._stats.connection_evicted += 1
+                        # The deadline of a connection is pushed back whenever it is used
+                        lru_dbname = min(self._conns, key=lambda d: self._conns[d].deadline)
+                        self._terminate_connection_unsafe(lru_dbname)
+
                 self._stats.connection_opened += 1
                 db = self.connect_fn(dbname)
+            else:
+                self._stats.connection_reused += 1
 
             if db.status != psycopg2.extensions.STATUS_READY:
                 # Some transaction went wrong and the connection is in an unhealthy state. Let's fix that
@@ -83,6 +109,14 @@ class MultiDatabaseConnectionPool(object):
                     self._stats.connection_pruned += 1
                     self._terminate_connection_unsafe(dbname)
 
+    def reset_stats(self):
+        """
+        Returns the stats accumulated since the last call and starts over.
+        """
+        with self._mu:
+            stats, self._stats = self._stats, self.Stats()
+        return stats
+
     def close_all_connections(self):
         success = True
         with self._mu:
@@ -94,6 +128,9 @@ class MultiDatabaseConnectionPool(object):
 
     def _terminate_connection_unsafe(self, dbname):
         db, _ = self._conns.pop(dbname, ConnectionWithTTL(None, None))
+        return self._close_connection_unsafe(dbname, db)
+
+    def _close_connection_unsafe(self, dbname, db):
         if db is not None:
             try:
                 self._stats.connection_closed += 1
@@ -103,3 +140,35 @@ class MultiDatabaseConnectionPool(object):
                 self._log.exception("failed to close DB connection for db=%s", dbname)
                 return False
         return True
+
+    @staticmethod
+    def _is_alive(db):
+        """
+        Cheaply checks that an idle connection is still usable without a round trip to the server.
+        """
+        if db.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+
+        # Unlike `select.select`, selectors support the file descriptors above 1024 that long running agents use
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(db, selectors.EVENT_READ)
+                readable = selector.select(0)
+        except (OSError, ValueError):
+            return False
+
+        if not readable:
+            return True
+
+        # Something was sent to an idle connection: either notices and notifications, which are consumed here, or the
+        # error the server sends before closing the connection e.g. when the backend is terminated. Idle connections
+        # receive that error as a notice, and reading past it fails.
+        try:
+            db.poll()
+        except psycopg2.Error:
+            return False
+
+        if db.closed or db.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+
+        return not (db.notices and db.notices[-1].startswith('FATAL:'))
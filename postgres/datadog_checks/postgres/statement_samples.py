@@ -181,7 +181,7 @@ class PostgresStatementSamples(DBMAsyncJob):
         if collection_interval <= 0:
             collection_interval = DEFAULT_COLLECTION_INTERVAL
 
-        self._conn_pool = MultiDatabaseConnectionPool(check._new_connection)
+        self._conn_pool = MultiDatabaseConnectionPool(check._new_connection, config.max_connection_pool_size)
 
         def shutdown_cb():
             self._conn_pool.close_all_connections()
@@ -432,6 +432,24 @@ class PostgresStatementSamples(DBMAsyncJob):
         self._tags_no_db = [t for t in self.tags if not t.startswith('db:')]
         self._collect_statement_samples()
         self._conn_pool.prune_connections()
+        self._report_connection_pool_metrics()
+
+    def _report_connection_pool_metrics(self):
+        stats = self._conn_pool.reset_stats()
+        tags = self.tags + self._check._get_debug_tags()
+        for name in ('opened', 'reused', 'pruned', 'evicted', 'dead', 'closed', 'closed_failed'):
+            self._check.count(
+                "dd.postgres.connection_pool.{}".format(name),
+                getattr(stats, 'connection_' + name),
+                tags=tags,
+                hostname=self._check.resolved_hostname,
+            )
+        self._check.histogram(
+            "dd.postgres.connection_pool.wait_time",
+            stats.wait_time_ms,
+            tags=tags,
+            hostname=self._check.resolved_hostname,
+        )
 
     @tracked_method(agent_check_getter=agent_check_getter)
     def _collect_statement_samples(self):
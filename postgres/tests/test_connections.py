@@ -2,10 +2,14 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import datetime
+import os
 import pprint
+import select
+import socket
 import time
 import uuid
 
+import mock
 import psycopg2
 import pytest
 
@@ -239,3 +243,125 @@ def test_conn_pool_no_leaks_on_prune(pg_instance):
     # Final check that the server contains no leaked connections still open
     rows = get_activity()
     assert len(rows) == 0
+
+
+@pytest.mark.integration
+@pytest.mark.usefixtures('dd_environment')
+def test_conn_pool_max_conns(pg_instance):
+    """
+    Test that the least recently used connection is closed when the pool is full.
+    """
+    check = PostgreSql('postgres', {}, [pg_instance])
+
+    pool = MultiDatabaseConnectionPool(check._new_connection, max_conns=2)
+    first = pool.get_connection('dogs_0', 60 * 1000)
+    pool.get_connection('dogs_1', 60 * 1000)
+    # Mark the first database as the most recently used one
+    assert pool.get_connection('dogs_0', 60 * 1000) is first
+    assert pool._stats.connection_reused == 1
+
+    pool.get_connection('dogs_2', 60 * 1000)
+    assert set(pool._conns) == {'dogs_0', 'dogs_2'}
+    assert pool._stats.connection_opened == 3
+    assert pool._stats.connection_evicted == 1
+    assert pool._stats.connection_closed == 1
+
+    stats = pool.reset_stats()
+    assert stats.connection_evicted == 1
+    assert pool._stats.connection_evicted == 0
+    assert pool.close_all_connections()
+
+
+@pytest.mark.integration
+@pytest.mark.usefixtures('dd_environment')
+def test_conn_pool_dead_connection(pg_instance):
+    """
+    Test that a pooled connection terminated by the server is replaced instead of being handed out.
+    """
+    check = PostgreSql('postgres', {}, [pg_instance])
+
+    pool = MultiDatabaseConnectionPool(check._new_connection)
+    db = pool.get_connection('dogs_0', 60 * 1000)
+    with db.cursor() as cursor:
+        cursor.execute("select pg_backend_pid()")
+        pid = cursor.fetchone()[0]
+
+    admin = psycopg2.connect(host=HOST, dbname='postgres', user=USER_ADMIN, password=PASSWORD_ADMIN)
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute("select pg_terminate_backend(%s)", (pid,))
+    finally:
+        admin.close()
+
+    # Wait for the server to notify the client
+    attempts = 10
+    while not select.select([db], [], [], 0)[0]:
+        attempts -= 1
+        assert attempts >= 0
+        time.sleep(0.1)
+
+    new_db = pool.get_connection('dogs_0', 60 * 1000)
+    assert new_db is not db
+    assert pool._stats.connection_dead == 1
+    assert pool._stats.connection_opened == 2
+    with new_db.cursor() as cursor:
+        cursor.execute("select 1")
+        assert cursor.fetchone()[0] == 1
+
+    assert pool.close_all_connections()
+
+
+class IdleConnection(object):
+    """
+    The parts of an idle psycopg2 connection used to check that it is alive, over one end of a socket pair.
+    """
+
+    def __init__(self, sock, fd=None):
+        self.sock = sock
+        self.fd = sock.fileno() if fd is None else fd
+        self.closed = 0
+        self.info = mock.Mock(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+        self.notices = []
+
+    def fileno(self):
+        return self.fd
+
+    def poll(self):
+        data = self.sock.recv(1024)
+        if not data:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+
+        self.notices.extend(notice.decode('utf-8') for notice in data.splitlines())
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    'sent, alive',
+    [
+        pytest.param(None, True, id='idle'),
+        pytest.param(b'NOTICE:  something happened', True, id='notice'),
+        pytest.param(b'FATAL:  terminating connection due to administrator command', False, id='terminated'),
+        pytest.param(b'', False, id='closed'),
+    ],
+)
+@pytest.mark.parametrize('high_fd', [False, True])
+def test_conn_pool_is_alive(sent, alive, high_fd):
+    client, server = socket.socketpair()
+    fd = None
+    try:
+        if high_fd:
+            # `select.select` does not support file descriptors above 1024
+            fd = os.dup2(client.fileno(), 2048)
+
+        if sent is not None:
+            if sent:
+                server.sendall(sent)
+            else:
+                server.close()
+
+        assert MultiDatabaseConnectionPool._is_alive(IdleConnection(client, fd)) is alive
+    finally:
+        if fd is not None:
+            os.close(fd)
+        client.close()
+        server.close()
@@ -1,7 +1,10 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
-from typing import Any, Dict, Generator  # noqa: F401
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Generator, Iterator, List, Optional, Tuple  # noqa: F401
 
 from pyasn1.type.univ import Null
 from pysnmp import hlapi  # noqa: F401
@@ -13,6 +16,47 @@ from pysnmp.proto.rfc1905 import endOfMibView
 from datadog_checks.base.errors import CheckException
 
 from .config import InstanceConfig  # noqa: F401
+from .exceptions import PySnmpError
+from .pysnmp_types import ObjectIdentity, ObjectType, noSuchInstance, noSuchObject
+
+
+def reply_invalid(oid):
+    # type: (Any) -> bool
+    return noSuchInstance.isSameTypeWith(oid) or noSuchObject.isSameTypeWith(oid)
+
+
+# Value of the error-status of responses that could not fit in a single PDU
+TOO_BIG = 1
+
+
+def _observe_batch(config, size, start, error_indication, error_status):
+    # type: (InstanceConfig, int, float, Any, Any) -> None
+    if config.request_tuner is not None:
+        config.request_tuner.observe_batch(
+            size,
+            time.time() - start,
+            too_big=bool(error_status) and int(error_status) == TOO_BIG,
+            timed_out=isinstance(error_indication, errind.RequestTimedOut),
+        )
+
+
+def _observe_bulk(config, var_bind_table, start, error_indication, initial_var, max_repetitions):
+    # type: (InstanceConfig, list, float, Any, Any, int) -> None
+    if config.request_tuner is not None:
+        # Devices return fewer rows than requested when they would not fit in a PDU,
+        # which is only noticeable when the walk is not over yet
+        rows = len(var_bind_table)
+        truncated = (
+            0 < rows < max_repetitions
+            and not endOfMibView.isSameTypeWith(var_bind_table[-1][0][1])
+            and initial_var.isPrefixOf(var_bind_table[-1][0][0])
+        )
+        config.request_tuner.observe_bulk(
+            rows,
+            time.time() - start,
+            truncated=truncated,
+            timed_out=isinstance(error_indication, errind.RequestTimedOut),
+        )
 
 
 def _handle_error(ctx, config):
@@ -36,12 +80,14 @@ def snmp_get(config, oids, lookup_mib):
         var_binds = vbProcessor.unmakeVarBinds(snmpEngine, varBinds, lookup_mib)
 
         cbCtx['error'] = errorIndication
+        cbCtx['error_status'] = errorStatus
         cbCtx['var_binds'] = var_binds
 
     ctx = {}  # type: Dict[str, Any]
 
     var_binds = vbProcessor.makeVarBinds(config._snmp_engine, oids)
 
+    start = time.time()
     cmdgen.GetCommandGenerator().sendVarBinds(
         config._snmp_engine,
         config.device.target,
@@ -54,11 +100,55 @@ def snmp_get(config, oids, lookup_mib):
 
     config._snmp_engine.transportDispatcher.runDispatcher()
 
+    _observe_batch(config, len(oids), start, ctx['error'], ctx['error_status'])
     _handle_error(ctx, config)
 
     return ctx['var_binds']
 
 
+def snmp_get_window(config, requests, oids, lookup_mib, window_size, on_response):
+    # type: (InstanceConfig, Iterator[Tuple[Any, str]], list, bool, int, Callable[..., Optional[str]]) -> None
+    """Call SNMP GET on a list of oids for the `(key, target)` pairs of `requests`, with up to `window_size` requests
+    in flight at the same time.
+
+    As soon as a request completes, `on_response(key, error_indication, var_binds)` is called and the next request is
+    sent, so that slow targets do not hold up the others. `on_response` may return another target to send the same
+    request to for that key, in place of the next request.
+    """
+    engine = config._snmp_engine
+    var_binds = vbProcessor.makeVarBinds(engine, oids)
+    gen = cmdgen.GetCommandGenerator()
+
+    def send(key, target):
+        # type: (Any, str) -> None
+        gen.sendVarBinds(
+            engine,
+            target,
+            config._context_data.contextEngineId,
+            config._context_data.contextName,
+            var_binds,
+            callback,
+            key,
+        )
+
+    def callback(  # type: ignore
+        snmpEngine, sendRequestHandle, errorIndication, errorStatus, errorIndex, varBinds, cbCtx
+    ):
+        if not errorIndication:
+            varBinds = vbProcessor.unmakeVarBinds(snmpEngine, varBinds, lookup_mib)
+        target = on_response(cbCtx, errorIndication, varBinds)
+        if target is not None:
+            send(cbCtx, target)
+            return
+        for key, target in islice(requests, 1):
+            send(key, target)
+
+    for key, target in islice(requests, window_size):
+        send(key, target)
+
+    engine.transportDispatcher.runDispatcher()
+
+
 def snmp_getnext(config, oids, lookup_mib, ignore_nonincreasing_oid):
     # type: (InstanceConfig, list, bool, bool) -> Generator
     """Call SNMP GETNEXT on a list of oids. It will iterate on the results if it happens to be under the same prefix."""
@@ -73,6 +163,7 @@ def snmp_getnext(config, oids, lookup_mib, ignore_nonincreasing_oid):
         if ignore_nonincreasing_oid and errorIndication and isinstance(errorIndication, errind.OidNotIncreasing):
             errorIndication = None
         cbCtx['error'] = errorIndication
+        cbCtx['error_status'] = errorStatus
         cbCtx['var_bind_table'] = var_bind_table[0] if var_bind_table else []
 
     ctx = {}  # type: Dict[str, Any]
@@ -84,6 +175,7 @@ def snmp_getnext(config, oids, lookup_mib, ignore_nonincreasing_oid):
     gen = cmdgen.NextCommandGenerator()
 
     while True:
+        start = time.time()
         gen.sendVarBinds(
             config._snmp_engine,
             config.device.target,
@@ -96,6 +188,7 @@ def snmp_getnext(config, oids, lookup_mib, ignore_nonincreasing_oid):
 
         config._snmp_engine.transportDispatcher.runDispatcher()
 
+        _observe_batch(config, len(var_binds), start, ctx['error'], ctx['error_status'])
         _handle_error(ctx, config)
 
         var_binds = []
@@ -114,7 +207,10 @@ def snmp_getnext(config, oids, lookup_mib, ignore_nonincreasing_oid):
 
 def snmp_bulk(config, oid, non_repeaters, max_repetitions, lookup_mib, ignore_nonincreasing_oid):
     # type: (InstanceConfig, hlapi.ObjectType, int, int, bool, bool) -> Generator
-    """Call SNMP GETBULK on an oid."""
+    """Call SNMP GETBULK on an oid.
+
+    When the request sizes of the device are tuned, `max_repetitions` is overridden by the learned value.
+    """
 
     if config.device is None:
         raise RuntimeError('No device set')  # pragma: no cover
@@ -136,6 +232,10 @@ def snmp_bulk(config, oid, non_repeaters, max_repetitions, lookup_mib, ignore_no
     gen = cmdgen.BulkCommandGenerator()
 
     while True:
+        if config.request_tuner is not None:
+            max_repetitions = config.request_tuner.max_repetitions
+
+        start = time.time()
         gen.sendVarBinds(
             config._snmp_engine,
             config.device.target,
@@ -150,6 +250,7 @@ def snmp_bulk(config, oid, non_repeaters, max_repetitions, lookup_mib, ignore_no
 
         config._snmp_engine.transportDispatcher.runDispatcher()
 
+        _observe_bulk(config, ctx['var_bind_table'], start, ctx['error'], initial_var, max_repetitions)
         _handle_error(ctx, config)
 
         for var_binds in ctx['var_bind_table']:
@@ -160,3 +261,225 @@ def snmp_bulk(config, oid, non_repeaters, max_repetitions, lookup_mib, ignore_no
                 yield var_binds[0]
             else:
                 return
+
+
+class PipelinedFetcher(object):
+    """
+    Run the GET, GETNEXT and GETBULK requests needed to fetch OIDs from a device, keeping up to
+    `config.request_window` requests in flight at the same time instead of waiting for each round trip.
+
+    GETNEXT and GETBULK walks are chains of dependent requests: every walk only has one request in flight, but
+    the requests of different walks are interleaved. Whenever a request times out the window of the device is
+    halved, it then grows back by one request per response up to `config.request_window_size`.
+
+    The results are the same as running `snmp_get`, `snmp_getnext` and `snmp_bulk` in sequence: scalar OIDs
+    that do not exist are retried with GETNEXT, and the var binds are returned in the order of the requests.
+    """
+
+    def __init__(self, config, batch_size, lookup_mib, ignore_nonincreasing_oid, non_repeaters, max_repetitions):
+        # type: (InstanceConfig, int, bool, bool, int, int) -> None
+        if config.device is None:
+            raise RuntimeError('No device set')  # pragma: no cover
+
+        self._config = config
+        self._batch_size = batch_size
+        self._lookup_mib = lookup_mib
+        self._ignore_nonincreasing_oid = ignore_nonincreasing_oid
+        self._non_repeaters = non_repeaters
+        self._max_repetitions = max_repetitions
+
+        self._queue = deque()  # type: Deque[Callable[[], None]]
+        self._in_flight = 0
+        self._binds = []  # type: List[List[Any]]
+        self.errors = []  # type: List[Exception]
+
+    def get(self, oids):
+        # type: (List[ObjectType]) -> None
+        self._queue.append(self._request(self._send_get, oids, self._new_slot()))
+
+    def getnext(self, oids):
+        # type: (List[ObjectType]) -> None
+        initial_vars = [x[0] for x in vbProcessor.makeVarBinds(self._config._snmp_engine, oids)]
+        self._queue.append(self._request(self._send_getnext, oids, self._new_slot(), initial_vars))
+
+    def bulk(self, oid):
+        # type: (ObjectType) -> None
+        var_binds = [oid]
+        initial_var = vbProcessor.makeVarBinds(self._config._snmp_engine, var_binds)[0][0]
+        self._queue.append(self._request(self._send_bulk, var_binds, self._new_slot(), initial_var))
+
+    def run(self):
+        # type: () -> List[Any]
+        """Send all the requests and wait for their responses, return the collected var binds."""
+        self._fill_window()
+        self._config._snmp_engine.transportDispatcher.runDispatcher()
+        return [var_bind for binds in self._binds for var_bind in binds]
+
+    def _new_slot(self):
+        # type: () -> List[Any]
+        binds = []  # type: List[Any]
+        self._binds.append(binds)
+        return binds
+
+    def _request(self, send, *args):
+        # type: (Callable[..., None], *Any) -> Callable[[], None]
+        def request():
+            # type: () -> None
+            try:
+                send(*args)
+            except (PySnmpError, CheckException) as e:
+                self.errors.append(e)
+            else:
+                self._in_flight += 1
+
+        return request
+
+    def _fill_window(self):
+        # type: () -> None
+        while self._queue and self._in_flight < self._config.request_window:
+            self._queue.popleft()()
+
+    def _on_response(self, error_indication, handle, *args):
+        # type: (Any, Callable[..., None], *Any) -> None
+        self._in_flight -= 1
+        config = self._config
+        if isinstance(error_indication, errind.RequestTimedOut):
+            config.request_window = max(1, config.request_window // 2)
+        elif config.request_window < config.request_window_size:
+            config.request_window += 1
+
+        try:
+            if error_indication:
+                raise CheckException('{} for device {}'.format(error_indication, config.device))
+            handle(*args)
+        except (PySnmpError, CheckException) as e:
+            self.errors.append(e)
+
+        self._fill_window()
+
+    def _send_get(self, oids, binds):
+        # type: (List[ObjectType], List[Any]) -> None
+        start = time.time()
+
+        def callback(  # type: ignore
+            snmpEngine, sendRequestHandle, errorIndication, errorStatus, errorIndex, varBinds, cbCtx
+        ):
+            _observe_batch(self._config, len(oids), start, errorIndication, errorStatus)
+            self._on_response(errorIndication, self._handle_get, snmpEngine, varBinds, binds)
+
+        config = self._config
+        cmdgen.GetCommandGenerator().sendVarBinds(
+            config._snmp_engine,
+            config.device.target,
+            config._context_data.contextEngineId,
+            config._context_data.contextName,
+            vbProcessor.makeVarBinds(config._snmp_engine, oids),
+            callback,
+            None,
+        )
+
+    def _handle_get(self, snmp_engine, var_binds, binds):
+        # type: (Any, Any, List[Any]) -> None
+        missing_results = []
+        for var in vbProcessor.unmakeVarBinds(snmp_engine, var_binds, self._lookup_mib):
+            result_oid, value = var
+            if reply_invalid(value):
+                missing_results.append(ObjectType(ObjectIdentity(result_oid.asTuple())))
+            else:
+                binds.append(var)
+
+        # If we didn't catch the metric using GET, try GETNEXT
+        for index in range(0, len(missing_results), self._batch_size):
+            self.getnext(missing_results[index : index + self._batch_size])
+
+    def _send_getnext(self, var_binds, binds, initial_vars):
+        # type: (List[Any], List[Any], List[Any]) -> None
+        start = time.time()
+
+        def callback(  # type: ignore
+            snmpEngine, sendRequestHandle, errorIndication, errorStatus, errorIndex, varBindTable, cbCtx
+        ):
+            _observe_batch(self._config, len(var_binds), start, errorIndication, errorStatus)
+            if (
+                self._ignore_nonincreasing_oid
+                and errorIndication
+                and isinstance(errorIndication, errind.OidNotIncreasing)
+            ):
+                errorIndication = None
+            self._on_response(errorIndication, self._handle_getnext, snmpEngine, varBindTable, binds, initial_vars)
+
+        config = self._config
+        cmdgen.NextCommandGenerator().sendVarBinds(
+            config._snmp_engine,
+            config.device.target,
+            config._context_data.contextEngineId,
+            config._context_data.contextName,
+            var_binds,
+            callback,
+            None,
+        )
+
+    def _handle_getnext(self, snmp_engine, var_bind_table, binds, initial_vars):
+        # type: (Any, Any, List[Any], List[Any]) -> None
+        if not var_bind_table:
+            return
+
+        var_binds = []
+        new_initial_vars = []
+        row = vbProcessor.unmakeVarBinds(snmp_engine, var_bind_table[0], self._lookup_mib)
+        for col, var_bind in enumerate(row):
+            name, val = var_bind
+            if not isinstance(val, Null) and initial_vars[col].isPrefixOf(name):
+                var_binds.append(var_bind)
+                new_initial_vars.append(initial_vars[col])
+                binds.append(var_bind)
+
+        if var_binds:
+            self._queue.append(self._request(self._send_getnext, var_binds, binds, new_initial_vars))
+
+    def _send_bulk(self, var_binds, binds, initial_var):
+        # type: (List[Any], List[Any], Any) -> None
+        config = self._config
+        max_repetitions = self._max_repetitions
+        if config.request_tuner is not None:
+            max_repetitions = config.request_tuner.max_repetitions
+
+        start = time.time()
+
+        def callback(  # type: ignore
+            snmpEngine, sendRequestHandle, errorIndication, errorStatus, errorIndex, varBindTable, cbCtx
+        ):
+            _observe_bulk(config, varBindTable, start, errorIndication, initial_var, max_repetitions)
+            if (
+                self._ignore_nonincreasing_oid
+                and errorIndication
+                and isinstance(errorIndication, errind.OidNotIncreasing)
+            ):
+                errorIndication = None
+            self._on_response(errorIndication, self._handle_bulk, snmpEngine, varBindTable, binds, initial_var)
+
+        cmdgen.BulkCommandGenerator().sendVarBinds(
+            config._snmp_engine,
+            config.device.target,
+            config._context_data.contextEngineId,
+            config._context_data.contextName,
+            self._non_repeaters,
+            max_repetitions,
+            vbProcessor.makeVarBinds(config._snmp_engine, var_binds),
+            callback,
+            None,
+        )
+
+    def _handle_bulk(self, snmp_engine, var_bind_table, binds, initial_var):
+        # type: (Any, Any, List[Any], Any) -> None
+        var_binds = None
+        for row in var_bind_table:
+            var_binds = vbProcessor.unmakeVarBinds(snmp_engine, row, self._lookup_mib)
+            name, value = var_binds[0]
+            if endOfMibView.isSameTypeWith(value) or not initial_var.isPrefixOf(name):
+                return
+            binds.append(var_binds[0])
+
+        if var_binds is not None:
+            # Continue the walk from the last row
+            self._queue.append(self._request(self._send_bulk, var_binds, binds, initial_var))
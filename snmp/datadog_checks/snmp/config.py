@@ -6,16 +6,19 @@ import time
 import weakref
 from collections import defaultdict
 from logging import Logger, getLogger  # noqa: F401
-from typing import Any, DefaultDict, Dict, Iterator, List, Optional, Set, Tuple  # noqa: F401
+from typing import Any, DefaultDict, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union  # noqa: F401
 
 from datadog_checks.base import ConfigurationError, is_affirmative
 
 from .mibs import MIBLoader
 from .models import OID, Device
 from .parsing import ParsedMetric, ParsedSymbolMetric, SymbolTag, parse_metrics, parse_symbol_metric_tags  # noqa: F401
-from .pysnmp_types import (
+from .profiles import CompiledProfile, SharedProfiles, compile_profile  # noqa: F401
+from .pysnmp_types import (  # noqa: F401
     CommunityData,
     ContextData,
+    ObjectIdentity,
+    ObjectName,
     OctetString,
     UsmUserData,
     hlapi,
@@ -23,6 +26,7 @@ from .pysnmp_types import (
     usmHMACMD5AuthProtocol,
 )
 from .resolver import OIDResolver
+from .tuning import RequestSizeTuner  # noqa: F401
 from .types import OIDMatch  # noqa: F401
 from .utils import register_device_target
 
@@ -39,6 +43,9 @@ class InstanceConfig:
     DEFAULT_ALLOWED_FAILURES = 3
     DEFAULT_BULK_THRESHOLD = 0
     DEFAULT_WORKERS = 5
+    DEFAULT_DISCOVERY_PROBE_WORKERS = 1
+    DEFAULT_DISCOVERY_PROBE_TIMEOUT = 1
+    DEFAULT_REQUEST_WINDOW_SIZE = 1
     DEFAULT_REFRESH_OIDS_CACHE_INTERVAL = 0  # `0` means disabled
 
     AUTH_PROTOCOL_MAPPING = {
@@ -70,6 +77,7 @@ class InstanceConfig:
         profiles_by_oid=None,  # type: Dict[str, str]
         loader=None,  # type: MIBLoader
         logger=None,  # type: Logger
+        shared_profiles=None,  # type: SharedProfiles
     ):
         # type: (...) -> None
         global_metrics = [] if global_metrics is None else global_metrics
@@ -83,6 +91,7 @@ class InstanceConfig:
                 instance.pop(key)
 
         self.logger = weakref.ref(local_logger) if logger is None else weakref.ref(logger)
+        self._shared_profiles = shared_profiles
 
         self.instance = instance
         self.tags = instance.get('tags', [])
@@ -106,14 +115,28 @@ class InstanceConfig:
         self.failing_instances = defaultdict(int)  # type: DefaultDict[str, int]
         self.allowed_failures = int(instance.get('discovery_allowed_failures', self.DEFAULT_ALLOWED_FAILURES))
         self.workers = int(instance.get('workers', self.DEFAULT_WORKERS))
+        self.discovery_probe_workers = int(
+            instance.get('discovery_probe_workers', self.DEFAULT_DISCOVERY_PROBE_WORKERS)
+        )
 
         self.bulk_threshold = int(instance.get('bulk_threshold', self.DEFAULT_BULK_THRESHOLD))
+        self.request_window_size = int(instance.get('request_window_size', self.DEFAULT_REQUEST_WINDOW_SIZE))
+        # Current number of requests allowed in flight, shrinks when the device times out
+        self.request_window = self.request_window_size
+        self.adaptive_request_size = is_affirmative(instance.get('adaptive_request_size', False))
+        self.request_tuner = None  # type: Optional[RequestSizeTuner]
 
         self._auth_data = self.get_auth_data(instance)
         self._context_data = ContextData(*self.get_context_data(instance))
 
         timeout = int(instance.get('timeout', self.DEFAULT_TIMEOUT))
         retries = int(instance.get('retries', self.DEFAULT_RETRIES))
+        self.timeout = timeout
+        self.retries = retries
+        # Liveness probes, sent without retries to every host of a network during discovery
+        self.discovery_probe_timeout = float(
+            instance.get('discovery_probe_timeout', self.DEFAULT_DISCOVERY_PROBE_TIMEOUT)
+        )
 
         ip_address = instance.get('ip_address')
         network_address = instance.get('network_address')
@@ -169,7 +192,10 @@ class InstanceConfig:
         if profile:
             if profile not in profiles:
                 raise ConfigurationError("Unknown profile '{}'".format(profile))
-            self.refresh_with_profile(profiles[profile])
+            if shared_profiles is None:
+                self.refresh_with_profile(profiles[profile])
+            else:
+                self.refresh_with_shared_profile(profile)
             self.add_profile_tag(profile)
 
         self._uptime_metric_added = False
@@ -178,13 +204,31 @@ class InstanceConfig:
         # type: (OID) -> OIDMatch
         return self._resolver.resolve_oid(oid)
 
+    def resolve_raw_oid(self, raw_oid):
+        # type: (Union[ObjectName, ObjectIdentity]) -> OIDMatch
+        return self._resolver.resolve_raw_oid(raw_oid)
+
     def refresh_with_profile(self, profile):
         # type: (Dict[str, Any]) -> None
-        metrics = profile['definition'].get('metrics', [])
-        scalar_oids, next_oids, bulk_oids, parsed_metrics = self.parse_metrics(metrics)
+        compiled = compile_profile(profile, self._get_bulk_threshold(), self.enforce_constraints, self.logger())
+        self._refresh_with_compiled_profile(profile, compiled)
+
+    def refresh_with_shared_profile(self, name):
+        # type: (str) -> None
+        """
+        Same as `refresh_with_profile`, reusing the compiled profile shared with other devices using the profile.
+        """
+        if self._shared_profiles is None:
+            raise RuntimeError('No shared profiles set')  # pragma: no cover
 
-        metric_tags = profile['definition'].get('metric_tags', [])
-        tag_oids, parsed_metric_tags = self.parse_metric_tags(metric_tags)
+        compiled = self._shared_profiles.get_compiled(
+            name, self._get_bulk_threshold(), self.enforce_constraints, self.logger()
+        )
+        self._refresh_with_compiled_profile(self._shared_profiles.profiles[name], compiled)
+
+    def _refresh_with_compiled_profile(self, profile, compiled):
+        # type: (Dict[str, Any], CompiledProfile) -> None
+        metrics = profile['definition'].get('metrics', [])
 
         device = profile['definition'].get('device', {})
         self.add_device_tags(device)
@@ -195,9 +239,10 @@ class InstanceConfig:
         # In the future we'll probably want to implement de-duplication.
 
         self.metrics.extend(metrics)
-        self.oid_config.add_parsed_oids(scalar_oids=scalar_oids + tag_oids, next_oids=next_oids, bulk_oids=bulk_oids)
-        self.parsed_metrics.extend(parsed_metrics)
-        self.parsed_metric_tags.extend(parsed_metric_tags)
+        self._resolver.register_shared(compiled.resolver)
+        self.oid_config.add_shared_oids(compiled.scalar_oids, compiled.next_oids, compiled.bulk_oids)
+        self.parsed_metrics.extend(compiled.parsed_metrics)
+        self.parsed_metric_tags.extend(compiled.parsed_metric_tags)
 
     def add_profile_tag(self, profile_name):
         # type: (str) -> None
@@ -297,11 +342,16 @@ class InstanceConfig:
     def parse_metrics(self, metrics):
         # type: (list) -> Tuple[List[OID], List[OID], List[OID], List[ParsedMetric]]
         """Parse configuration and returns data to be used for SNMP queries."""
-        # Use bulk for SNMP version > 1 only.
-        bulk_threshold = self.bulk_threshold if self._auth_data.mpModel else 0
-        result = parse_metrics(metrics, resolver=self._resolver, logger=self.logger(), bulk_threshold=bulk_threshold)
+        result = parse_metrics(
+            metrics, resolver=self._resolver, logger=self.logger(), bulk_threshold=self._get_bulk_threshold()
+        )
         return result['oids'], result['next_oids'], result['bulk_oids'], result['parsed_metrics']
 
+    def _get_bulk_threshold(self):
+        # type: () -> int
+        # Use bulk for SNMP version > 1 only.
+        return self.bulk_threshold if self._auth_data.mpModel else 0
+
     def parse_metric_tags(self, metric_tags):
         # type: (list) -> Tuple[List[OID], List[SymbolTag]]
         """Parse configuration for global metric_tags."""
@@ -325,6 +375,9 @@ class InstanceConfig:
 class OIDConfig(object):
     """
     Manages scalar/next/bulk oids to be used for snmp PDU calls.
+
+    The OIDs of compiled profiles are referenced rather than copied, and only chained with the OIDs parsed for the
+    device when read.
     """
 
     def __init__(self, refresh_interval_sec):
@@ -335,30 +388,42 @@ class OIDConfig(object):
         self._scalar_oids = []  # type: List[OID]
         self._next_oids = []  # type: List[OID]
         self._bulk_oids = []  # type: List[OID]
+        self._shared_scalar_oids = []  # type: List[Tuple[OID, ...]]
+        self._shared_next_oids = []  # type: List[Tuple[OID, ...]]
+        self._shared_bulk_oids = []  # type: List[Tuple[OID, ...]]
 
         self._all_scalar_oids = []  # type: List[OID]
         self._use_scalar_oids_cache = False
 
+    @staticmethod
+    def _chain_oids(oids, shared_oids):
+        # type: (List[OID], List[Tuple[OID, ...]]) -> Sequence[OID]
+        if not shared_oids:
+            return oids
+        if not oids and len(shared_oids) == 1:
+            return shared_oids[0]
+        return oids + [oid for shared in shared_oids for oid in shared]
+
     @property
     def scalar_oids(self):
-        # type: () -> List[OID]
+        # type: () -> Sequence[OID]
         if self._use_scalar_oids_cache:
             return self._all_scalar_oids
-        return self._scalar_oids
+        return self._chain_oids(self._scalar_oids, self._shared_scalar_oids)
 
     @property
     def next_oids(self):
-        # type: () -> List[OID]
+        # type: () -> Sequence[OID]
         if self._use_scalar_oids_cache:
             return []
-        return self._next_oids
+        return self._chain_oids(self._next_oids, self._shared_next_oids)
 
     @property
     def bulk_oids(self):
-        # type: () -> List[OID]
+        # type: () -> Sequence[OID]
         if self._use_scalar_oids_cache:
             return []
-        return self._bulk_oids
+        return self._chain_oids(self._bulk_oids, self._shared_bulk_oids)
 
     def add_parsed_oids(self, scalar_oids=None, next_oids=None, bulk_oids=None):
         # type: (List[OID], List[OID], List[OID]) -> None
@@ -370,6 +435,19 @@ class OIDConfig(object):
             self._bulk_oids.extend(bulk_oids)
         self.reset()
 
+    def add_shared_oids(self, scalar_oids, next_oids, bulk_oids):
+        # type: (Tuple[OID, ...], Tuple[OID, ...], Tuple[OID, ...]) -> None
+        """
+        Add OIDs shared with other devices, which must not be modified.
+        """
+        if scalar_oids:
+            self._shared_scalar_oids.append(scalar_oids)
+        if next_oids:
+            self._shared_next_oids.append(next_oids)
+        if bulk_oids:
+            self._shared_bulk_oids.append(bulk_oids)
+        self.reset()
+
     def has_oids(self):
         # type: () -> bool
         """
@@ -381,15 +459,20 @@ class OIDConfig(object):
         # type: () -> bool
         return self._refresh_interval_sec > 0
 
+    def needs_scalar_oids(self):
+        # type: () -> bool
+        """
+        Whether the scalar oids of the next snmp calls would be used by `update_scalar_oids`.
+        """
+        # Do not update if we are already using scalar oids cache.
+        return self._is_cache_enabled() and not self._use_scalar_oids_cache
+
     def update_scalar_oids(self, new_scalar_oids):
         # type: (List[OID]) -> None
         """
         Use only scalar oids for following snmp calls.
         """
-        if not self._is_cache_enabled():
-            return
-        # Do not update if we are already using scalar oids cache.
-        if self._use_scalar_oids_cache:
+        if not self.needs_scalar_oids():
             return
         self._all_scalar_oids = new_scalar_oids
         self._use_scalar_oids_cache = True
@@ -5,12 +5,17 @@
 import json
 import time
 import weakref  # noqa: F401
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional, Tuple  # noqa: F401
+
+from pysnmp.proto import errind
 
 from datadog_checks.base import ConfigurationError
 
+from .commands import snmp_get_window
 from .compat import write_persistent_cache
 from .config import InstanceConfig  # noqa: F401
+from .pysnmp_types import ObjectIdentity, ObjectType
+from .utils import register_device_target
 
 if TYPE_CHECKING:
     from .snmp import SnmpCheck  # noqa: F401
@@ -28,43 +33,152 @@ def discover_instances(config, interval, check_ref):
 
     while True:
         start_time = time.time()
-        for host in config.network_hosts():
-            check = check_ref()
-            if check is None or not check._running:
-                return
+        if config.discovery_probe_workers > 1:
+            hosts_probed = _discover_hosts_concurrently(config, check_ref)
+        else:
+            hosts_probed = _discover_hosts(config, check_ref)
 
-            host_config = check._build_autodiscovery_config(config.instance, host)
+        if hosts_probed is None:
+            return
 
-            try:
-                sys_object_oid = check.fetch_sysobject_oid(host_config)
-            except Exception as e:
-                check.log.debug("Error scanning host %s: %s", host, e)
-                del check
-                continue
+        check = check_ref()
+        if check is None:
+            return
+        # Write again at the end of the loop, in case some host have been removed since last
+        write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
 
-            try:
-                profile = check._profile_for_sysobject_oid(sys_object_oid)
-            except ConfigurationError:
-                if not host_config.oid_config.has_oids():
-                    check.log.warning("Host %s didn't match a profile for sysObjectID %s", host, sys_object_oid)
-                    del check
-                    continue
-            else:
-                host_config.refresh_with_profile(check.profiles[profile])
-                host_config.add_profile_tag(profile)
+        time_elapsed = time.time() - start_time
+        check.submit_discovery_telemetry_metrics(time_elapsed, hosts_probed)
+        del check
 
-            config.discovered_instances[host] = host_config
+        if interval - time_elapsed > 0:
+            time.sleep(interval - time_elapsed)
 
-            write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
+
+def _discover_hosts(config, check_ref):
+    # type: (InstanceConfig, weakref.ref[SnmpCheck]) -> Optional[int]
+    """Scan the hosts of the network one at a time.
+
+    Return the number of hosts probed, or `None` if the check stopped.
+    """
+    hosts_probed = 0
+    for host in config.network_hosts():
+        check = check_ref()
+        if check is None or not check._running:
+            return None
+
+        hosts_probed += 1
+        host_config = check._build_autodiscovery_config(config.instance, host)
+
+        try:
+            sys_object_oid = check.fetch_sysobject_oid(host_config)
+        except Exception as e:
+            check.log.debug("Error scanning host %s: %s", host, e)
+        else:
+            if _add_discovered_host(check, config, host, host_config, sys_object_oid):
+                write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
+        del check
+
+    return hosts_probed
+
+
+def _discover_hosts_concurrently(config, check_ref):
+    # type: (InstanceConfig, weakref.ref[SnmpCheck]) -> Optional[int]
+    """Scan the hosts of the network with up to `discovery_probe_workers` probes in flight at the same time.
+
+    Return the number of hosts probed, or `None` if the check stopped.
+    """
+    scan = {'hosts_probed': 0, 'stopped': False}
+
+    def hosts():
+        # type: () -> Iterator[str]
+        for host in config.network_hosts():
+            check = check_ref()
+            if check is None or not check._running:
+                scan['stopped'] = True
+                return
             del check
 
+            scan['hosts_probed'] += 1
+            yield host
+
+    def on_sys_object_oid(host, sys_object_oid):
+        # type: (str, str) -> None
         check = check_ref()
         if check is None:
             return
-        # Write again at the end of the loop, in case some host have been removed since last
-        write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
+
+        host_config = check._build_autodiscovery_config(config.instance, host)
+        # Persist the hosts found so far, so they are not lost if the agent restarts in the middle of the scan
+        if _add_discovered_host(check, config, host, host_config, sys_object_oid):
+            write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
+
+    try:
+        probe_sysobject_oids(config, hosts(), on_sys_object_oid)
+    except Exception as e:
+        check = check_ref()
+        if check is not None:
+            check.log.debug("Error scanning hosts of network %s: %s", config.ip_network, e)
         del check
 
-        time_elapsed = time.time() - start_time
-        if interval - time_elapsed > 0:
-            time.sleep(interval - time_elapsed)
+    if scan['stopped']:
+        return None
+    return scan['hosts_probed']
+
+
+def probe_sysobject_oids(config, hosts, callback):
+    # type: (InstanceConfig, Iterator[str], Callable[[str, str], None]) -> None
+    """Call `callback` with the sysObjectID of the hosts that answered the probe.
+
+    A new host is probed as soon as another one completes, with up to `discovery_probe_workers` probes in flight.
+    The first probe of a host has the short `discovery_probe_timeout` and no retries, so that unreachable addresses
+    barely hold up the scan. Hosts that answer it with an error, e.g. during the SNMPv3 engine discovery, are probed
+    again with the `timeout` and `retries` of the instance.
+    """
+    port = int(config.instance.get('port', 161))
+    reprobed = set()
+
+    def register(host, timeout, retries):
+        # type: (str, float, int) -> str
+        return register_device_target(
+            host,
+            port,
+            timeout=timeout,
+            retries=retries,
+            engine=config._snmp_engine,
+            auth_data=config._auth_data,
+            context_data=config._context_data,
+        )
+
+    def requests():
+        # type: () -> Iterator[Tuple[str, str]]
+        for host in hosts:
+            yield host, register(host, config.discovery_probe_timeout, 0)
+
+    def on_response(host, error_indication, var_binds):
+        # type: (str, Any, list) -> Optional[str]
+        if not error_indication:
+            callback(host, var_binds[0][1].prettyPrint())
+        elif not isinstance(error_indication, errind.RequestTimedOut) and host not in reprobed:
+            reprobed.add(host)
+            return register(host, config.timeout, config.retries)
+        return None
+
+    oid = ObjectType(ObjectIdentity((1, 3, 6, 1, 2, 1, 1, 2, 0)))
+    snmp_get_window(config, requests(), [oid], False, config.discovery_probe_workers, on_response)
+
+
+def _add_discovered_host(check, config, host, host_config, sys_object_oid):
+    # type: (SnmpCheck, InstanceConfig, str, InstanceConfig, str) -> bool
+    try:
+        profile = check._profile_for_sysobject_oid(sys_object_oid)
+    except ConfigurationError:
+        if not host_config.oid_config.has_oids():
+            check.log.warning("Host %s didn't match a profile for sysObjectID %s", host, sys_object_oid)
+            return False
+    else:
+        host_config.refresh_with_shared_profile(profile)
+        host_config.add_profile_tag(profile)
+
+    config.discovered_instances[host] = host_config
+    return True
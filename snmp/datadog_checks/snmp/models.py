@@ -105,6 +105,11 @@ class Device:
         self._port = port
         self._target = target
 
+    @property
+    def ip(self):
+        # type: () -> str
+        return self._ip
+
     @property
     def target(self):
         # type: () -> str
@@ -0,0 +1,153 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+"""
+Process-wide sharing of SNMP profiles between check instances.
+"""
+import functools
+import threading
+import weakref
+from logging import Logger  # noqa: F401
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple  # noqa: F401
+
+from .models import OID  # noqa: F401
+from .parsing import ParsedMetric, SymbolTag, parse_metrics, parse_symbol_metric_tags  # noqa: F401
+from .resolver import OIDResolver
+
+
+class CompiledProfile(object):
+    """
+    The OIDs to fetch, parsed metrics and OID translations of a profile.
+
+    Compiled profiles are shared by all the devices using the same profile and must not be modified.
+    """
+
+    __slots__ = ('scalar_oids', 'next_oids', 'bulk_oids', 'parsed_metrics', 'parsed_metric_tags', 'resolver')
+
+    def __init__(
+        self,
+        scalar_oids,  # type: Tuple[OID, ...]
+        next_oids,  # type: Tuple[OID, ...]
+        bulk_oids,  # type: Tuple[OID, ...]
+        parsed_metrics,  # type: Tuple[ParsedMetric, ...]
+        parsed_metric_tags,  # type: Tuple[SymbolTag, ...]
+        resolver,  # type: OIDResolver
+    ):
+        # type: (...) -> None
+        self.scalar_oids = scalar_oids
+        self.next_oids = next_oids
+        self.bulk_oids = bulk_oids
+        self.parsed_metrics = parsed_metrics
+        self.parsed_metric_tags = parsed_metric_tags
+        self.resolver = resolver
+
+
+def compile_profile(profile, bulk_threshold, enforce_constraints, logger=None):
+    # type: (Dict[str, Any], int, bool, Optional[Logger]) -> CompiledProfile
+    """Parse the metrics and metric tags of a profile."""
+    # OID translations are only recorded here, they are registered in the resolver of each device using the profile
+    resolver = OIDResolver(None, enforce_constraints)
+
+    metrics = profile['definition'].get('metrics', [])
+    metrics_result = parse_metrics(metrics, resolver=resolver, logger=logger, bulk_threshold=bulk_threshold)
+
+    metric_tags = profile['definition'].get('metric_tags', [])
+    metric_tags_result = parse_symbol_metric_tags(metric_tags, resolver=resolver)
+
+    return CompiledProfile(
+        scalar_oids=tuple(metrics_result['oids'] + metric_tags_result['oids']),
+        next_oids=tuple(metrics_result['next_oids']),
+        bulk_oids=tuple(metrics_result['bulk_oids']),
+        parsed_metrics=tuple(metrics_result['parsed_metrics']),
+        parsed_metric_tags=tuple(metric_tags_result['parsed_symbol_tags']),
+        resolver=resolver,
+    )
+
+
+class SharedProfiles(object):
+    """
+    The profiles loaded from a given configuration, along with the profiles compiled so far.
+    """
+
+    def __init__(self, profiles, profiles_by_oid):
+        # type: (Dict[str, Dict[str, Any]], Dict[str, str]) -> None
+        self.profiles = profiles
+        self.profiles_by_oid = profiles_by_oid
+        self._compiled = {}  # type: Dict[Tuple[str, int, bool], CompiledProfile]
+        self._lock = threading.Lock()
+
+    def get_compiled(self, name, bulk_threshold, enforce_constraints, logger=None):
+        # type: (str, int, bool, Optional[Logger]) -> CompiledProfile
+        """Return the profile `name` compiled with the given options, compiling it only once."""
+        key = (name, bulk_threshold, enforce_constraints)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is None:
+                compiled = compile_profile(self.profiles[name], bulk_threshold, enforce_constraints, logger)
+                self._compiled[key] = compiled
+
+        return compiled
+
+
+class ProfilesCache(object):
+    """
+    A process-wide cache of `SharedProfiles`, by profiles configuration.
+
+    Each entry is reference-counted by the check instances that acquired it, and dropped as soon as all of them
+    released it or were garbage collected. Updated profile definitions are therefore picked up once all the
+    instances using them are unscheduled.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self._entries = {}  # type: Dict[Hashable, Tuple[SharedProfiles, Dict[int, weakref.ref]]]
+        # Reentrant, as owners can be garbage collected while the lock is held
+        self._lock = threading.RLock()
+
+    @classmethod
+    def shared_instance(cls):
+        # type: () -> ProfilesCache
+        """
+        Return the globally shared cache instance.
+        """
+        if not hasattr(cls, "_instance"):
+            cls._instance = ProfilesCache()  # type: ignore
+        return cls._instance  # type: ignore
+
+    def acquire(self, key, owner, load):
+        # type: (Hashable, Any, Callable[[], SharedProfiles]) -> SharedProfiles
+        """
+        Return the profiles cached for `key` on behalf of `owner`, calling `load` to create them if needed.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = (load(), {})
+
+            shared_profiles, owners = entry
+            owner_id = id(owner)
+            owners[owner_id] = weakref.ref(owner, functools.partial(self._remove_owner, key, owner_id))
+            return shared_profiles
+
+    def release(self, key, owner):
+        # type: (Hashable, Any) -> None
+        """
+        Release the profiles acquired for `key` by `owner`.
+        """
+        self._remove_owner(key, id(owner))
+
+    def _remove_owner(self, key, owner_id, _ref=None):
+        # type: (Hashable, int, Optional[weakref.ref]) -> None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+
+            owners = entry[1]
+            owners.pop(owner_id, None)
+            if not owners:
+                del self._entries[key]
+
+    def __contains__(self, key):
+        # type: (Hashable) -> bool
+        return key in self._entries
@@ -3,11 +3,12 @@
 # Licensed under Simplified BSD License (see LICENSE)
 
 from collections import defaultdict
-from typing import DefaultDict, Dict, List, Optional, Tuple  # noqa: F401
+from typing import DefaultDict, Dict, Iterator, List, Optional, Tuple, Union  # noqa: F401
 
-from .models import OID  # noqa: F401
-from .pysnmp_types import MibViewController  # noqa: F401
+from .models import OID
+from .pysnmp_types import MibViewController, ObjectIdentity, ObjectName  # noqa: F401
 from .types import OIDMatch
+from .utils import parse_as_oid_tuple
 
 
 class OIDTreeNode(object):
@@ -54,6 +55,64 @@ class OIDTrie(object):
 
         return tuple(matched), name
 
+    def items(self):
+        # type: () -> Iterator[Tuple[Tuple[int, ...], str]]
+        """Iterate over the OIDs set in the trie and their names."""
+        stack = [((), self._root)]  # type: List[Tuple[Tuple[int, ...], OIDTreeNode]]
+
+        while stack:
+            parts, node = stack.pop()
+            if node.name is not None:
+                yield parts, node.name
+            for part, child in node.children.items():
+                stack.append((parts + (part,), child))
+
+    def compile(self):
+        # type: () -> OIDPrefixIndex
+        """Flatten the trie into an `OIDPrefixIndex` returning the same matches as `match`."""
+        prefixes = {}  # type: Dict[Tuple[int, ...], str]
+        stack = [((), self._root, None)]  # type: List[Tuple[Tuple[int, ...], OIDTreeNode, Optional[str]]]
+
+        while stack:
+            parts, node, name = stack.pop()
+            if node.name is not None:
+                name = node.name
+            if name is not None:
+                prefixes[parts] = name
+            for part, child in node.children.items():
+                stack.append((parts + (part,), child, name))
+
+        return OIDPrefixIndex(prefixes)
+
+
+class OIDPrefixIndex(object):
+    """A read-only, flattened version of an `OIDTrie`.
+
+    Every node of the trie that is, or descends from, a named node is stored in a dict along with the name of its
+    closest named ancestor, so that a match only needs a few hash lookups instead of a walk down the trie.
+    """
+
+    __slots__ = ('_prefixes', '_lengths')
+
+    def __init__(self, prefixes):
+        # type: (Dict[Tuple[int, ...], str]) -> None
+        self._prefixes = prefixes
+        self._lengths = sorted({len(prefix) for prefix in prefixes}, reverse=True)
+
+    def match(self, parts):
+        # type: (Tuple[int, ...]) -> Tuple[int, Optional[str]]
+        """Return the length of the longest prefix of `parts` in the trie and its name, if any."""
+        prefixes = self._prefixes
+        size = len(parts)
+
+        for length in self._lengths:
+            if length <= size:
+                name = prefixes.get(parts[:length])
+                if name is not None:
+                    return length, name
+
+        return 0, None
+
 
 class OIDResolver(object):
     """
@@ -83,13 +142,25 @@ class OIDResolver(object):
               1: ipv4
               2: ipv6
     ```
+
+    Resolutions are cached by OID, as devices return the same OIDs on every run. The cache is dropped whenever a
+    translation is registered, e.g. when the profile of the device changes.
+
+    The translations of a profile are not copied into the resolver of every device using it: the read-only resolver
+    of the compiled profile is shared instead, and looked up before the translations registered on this resolver.
     """
 
+    # Bound the memory used to cache the resolutions of very large tables, past that OIDs are resolved every time
+    MAX_CACHED_OIDS = 100000
+
     def __init__(self, mib_view_controller, enforce_constraints):
         # type: (MibViewController, bool) -> None
         self._mib_view_controller = mib_view_controller
         self._resolver = OIDTrie()
+        self._index = None  # type: Optional[OIDPrefixIndex]
+        self._cache = {}  # type: Dict[Tuple[int, ...], OIDMatch]
         self._index_resolvers = defaultdict(dict)  # type: DefaultDict[str, Dict[int, Dict[int, str]]]
+        self._shared_resolvers = []  # type: List[OIDResolver]
         self._enforce_constraints = enforce_constraints
 
     def register(self, oid, name):
@@ -99,6 +170,7 @@ class OIDResolver(object):
         Corresponds to XXX(1) and XXX(2) in the summary listing.
         """
         self._resolver.set(oid.as_tuple(), name)
+        self._invalidate()
 
     def register_index(self, tag, index, mapping):
         # type: (str, int, Dict[int, str]) -> None
@@ -107,6 +179,21 @@ class OIDResolver(object):
         Corresponds to XXX(3) in the summary listing.
         """
         self._index_resolvers[tag][index] = mapping
+        self._invalidate()
+
+    def register_shared(self, other):
+        # type: (OIDResolver) -> None
+        """Resolve OIDs with the translations of a resolver shared with other devices, which must not be modified.
+
+        Its translations take precedence over the ones registered on this resolver for the same OIDs.
+        """
+        self._shared_resolvers.append(other)
+        self._invalidate()
+
+    def _invalidate(self):
+        # type: () -> None
+        self._index = None
+        self._cache = {}
 
     def _resolve_from_mibs(self, oid):
         # type: (OID) -> OIDMatch
@@ -120,9 +207,31 @@ class OIDResolver(object):
 
         return OIDMatch(name=mib_symbol.symbol, indexes=mib_symbol.prefix)
 
+    def _match(self, parts):
+        # type: (Tuple[int, ...]) -> Tuple[int, Optional[str]]
+        if self._index is None:
+            # Shared resolvers may be compiled by several threads at once, which only builds identical indexes
+            self._index = self._resolver.compile()
+
+        return self._index.match(parts)
+
+    def _get_index_mappings(self, name):
+        # type: (str) -> Optional[Dict[int, Dict[int, str]]]
+        mappings_by_index = self._index_resolvers.get(name)
+        for shared_resolver in self._shared_resolvers:
+            shared_mappings = shared_resolver._index_resolvers.get(name)
+            if shared_mappings is not None:
+                if mappings_by_index is None:
+                    mappings_by_index = shared_mappings
+                else:
+                    mappings_by_index = dict(mappings_by_index)
+                    mappings_by_index.update(shared_mappings)
+
+        return mappings_by_index
+
     def _resolve_tag_index(self, tail, name):
         # type: (Tuple[int, ...], str) -> Tuple[str, ...]
-        mappings_by_index = self._index_resolvers.get(name)
+        mappings_by_index = self._get_index_mappings(name)
 
         if mappings_by_index is None:
             # No mapping -> use the OID parts themselves as tag values.
@@ -156,13 +265,42 @@ class OIDResolver(object):
         tag_index: a sequence of tag values. k-th item in the sequence corresponds to the k-th entry in `metric_tags`.
         """
         parts = oid.as_tuple()
-        prefix, name = self._resolver.match(parts)
+        match = self._cache.get(parts)
+        if match is None:
+            match = self._resolve(parts, oid)
+
+        return match
+
+    def resolve_raw_oid(self, raw_oid):
+        # type: (Union[ObjectName, ObjectIdentity]) -> OIDMatch
+        """Resolve an OID returned by PySNMP like `resolve_oid`, only building an `OID` if MIBs are needed."""
+        parts = parse_as_oid_tuple(raw_oid)
+        match = self._cache.get(parts)
+        if match is None:
+            match = self._resolve(parts, raw_oid)
+
+        return match
+
+    def _resolve(self, parts, oid):
+        # type: (Tuple[int, ...], Union[OID, ObjectName, ObjectIdentity]) -> OIDMatch
+        length, name = 0, None  # type: Tuple[int, Optional[str]]
+        for shared_resolver in self._shared_resolvers:
+            shared_length, shared_name = shared_resolver._match(parts)
+            if shared_name is not None and shared_length > length:
+                length, name = shared_length, shared_name
+
+        own_length, own_name = self._match(parts)
+        if own_name is not None and own_length > length:
+            length, name = own_length, own_name
 
         if name is None:
-            return self._resolve_from_mibs(oid)
+            match = self._resolve_from_mibs(oid if isinstance(oid, OID) else OID(oid))
+        else:
+            # Example: parts: (1, 3, 6, 1, 2, 1, 1), prefix: (1, 3, 6, 1) -> tail: (2, 1, 1)
+            tail = parts[length:]
+            match = OIDMatch(name=name, indexes=self._resolve_tag_index(tail, name=name))
 
-        # Example: parts: (1, 3, 6, 1, 2, 1, 1), prefix: (1, 3, 6, 1) -> tail: (2, 1, 1)
-        tail = parts[len(prefix) :]
+        if len(self._cache) < self.MAX_CACHED_OIDS:
+            self._cache[parts] = match
 
-        tag_index = self._resolve_tag_index(tail, name=name)
-        return OIDMatch(name=name, indexes=tag_index)
+        return match
@@ -20,7 +20,7 @@ from datadog_checks.base import AgentCheck, ConfigurationError, is_affirmative
 from datadog_checks.base.errors import CheckException
 from datadog_checks.snmp.utils import extract_value
 
-from .commands import snmp_bulk, snmp_get, snmp_getnext
+from .commands import PipelinedFetcher, reply_invalid, snmp_bulk, snmp_get, snmp_getnext
 from .compat import read_persistent_cache, write_persistent_cache
 from .config import InstanceConfig
 from .discovery import discover_instances
@@ -29,7 +29,9 @@ from .metrics import as_metric_with_forced_type, as_metric_with_inferred_type, t
 from .mibs import MIBLoader
 from .models import OID
 from .parsing import ColumnTag, IndexTag, ParsedMetric, ParsedTableMetric, SymbolTag  # noqa: F401
-from .pysnmp_types import ObjectIdentity, ObjectType, noSuchInstance, noSuchObject
+from .profiles import ProfilesCache, SharedProfiles  # noqa: F401
+from .pysnmp_types import ObjectIdentity, ObjectType
+from .tuning import RequestSizeTuner
 from .utils import (
     OIDPrinter,
     batches,
@@ -46,11 +48,6 @@ LOADER_TAG = 'loader:python'
 _MAX_FETCH_NUMBER = 10**6
 
 
-def reply_invalid(oid):
-    # type: (Any) -> bool
-    return noSuchInstance.isSameTypeWith(oid) or noSuchObject.isSameTypeWith(oid)
-
-
 class SnmpCheck(AgentCheck):
 
     SC_STATUS = 'snmp.can_check'
@@ -78,8 +75,17 @@ class SnmpCheck(AgentCheck):
             self.init_config.get('refresh_oids_cache_interval', InstanceConfig.DEFAULT_REFRESH_OIDS_CACHE_INTERVAL)
         )
 
-        self.profiles = self._load_profiles()
-        self.profiles_by_oid = self._get_profiles_mapping()
+        # Profiles are shared by all the instances with the same profiles configuration
+        configured_profiles = self.init_config.get('profiles')
+        self._profiles_key = None if configured_profiles is None else json.dumps(configured_profiles, sort_keys=True)
+        self._shared_profiles = ProfilesCache.shared_instance().acquire(
+            self._profiles_key, self, self._load_shared_profiles
+        )
+        self.profiles = self._shared_profiles.profiles
+        self.profiles_by_oid = self._shared_profiles.profiles_by_oid
+
+        # Request sizes learned for each device, by IP address
+        self._request_sizes = None  # type: Optional[Dict[str, Any]]
 
         self._config = self._build_config(self.instance)
 
@@ -102,6 +108,11 @@ class SnmpCheck(AgentCheck):
         # Include check ID to avoid conflicts between concurrent instances of the check.
         return '{}-{}'.format(self.check_id, self._last_fetch_number)
 
+    def _load_shared_profiles(self):
+        # type: () -> SharedProfiles
+        profiles = self._load_profiles()
+        return SharedProfiles(profiles, self._get_profiles_mapping(profiles))
+
     def _load_profiles(self):
         # type: () -> Dict[str, Dict[str, Any]]
         """
@@ -129,13 +140,13 @@ class SnmpCheck(AgentCheck):
 
         return profiles
 
-    def _get_profiles_mapping(self):
-        # type: () -> Dict[str, str]
+    def _get_profiles_mapping(self, profiles):
+        # type: (Dict[str, Dict[str, Any]]) -> Dict[str, str]
         """
         Get the mapping from sysObjectID to profile.
         """
         profiles_by_oid = {}  # type: Dict[str, str]
-        for name, profile in self.profiles.items():
+        for name, profile in profiles.items():
             sys_object_oids = profile['definition'].get('sysobjectid')
             if sys_object_oids is None:
                 continue
@@ -155,7 +166,7 @@ class SnmpCheck(AgentCheck):
         # type: (dict) -> InstanceConfig
         loader = MIBLoader.shared_instance() if self.optimize_mib_memory_usage else MIBLoader()
 
-        return InstanceConfig(
+        config = InstanceConfig(
             instance,
             global_metrics=self.init_config.get('global_metrics', []),
             mibs_path=self.mibs_path,
@@ -164,7 +175,57 @@ class SnmpCheck(AgentCheck):
             profiles_by_oid=self.profiles_by_oid,
             loader=loader,
             logger=self.log,
+            shared_profiles=self._shared_profiles,
         )
+        if config.adaptive_request_size and config.device is not None:
+            config.request_tuner = RequestSizeTuner(self.oid_batch_size, self._MAX_REPETITIONS, config.timeout)
+            # The sizes are loaded on the first run, before it the check ID is not known yet
+            if self._request_sizes is not None:
+                config.request_tuner.load(self._request_sizes.get(config.device.ip))
+
+        return config
+
+    def _get_request_sizes_cache_key(self):
+        # type: () -> str
+        return '{}_request_sizes'.format(self.check_id)
+
+    def _load_request_sizes(self):
+        # type: () -> Dict[str, Any]
+        if self._request_sizes is None:
+            self._request_sizes = {}
+            cache = read_persistent_cache(self._get_request_sizes_cache_key())
+            if cache:
+                try:
+                    request_sizes = json.loads(cache)
+                except ValueError:
+                    self.log.debug('Ignoring invalid request sizes in the persistent cache: %s', cache)
+                else:
+                    if isinstance(request_sizes, dict):
+                        self._request_sizes = request_sizes
+
+        return self._request_sizes
+
+    def _restore_request_sizes(self, config):
+        # type: (InstanceConfig) -> None
+        request_sizes = self._load_request_sizes()
+        if config.request_tuner is not None and config.device is not None:
+            config.request_tuner.load(request_sizes.get(config.device.ip))
+
+    def _save_request_sizes(self, configs):
+        # type: (List[InstanceConfig]) -> None
+        request_sizes = self._load_request_sizes()
+        updated = False
+        for config in configs:
+            if config.request_tuner is None or config.device is None:
+                continue
+
+            state = config.request_tuner.state()
+            if request_sizes.get(config.device.ip) != state:
+                request_sizes[config.device.ip] = state
+                updated = True
+
+        if updated:
+            write_persistent_cache(self._get_request_sizes_cache_key(), json.dumps(request_sizes))
 
     def _build_autodiscovery_config(self, source_instance, ip_address):
         # type: (dict, str) -> InstanceConfig
@@ -209,13 +270,78 @@ class SnmpCheck(AgentCheck):
         enforce_constraints = config.enforce_constraints
         fetch_id = self._get_next_fetch_id()
 
-        all_binds, error = self.fetch_oids(
+        if config.request_window_size > 1:
+            all_binds, error = self.fetch_oids_pipelined(config, enforce_constraints, fetch_id)
+        else:
+            all_binds, error = self.fetch_oids(
+                config,
+                config.oid_config.scalar_oids,
+                config.oid_config.next_oids,
+                enforce_constraints=enforce_constraints,
+                fetch_id=fetch_id,
+            )
+            bulk_binds, bulk_error = self.fetch_bulk_oids(config, enforce_constraints, fetch_id)
+            all_binds.extend(bulk_binds)
+            error = error or bulk_error
+
+        # Only wrap the OIDs that are going to be cached, resolution works on the raw OIDs
+        scalar_oids = []
+        keep_scalar_oids = config.oid_config.needs_scalar_oids()
+        for result_oid, value in all_binds:
+            if keep_scalar_oids:
+                scalar_oids.append(OID(result_oid))
+            match = config.resolve_raw_oid(result_oid)
+            results[match.name][match.indexes] = value
+        self.log.debug('[%s] Raw results: %s', fetch_id, OIDPrinter(results, with_values=False))
+        # Freeze the result
+        results.default_factory = None  # type: ignore
+        return results, scalar_oids, error
+
+    def fetch_oids_pipelined(self, config, enforce_constraints, fetch_id):
+        # type: (InstanceConfig, bool, str) -> Tuple[List[Any], Optional[str]]
+        """
+        Fetch all the OIDs of the device like `fetch_oids` and `fetch_bulk_oids`, but with several requests
+        in flight at the same time.
+        """
+        oid_batch_size = self._get_oid_batch_size(config)
+        fetcher = PipelinedFetcher(
             config,
-            config.oid_config.scalar_oids,
-            config.oid_config.next_oids,
-            enforce_constraints=enforce_constraints,
-            fetch_id=fetch_id,
+            oid_batch_size,
+            lookup_mib=enforce_constraints,
+            ignore_nonincreasing_oid=self.ignore_nonincreasing_oid,
+            non_repeaters=self._NON_REPEATERS,
+            max_repetitions=self._MAX_REPETITIONS,
         )
+        for oids_batch in batches([oid.as_object_type() for oid in config.oid_config.scalar_oids], oid_batch_size):
+            fetcher.get(oids_batch)
+        for oids_batch in batches([oid.as_object_type() for oid in config.oid_config.next_oids], oid_batch_size):
+            fetcher.getnext(oids_batch)
+        for oid in config.oid_config.bulk_oids:
+            fetcher.bulk(oid.as_object_type())
+
+        self.log.debug('[%s] Running pipelined SNMP commands with a window of %d', fetch_id, config.request_window)
+        all_binds = fetcher.run()
+        self.log.debug('[%s] Returned vars: %s', fetch_id, OIDPrinter(all_binds, with_values=True))
+
+        error = None
+        for e in fetcher.errors:
+            message = '[{}] Failed to collect some metrics: {}'.format(fetch_id, e)
+            if not error:
+                error = message
+            self.warning(message)
+
+        return all_binds, error
+
+    def _get_oid_batch_size(self, config):
+        # type: (InstanceConfig) -> int
+        if config.request_tuner is not None:
+            return config.request_tuner.oid_batch_size
+        return self.oid_batch_size
+
+    def fetch_bulk_oids(self, config, enforce_constraints, fetch_id):
+        # type: (InstanceConfig, bool, str) -> Tuple[List[Any], Optional[str]]
+        error = None
+        all_binds = []
         for oid in config.oid_config.bulk_oids:
             try:
                 oid_object_type = oid.as_object_type()
@@ -239,16 +365,7 @@ class SnmpCheck(AgentCheck):
                     error = message
                 self.warning(message)
 
-        scalar_oids = []
-        for result_oid, value in all_binds:
-            oid = OID(result_oid)
-            scalar_oids.append(oid)
-            match = config.resolve_oid(oid)
-            results[match.name][match.indexes] = value
-        self.log.debug('[%s] Raw results: %s', fetch_id, OIDPrinter(results, with_values=False))
-        # Freeze the result
-        results.default_factory = None  # type: ignore
-        return results, scalar_oids, error
+        return all_binds, error
 
     def fetch_oids(self, config, scalar_oids, next_oids, enforce_constraints, fetch_id):
         # type: (InstanceConfig, List[OID], List[OID], bool, str) -> Tuple[List[Any], Optional[str]]
@@ -263,7 +380,7 @@ class SnmpCheck(AgentCheck):
         next_oids = [oid.as_object_type() for oid in next_oids]
         all_binds = []
 
-        for oids_batch in batches(scalar_oids, size=self.oid_batch_size):
+        for oids_batch in batches(scalar_oids, size=self._get_oid_batch_size(config)):
             try:
                 self.log.debug(
                     '[%s] Running SNMP command get on OIDS: %s', fetch_id, OIDPrinter(oids_batch, with_values=False)
@@ -292,7 +409,7 @@ class SnmpCheck(AgentCheck):
                     error = message
                 self.warning(message)
 
-        for oids_batch in batches(next_oids, size=self.oid_batch_size):
+        for oids_batch in batches(next_oids, size=self._get_oid_batch_size(config)):
             try:
                 self.log.debug(
                     '[%s] Running SNMP command getNext on OIDS: %s', fetch_id, OIDPrinter(oids_batch, with_values=False)
@@ -376,6 +493,9 @@ class SnmpCheck(AgentCheck):
         self._submitted_metrics = 0
         config = self._config
 
+        if self._request_sizes is None:
+            self._restore_request_sizes(config)
+
         if config.ip_network:
             if self._thread is None:
                 self._start_discovery()
@@ -394,9 +514,11 @@ class SnmpCheck(AgentCheck):
             tags = ['network:{}'.format(config.ip_network), 'autodiscovery_subnet:{}'.format(config.ip_network)]
             tags.extend(config.tags)
             self.gauge('snmp.discovered_devices_count', len(config.discovered_instances), tags=tags)
+            self._save_request_sizes(list(config.discovered_instances.values()))
         else:
             error, tags = self._check_device(config)
             # no need to handle error here since it's already handled inside `self._check_device`
+            self._save_request_sizes([config])
 
         self.submit_telemetry_metrics(start_time, tags)
 
@@ -411,6 +533,17 @@ class SnmpCheck(AgentCheck):
         self.gauge('datadog.snmp.check_duration', check_duration, tags=telemetry_tags)
         self.gauge('datadog.snmp.submitted_metrics', self._submitted_metrics, tags=telemetry_tags)
 
+    def submit_discovery_telemetry_metrics(self, scan_duration, hosts_probed):
+        # type: (float, int) -> None
+        config = self._config
+        tags = ['network:{}'.format(config.ip_network), 'autodiscovery_subnet:{}'.format(config.ip_network)]
+        tags.extend(config.tags)
+        tags.append(LOADER_TAG)
+        hosts_per_second = hosts_probed / scan_duration if scan_duration > 0 else 0
+        self.gauge('datadog.snmp.discovery.scan_duration', scan_duration, tags=tags)
+        self.gauge('datadog.snmp.discovery.hosts_probed', hosts_probed, tags=tags)
+        self.gauge('datadog.snmp.discovery.hosts_per_second', hosts_per_second, tags=tags)
+
     def _on_check_device_done(self, host, future):
         # type: (str, futures.Future) -> None
         config = self._config
@@ -426,6 +559,10 @@ class SnmpCheck(AgentCheck):
             # Reset the counter if not's failing
             config.failing_instances.pop(host, None)
 
+    def cancel(self):
+        # type: () -> None
+        ProfilesCache.shared_instance().release(self._profiles_key, self)
+
     def _check_device(self, config):
         # type: (InstanceConfig) -> Tuple[Optional[str], List[str]]
         # Reset errors
@@ -441,7 +578,7 @@ class SnmpCheck(AgentCheck):
             if not config.oid_config.has_oids():
                 sys_object_oid = self.fetch_sysobject_oid(config)
                 profile = self._profile_for_sysobject_oid(sys_object_oid)
-                config.refresh_with_profile(self.profiles[profile])
+                config.refresh_with_shared_profile(profile)
                 config.add_profile_tag(profile)
 
             if config.oid_config.has_oids():
@@ -467,6 +604,18 @@ class SnmpCheck(AgentCheck):
             # by using `sum by {X}` queries in UI. X being a tag like `autodiscovery_subnet`, `snmp_profile`, etc
             self.gauge('snmp.devices_monitored', 1, tags=tags + [LOADER_TAG])
 
+            if config.request_tuner is not None:
+                self.gauge(
+                    'datadog.snmp.request_size.oid_batch_size',
+                    config.request_tuner.oid_batch_size,
+                    tags=tags + [LOADER_TAG],
+                )
+                self.gauge(
+                    'datadog.snmp.request_size.max_repetitions',
+                    config.request_tuner.max_repetitions,
+                    tags=tags + [LOADER_TAG],
+                )
+
             # Report service checks
             status = self.OK
             if error:
@@ -0,0 +1,72 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+from typing import Any, Dict  # noqa: F401
+
+
+class RequestSizeTuner(object):
+    """
+    Learn the number of OIDs per GET/GETNEXT request and the GETBULK max-repetitions that suit a device.
+
+    Sizes are halved when a request times out or when its response does not fit in a PDU (`tooBig`), and are
+    reduced when responses get slow. They grow back slowly as long as full-sized requests are answered quickly.
+    GETBULK responses that the device truncated to fit in a PDU cap the max-repetitions to the rows it returned.
+    """
+
+    MAX_OID_BATCH_SIZE = 64
+    MAX_REPETITIONS = 64
+
+    # Responses taking longer than this fraction of the timeout are considered slow
+    SLOW_RESPONSE_RATIO = 0.5
+
+    def __init__(self, oid_batch_size, max_repetitions, timeout):
+        # type: (int, int, float) -> None
+        self.oid_batch_size = oid_batch_size
+        self.max_repetitions = max_repetitions
+        # Never cap the sizes below what was configured
+        self._max_oid_batch_size = max(oid_batch_size, self.MAX_OID_BATCH_SIZE)
+        self._max_repetitions = max(max_repetitions, self.MAX_REPETITIONS)
+        self._slow_response_time = timeout * self.SLOW_RESPONSE_RATIO
+
+    def observe_batch(self, size, latency, too_big=False, timed_out=False):
+        # type: (int, float, bool, bool) -> None
+        """Record the outcome of a GET or GETNEXT request for `size` OIDs."""
+        self.oid_batch_size = self._adjust(
+            self.oid_batch_size, size, latency, too_big or timed_out, self._max_oid_batch_size
+        )
+
+    def observe_bulk(self, rows, latency, truncated=False, timed_out=False):
+        # type: (int, float, bool, bool) -> None
+        """Record the outcome of a GETBULK request that returned `rows` rows."""
+        if truncated and not timed_out:
+            self.max_repetitions = max(1, min(self.max_repetitions, rows))
+        else:
+            self.max_repetitions = self._adjust(self.max_repetitions, rows, latency, timed_out, self._max_repetitions)
+
+    def _adjust(self, value, used, latency, failed, limit):
+        # type: (int, int, float, bool, int) -> int
+        if failed:
+            return max(1, value // 2)
+        if latency > self._slow_response_time:
+            return max(1, value - value // 4)
+        if used >= value:
+            return min(limit, value + max(1, value // 8))
+        return value
+
+    def state(self):
+        # type: () -> Dict[str, int]
+        return {'oid_batch_size': self.oid_batch_size, 'max_repetitions': self.max_repetitions}
+
+    def load(self, state):
+        # type: (Any) -> None
+        """Restore sizes previously returned by `state`, ignoring anything invalid."""
+        if not isinstance(state, dict):
+            return
+
+        oid_batch_size = state.get('oid_batch_size')
+        if isinstance(oid_batch_size, int) and 0 < oid_batch_size <= self._max_oid_batch_size:
+            self.oid_batch_size = oid_batch_size
+
+        max_repetitions = state.get('max_repetitions')
+        if isinstance(max_repetitions, int) and 0 < max_repetitions <= self._max_repetitions:
+            self.max_repetitions = max_repetitions
@@ -3,6 +3,7 @@
 # Licensed under Simplified BSD License (see LICENSE)
 
 import ipaddress
+import json
 import logging
 import os
 import socket
@@ -1236,6 +1237,98 @@ def test_timeout(aggregator, caplog):
     )
 
 
+@pytest.mark.parametrize(
+    'metrics, bulk_threshold',
+    [
+        pytest.param(common.SCALAR_OBJECTS, 0, id='scalar'),
+        pytest.param(common.TABULAR_OBJECTS, 0, id='getnext'),
+        pytest.param(common.BULK_TABULAR_OBJECTS, 5, id='getbulk'),
+    ],
+)
+def test_pipelined_fetch(metrics, bulk_threshold):
+    instance = common.generate_instance_config(metrics)
+    instance['bulk_threshold'] = bulk_threshold
+    instance['refresh_oids_cache_interval'] = 3600
+    check = SnmpCheck('snmp', {'oid_batch_size': 2}, [instance])
+    expected_results, expected_oids, _ = check.fetch_results(check._config)
+
+    instance = common.generate_instance_config(metrics)
+    instance['bulk_threshold'] = bulk_threshold
+    instance['refresh_oids_cache_interval'] = 3600
+    instance['request_window_size'] = 4
+    check = SnmpCheck('snmp', {'oid_batch_size': 2}, [instance])
+    results, oids, error = check.fetch_results(check._config)
+
+    assert error is None
+    assert expected_results
+    assert results == expected_results
+    assert expected_oids
+    assert sorted(str(oid) for oid in oids) == sorted(str(oid) for oid in expected_oids)
+    assert check._config.request_window == 4
+
+
+def test_pipelined_fetch_timeout(aggregator, caplog):
+    caplog.set_level(logging.WARNING)
+
+    instance = common.generate_instance_config([])
+    instance['community_string'] = 'public_delay'
+    instance['timeout'] = 1
+    instance['retries'] = 0
+    instance['request_window_size'] = 4
+    check = SnmpCheck('snmp', {'oid_batch_size': 1}, [instance])
+    check.check(instance)
+
+    aggregator.assert_service_check("snmp.can_check", status=SnmpCheck.WARNING, at_least=1)
+    # All metrics but `ifAdminStatus` should still arrive
+    aggregator.assert_metric('snmp.ifNumber', count=1)
+    aggregator.assert_metric('snmp.ifInDiscards', count=4)
+    aggregator.assert_metric('snmp.ifOutErrors', count=4)
+    aggregator.assert_metric('snmp.sysUpTimeInstance', count=1)
+
+    assert (
+        len([record for record in caplog.records if "No SNMP response received before timeout" in record.message]) > 0
+    )
+    # The window shrank after the timeout, then grew back as the other requests succeeded
+    assert 1 <= check._config.request_window <= 4
+
+
+@pytest.mark.parametrize('request_window_size', [1, 4])
+def test_adaptive_request_size(aggregator, request_window_size):
+    instance = common.generate_instance_config(common.BULK_TABULAR_OBJECTS + common.SCALAR_OBJECTS)
+    instance['bulk_threshold'] = 5
+    instance['adaptive_request_size'] = True
+    instance['request_window_size'] = request_window_size
+    check = SnmpCheck('snmp', {'oid_batch_size': 2}, [instance])
+    check.check_id = 'snmp:abc'
+
+    with mock.patch('datadog_checks.snmp.snmp.write_persistent_cache') as write_mock:
+        check.check(instance)
+
+    tuner = check._config.request_tuner
+    # The device answers quickly, so the sizes only grow
+    assert tuner.oid_batch_size > 2
+    assert tuner.max_repetitions >= SnmpCheck._MAX_REPETITIONS
+    write_mock.assert_called_once_with('snmp:abc_request_sizes', json.dumps({common.HOST: tuner.state()}))
+
+    aggregator.assert_service_check("snmp.can_check", status=SnmpCheck.OK, tags=common.CHECK_TAGS, at_least=1)
+    tags = common.CHECK_TAGS + ['loader:python']
+    aggregator.assert_metric('datadog.snmp.request_size.oid_batch_size', value=tuner.oid_batch_size, tags=tags)
+    aggregator.assert_metric('datadog.snmp.request_size.max_repetitions', value=tuner.max_repetitions, tags=tags)
+
+
+def test_adaptive_request_size_timeout(aggregator):
+    instance = common.generate_instance_config([])
+    instance['community_string'] = 'public_delay'
+    instance['timeout'] = 1
+    instance['retries'] = 0
+    instance['adaptive_request_size'] = True
+    check = SnmpCheck('snmp', {'oid_batch_size': 16}, [instance])
+    check.check(instance)
+
+    aggregator.assert_service_check("snmp.can_check", status=SnmpCheck.WARNING, at_least=1)
+    assert check._config.request_tuner.oid_batch_size < 16
+
+
 def test_oids_cache_metrics_collected_using_scalar_oids(aggregator):
     """
     Test if we still collect all metrics using saved scalar oids.
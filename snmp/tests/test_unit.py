@@ -3,6 +3,8 @@
 # Licensed under Simplified BSD License (see LICENSE)
 
 import copy
+import gc
+import json
 import logging
 import os
 import time
@@ -13,14 +15,21 @@ from typing import Any, List  # noqa: F401
 import mock
 import pytest
 import yaml
+from pysnmp.proto import errind
 
 from datadog_checks.base import ConfigurationError
 from datadog_checks.dev import temp_dir
 from datadog_checks.snmp import SnmpCheck
+from datadog_checks.snmp.commands import snmp_get_window
 from datadog_checks.snmp.config import InstanceConfig
-from datadog_checks.snmp.discovery import discover_instances
+from datadog_checks.snmp.discovery import discover_instances, probe_sysobject_oids
+from datadog_checks.snmp.models import OID
 from datadog_checks.snmp.parsing import ParsedSymbolMetric, ParsedTableMetric
-from datadog_checks.snmp.resolver import OIDTrie
+from datadog_checks.snmp.profiles import ProfilesCache, SharedProfiles
+from datadog_checks.snmp.pysnmp_types import ObjectName
+from datadog_checks.snmp.resolver import OIDResolver, OIDTrie
+from datadog_checks.snmp.tuning import RequestSizeTuner
+from datadog_checks.snmp.types import OIDMatch
 from datadog_checks.snmp.utils import (
     _load_default_profiles,
     batches,
@@ -276,6 +285,62 @@ def test_sysobjectid_list():
     }
 
 
+def test_shared_profiles():
+    profile = {
+        'sysobjectid': '1.3.6.1.4.1.8072.3.2.10',
+        'metrics': [{'MIB': 'IF-MIB', 'symbol': {'OID': '1.3.6.1.2.1.2.1.0', 'name': 'ifNumber'}}],
+    }
+    init_config = {'profiles': {'profile1': {'definition': profile}}}
+    instance = common.generate_instance_config([])
+    instance['profile'] = 'profile1'
+    cache = ProfilesCache.shared_instance()
+
+    check = SnmpCheck('snmp', init_config, [instance])
+    other_check = SnmpCheck('snmp', copy.deepcopy(init_config), [copy.deepcopy(instance)])
+
+    assert check._profiles_key in cache
+    assert other_check.profiles is check.profiles
+    assert other_check._config.parsed_metrics[-1] is check._config.parsed_metrics[-1]
+    assert other_check._config.resolve_oid(OID('1.3.6.1.2.1.2.1.0')) == OIDMatch('ifNumber', ())
+
+    # The OIDs and translations of the compiled profile are referenced, not copied
+    oid_config, other_oid_config = check._config.oid_config, other_check._config.oid_config
+    assert other_oid_config._shared_scalar_oids[0] is oid_config._shared_scalar_oids[0]
+    assert [oid.as_tuple() for oid in other_oid_config.scalar_oids] == [(1, 3, 6, 1, 2, 1, 2, 1, 0)]
+    resolver, other_resolver = check._config._resolver, other_check._config._resolver
+    assert other_resolver._shared_resolvers == resolver._shared_resolvers
+    assert other_resolver._shared_resolvers[0] is resolver._shared_resolvers[0]
+    assert list(other_resolver._resolver.items()) == []
+
+    # The profiles are dropped once no instance references them
+    check.cancel()
+    assert check._profiles_key in cache
+    del other_check
+    gc.collect()
+    assert check._profiles_key not in cache
+
+
+def test_profiles_cache():
+    cache = ProfilesCache()
+    owner = SnmpCheck('snmp', {}, [common.generate_instance_config(common.SCALAR_OBJECTS)])
+    other_owner = SnmpCheck('snmp', {}, [common.generate_instance_config(common.SCALAR_OBJECTS)])
+    load = mock.Mock(side_effect=lambda: SharedProfiles({}, {}))
+
+    shared_profiles = cache.acquire('key', owner, load)
+    assert cache.acquire('key', other_owner, load) is shared_profiles
+    load.assert_called_once()
+
+    cache.release('key', owner)
+    cache.release('key', owner)
+    assert 'key' in cache
+
+    cache.release('key', other_owner)
+    assert 'key' not in cache
+
+    assert cache.acquire('key', owner, load) is not shared_profiles
+    assert load.call_count == 2
+
+
 def test_no_address():
     instance = common.generate_instance_config([])
     instance.pop('ip_address')
@@ -413,6 +478,62 @@ def test_trie():
     assert trie.match((2, 3, 4)) == ((), None)
 
 
+@pytest.mark.parametrize(
+    'parts',
+    [(1,), (1, 2), (1, 2, 3), (1, 2, 3, 4), (1, 2, 3, 5), (1, 2, 3, 5, 6), (1, 2, 4), (1, 3, 5), (2, 3, 4), ()],
+)
+def test_trie_compile(parts):
+    trie = OIDTrie()
+    trie.set((1, 2), 'bar')
+    trie.set((1, 2, 3, 5), 'foo')
+    trie.set((1, 3, 5, 7), 'baz')
+
+    prefix, name = trie.match(parts)
+    assert trie.compile().match(parts) == ((len(prefix) if name else 0), name)
+
+
+def test_resolver_cache():
+    resolver = OIDResolver(mib_view_controller=None, enforce_constraints=True)
+    resolver.register(OID('1.3.6.1.2.1.2.2.1.10'), 'ifInOctets')
+    resolver.register(OID('1.3.6.1.2.1.2.2.1.16'), 'ifOutOctets')
+    resolver.register_index('ifInOctets', 1, {1: 'eth0'})
+
+    assert resolver.resolve_raw_oid(ObjectName('1.3.6.1.2.1.2.2.1.10.1')) == OIDMatch('ifInOctets', ('eth0',))
+    assert resolver.resolve_oid(OID('1.3.6.1.2.1.2.2.1.16.2')) == OIDMatch('ifOutOctets', ('2',))
+
+    with mock.patch.object(resolver, '_resolve_tag_index') as resolve_tag_index:
+        assert resolver.resolve_oid(OID('1.3.6.1.2.1.2.2.1.10.1')) == OIDMatch('ifInOctets', ('eth0',))
+        assert resolver.resolve_raw_oid(ObjectName('1.3.6.1.2.1.2.2.1.16.2')) == OIDMatch('ifOutOctets', ('2',))
+    resolve_tag_index.assert_not_called()
+
+    # Registering a translation invalidates the cache
+    resolver.register_index('ifInOctets', 1, {1: 'lo'})
+    assert resolver.resolve_oid(OID('1.3.6.1.2.1.2.2.1.10.1')) == OIDMatch('ifInOctets', ('lo',))
+
+
+def test_resolver_shared():
+    shared_resolver = OIDResolver(mib_view_controller=None, enforce_constraints=True)
+    shared_resolver.register(OID('1.3.6.1.2.1.2.2.1.10'), 'ifInOctets')
+    shared_resolver.register(OID('1.3.6.1.2.1.2.2'), 'ifTable')
+    shared_resolver.register_index('ifInOctets', 1, {1: 'eth0'})
+
+    resolver = OIDResolver(mib_view_controller=None, enforce_constraints=True)
+    resolver.register(OID('1.3.6.1.2.1.2.2.1.10'), 'myInOctets')
+    resolver.register(OID('1.3.6.1.2.1.2.2.1.16'), 'ifOutOctets')
+    resolver.register_index('ifInOctets', 2, {3: 'up'})
+    resolver.register_shared(shared_resolver)
+
+    # The shared translations take precedence, the longest prefix matched by any resolver wins
+    assert resolver.resolve_oid(OID('1.3.6.1.2.1.2.2.1.10.1.3')) == OIDMatch('ifInOctets', ('eth0', 'up'))
+    assert resolver.resolve_oid(OID('1.3.6.1.2.1.2.2.1.16.2')) == OIDMatch('ifOutOctets', ('2',))
+    assert resolver.resolve_oid(OID('1.3.6.1.2.1.2.2.1.20.2')) == OIDMatch('ifTable', ('20', '2'))
+
+    # The shared resolver is left untouched
+    assert sorted(name for _, name in shared_resolver._resolver.items()) == ['ifInOctets', 'ifTable']
+    assert shared_resolver._index_resolvers == {'ifInOctets': {1: {1: 'eth0'}}}
+    assert shared_resolver._cache == {}
+
+
 @pytest.mark.parametrize(
     'oids, expected',
     [
@@ -530,6 +651,158 @@ def test_discovery_tags():
     }
 
 
+@mock.patch("datadog_checks.snmp.discovery.write_persistent_cache")
+def test_discovery_concurrent(write_mock, aggregator):
+    instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
+    instance.pop('ip_address')
+
+    instance['network_address'] = '192.168.0.0/29'
+    instance['discovery_probe_workers'] = 4
+
+    check = SnmpCheck('snmp', {}, [instance])
+
+    scans = []
+
+    def mock_probe(cfg, hosts, callback):
+        scan = []
+        scans.append(scan)
+        for host in hosts:
+            scan.append(host)
+            if len(scans) == 1 and host == '192.168.0.2':
+                callback(host, '1.3.6.1.4.5')
+            if len(scans) == 2 and len(scan) == 3:
+                check._running = False
+
+    with mock.patch("datadog_checks.snmp.discovery.probe_sysobject_oids", mock_probe):
+        discover_instances(check._config, 0, weakref.ref(check))
+
+    assert scans == [
+        ['192.168.0.1', '192.168.0.2', '192.168.0.3', '192.168.0.4', '192.168.0.5', '192.168.0.6'],
+        ['192.168.0.1', '192.168.0.3', '192.168.0.4'],
+    ]
+    assert list(check._config.discovered_instances) == ['192.168.0.2']
+    assert 'snmp_profile:generic-router' in check._config.discovered_instances['192.168.0.2'].tags
+    # Written once as soon as the host was found, then at the end of the scan
+    assert write_mock.call_args_list == [mock.call('', '["192.168.0.2"]')] * 2
+
+    tags = ['network:192.168.0.0/29', 'autodiscovery_subnet:192.168.0.0/29', 'loader:python']
+    aggregator.assert_metric('datadog.snmp.discovery.scan_duration', tags=tags, count=1)
+    aggregator.assert_metric('datadog.snmp.discovery.hosts_probed', value=6, tags=tags, count=1)
+    aggregator.assert_metric('datadog.snmp.discovery.hosts_per_second', tags=tags, count=1)
+
+
+def test_probe_sysobject_oids():
+    instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
+    instance.pop('ip_address')
+
+    instance['network_address'] = '192.168.0.0/29'
+    instance['discovery_probe_workers'] = 4
+    instance['discovery_probe_timeout'] = 0.5
+    instance['timeout'] = 3
+    instance['retries'] = 2
+
+    check = SnmpCheck('snmp', {}, [instance])
+    sys_object_oid = mock.Mock(prettyPrint=mock.Mock(return_value='1.3.6.1.4.5'))
+    targets = []
+    found = {}
+
+    def mock_snmp_get_window(config, requests, oids, lookup_mib, window_size, on_response):
+        assert window_size == 4
+        for host, target in requests:
+            targets.append(target)
+            if host == '192.168.0.1':
+                assert on_response(host, None, [(oids[0], sys_object_oid)]) is None
+            elif host == '192.168.0.2':
+                # Alive, but the first probe failed, e.g. while discovering the SNMPv3 engine ID
+                target = on_response(host, errind.unknownEngineID, [])
+                targets.append(target)
+                assert on_response(host, errind.unknownEngineID, []) is None
+            else:
+                assert on_response(host, errind.requestTimedOut, []) is None
+
+    def mock_register_device_target(host, port, timeout, retries, **kwargs):
+        return host, timeout, retries
+
+    with mock.patch("datadog_checks.snmp.discovery.snmp_get_window", mock_snmp_get_window), mock.patch(
+        "datadog_checks.snmp.discovery.register_device_target", mock_register_device_target
+    ):
+        probe_sysobject_oids(check._config, iter(['192.168.0.1', '192.168.0.2', '192.168.0.3']), found.__setitem__)
+
+    assert found == {'192.168.0.1': '1.3.6.1.4.5'}
+    assert targets == [
+        ('192.168.0.1', 0.5, 0),
+        ('192.168.0.2', 0.5, 0),
+        ('192.168.0.2', 3, 2),
+        ('192.168.0.3', 0.5, 0),
+    ]
+
+
+def test_probe_sysobject_oids_unreachable():
+    instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
+    instance.pop('ip_address')
+
+    instance['network_address'] = '127.0.0.120/29'
+    instance['discovery_probe_workers'] = 2
+    instance['discovery_probe_timeout'] = 0.1
+    instance['timeout'] = 5
+    instance['retries'] = 3
+
+    check = SnmpCheck('snmp', {}, [instance])
+    found = {}
+
+    hosts = list(check._config.network_hosts())
+    start = time.time()
+    probe_sysobject_oids(check._config, iter(hosts), found.__setitem__)
+
+    assert len(hosts) == 6
+    assert found == {}
+    # Unreachable hosts are only sent the liveness probe, not the retries of the instance which would take 20 seconds
+    # per host. The dispatcher checks timeouts every 0.5 second, so each of the 3 rounds of probes takes that long.
+    assert time.time() - start < 5
+
+
+@mock.patch("datadog_checks.snmp.commands.vbProcessor")
+@mock.patch("datadog_checks.snmp.commands.cmdgen")
+def test_snmp_get_window(cmdgen_mock, vb_processor_mock):
+    config = mock.MagicMock()
+    pending = []
+    max_in_flight = []
+
+    def send_var_binds(engine, target, context_engine_id, context_name, var_binds, callback, key):
+        pending.append((target, callback, key))
+        max_in_flight.append(len(pending))
+
+    def run_dispatcher():
+        while pending:
+            target, callback, key = pending.pop(0)
+            error_indication = errind.requestTimedOut if target.startswith('dead') else None
+            callback(config._snmp_engine, None, error_indication, 0, 0, [target], key)
+
+    cmdgen_mock.GetCommandGenerator.return_value.sendVarBinds.side_effect = send_var_binds
+    config._snmp_engine.transportDispatcher.runDispatcher.side_effect = run_dispatcher
+    vb_processor_mock.unmakeVarBinds.side_effect = lambda engine, var_binds, lookup_mib: var_binds
+
+    responses = []
+
+    def on_response(key, error_indication, var_binds):
+        responses.append((key, error_indication is None, var_binds))
+        if key == 'b' and error_indication is not None:
+            return 'alive-b'
+
+    requests = iter([('a', 'alive-a'), ('b', 'dead-b'), ('c', 'dead-c'), ('d', 'alive-d')])
+    snmp_get_window(config, requests, [], False, 2, on_response)
+
+    # A new request is sent as soon as one completes, or the same request again when asked
+    assert responses == [
+        ('a', True, ['alive-a']),
+        ('b', False, ['dead-b']),
+        ('c', False, ['dead-c']),
+        ('b', True, ['alive-b']),
+        ('d', True, ['alive-d']),
+    ]
+    assert max(max_in_flight) == 2
+
+
 @mock.patch("datadog_checks.snmp.snmp.read_persistent_cache")
 @mock.patch("threading.Thread")
 def test_cache_loading_tags(thread_mock, read_mock):
@@ -686,3 +959,87 @@ def test_try_submit_bandwidth_usage_metric_if_bandwidth_metric_errors(results, m
     check.rate.assert_not_called()
     for msg in error_messages:
         assert msg in caplog.text
+
+
+def test_request_size_tuner():
+    tuner = RequestSizeTuner(oid_batch_size=16, max_repetitions=20, timeout=2)
+
+    # Only full-sized requests answered quickly make sizes grow
+    tuner.observe_batch(8, latency=0.1)
+    assert tuner.oid_batch_size == 16
+    tuner.observe_batch(16, latency=0.1)
+    assert tuner.oid_batch_size == 18
+
+    tuner.observe_batch(18, latency=1.5)
+    assert tuner.oid_batch_size == 14
+    tuner.observe_batch(14, latency=0.1, too_big=True)
+    assert tuner.oid_batch_size == 7
+    tuner.observe_batch(7, latency=2, timed_out=True)
+    assert tuner.oid_batch_size == 3
+
+    tuner.observe_bulk(20, latency=0.1)
+    assert tuner.max_repetitions == 22
+    tuner.observe_bulk(9, latency=0.1, truncated=True)
+    assert tuner.max_repetitions == 9
+    tuner.observe_bulk(0, latency=2, timed_out=True)
+    assert tuner.max_repetitions == 4
+
+    for _ in range(100):
+        tuner.observe_batch(tuner.oid_batch_size, latency=0.1)
+        tuner.observe_bulk(tuner.max_repetitions, latency=0.1)
+    assert tuner.state() == {
+        'oid_batch_size': RequestSizeTuner.MAX_OID_BATCH_SIZE,
+        'max_repetitions': RequestSizeTuner.MAX_REPETITIONS,
+    }
+
+    for _ in range(100):
+        tuner.observe_batch(tuner.oid_batch_size, latency=0.1, too_big=True)
+    assert tuner.oid_batch_size == 1
+
+
+def test_request_size_tuner_load():
+    tuner = RequestSizeTuner(oid_batch_size=10, max_repetitions=25, timeout=5)
+
+    tuner.load({'oid_batch_size': 0, 'max_repetitions': 'foo'})
+    tuner.load(['bar'])
+    assert tuner.state() == {'oid_batch_size': 10, 'max_repetitions': 25}
+
+    tuner.load({'oid_batch_size': 4, 'max_repetitions': 40})
+    assert tuner.state() == {'oid_batch_size': 4, 'max_repetitions': 40}
+
+
+@mock.patch("datadog_checks.snmp.snmp.read_persistent_cache")
+@mock.patch("datadog_checks.snmp.snmp.write_persistent_cache")
+def test_request_sizes_persistence(write_mock, read_mock):
+    read_mock.return_value = json.dumps({common.HOST: {'oid_batch_size': 4, 'max_repetitions': 12}})
+    instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
+    instance['adaptive_request_size'] = True
+    check = SnmpCheck('snmp', {}, [instance])
+    check.check_id = 'snmp:abc'
+
+    # The check ID is not known when the check is created, so nothing is loaded before the first run
+    read_mock.assert_not_called()
+    tuner = check._config.request_tuner
+    assert tuner.state() == {'oid_batch_size': 10, 'max_repetitions': 25}
+
+    check._restore_request_sizes(check._config)
+    read_mock.assert_called_once_with('snmp:abc_request_sizes')
+    assert tuner.state() == {'oid_batch_size': 4, 'max_repetitions': 12}
+    assert check._get_oid_batch_size(check._config) == 4
+
+    check._save_request_sizes([check._config])
+    write_mock.assert_not_called()
+
+    tuner.observe_batch(4, latency=0, too_big=True)
+    check._save_request_sizes([check._config])
+    write_mock.assert_called_once_with(
+        'snmp:abc_request_sizes', json.dumps({common.HOST: {'oid_batch_size': 2, 'max_repetitions': 12}})
+    )
+
+
+def test_request_sizes_disabled():
+    instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
+    check = SnmpCheck('snmp', {'oid_batch_size': 7}, [instance])
+
+    assert check._config.request_tuner is None
+    assert check._get_oid_batch_size(check._config) == 7
@@ -210,6 +210,10 @@ def instance_request_size(field, value):
     return 16
 
 
+def instance_response_cache_size(field, value):
+    return 10240
+
+
 def instance_rmi_client_timeout(field, value):
     return 15000
 
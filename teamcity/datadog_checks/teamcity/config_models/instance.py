@@ -143,6 +143,7 @@ class InstanceConfig(BaseModel):
     openmetrics_endpoint: Optional[str]
     password: Optional[str]
     persist_connections: Optional[bool]
+    prefetch_shared_labels: Optional[bool]
     projects: Optional[Projects]
     projects_refresh_interval: Optional[int]
     proxy: Optional[Proxy]
@@ -151,6 +152,7 @@ class InstanceConfig(BaseModel):
     read_timeout: Optional[float]
     rename_labels: Optional[Mapping[str, Any]]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     server: str
     service: Optional[str]
     share_labels: Optional[Mapping[str, Union[bool, ShareLabel]]]
@@ -171,6 +173,8 @@ class InstanceConfig(BaseModel):
     use_legacy_auth_encoding: Optional[bool]
     use_openmetrics: Optional[bool]
     use_process_start_time: Optional[bool]
+    use_protobuf: Optional[bool]
+    use_streaming_parser: Optional[bool]
     username: Optional[str]
 
     @root_validator(pre=True)
@@ -4,7 +4,7 @@
 import datetime as dt  # noqa: F401
 import functools
 import ssl
-from typing import Any, Callable, List, TypeVar, cast  # noqa: F401
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar, cast  # noqa: F401
 
 from pyVim import connect
 from pyVmomi import SoapAdapter, vim, vmodl
@@ -93,6 +93,13 @@ class VSphereAPI(object):
         self.log = log
 
         self._conn = cast(vim.ServiceInstance, None)
+
+        # State of the incremental retrieval of the infrastructure, see `get_infrastructure_updates`
+        self._infrastructure_collector = None  # type: Optional[vmodl.query.PropertyCollector]
+        self._infrastructure_view = None  # type: Optional[vim.view.ContainerView]
+        self._infrastructure_version = ''
+        self._infrastructure_data = {}  # type: InfrastructureData
+
         self.smart_connect()
 
     def smart_connect(self):
@@ -142,6 +149,8 @@ class VSphereAPI(object):
         if self._conn:
             connect.Disconnect(self._conn)
 
+        # The objects used for incremental updates belonged to the previous session
+        self._reset_infrastructure_updates()
         self._conn = conn
         self.log.debug("Connected to %s", version_info.fullName)
 
@@ -165,13 +174,9 @@ class VSphereAPI(object):
         """
         return self._conn.content.perfManager.QueryPerfCounterByLevel(collection_level)
 
-    @smart_retry
-    def _get_raw_infrastructure(self):
-        # type: () -> List[vmodl.query.PropertyCollector.ObjectContent]
-        """Traverse the whole vSphere infrastructure and returns the list of raw pyvmomi MOR objects with
-        the required pre-fetched attributes."""
-        content = self._conn.content  # vim.ServiceInstanceContent reference from the connection
-
+    def _get_infrastructure_filter_spec(self, view_ref):
+        # type: (vim.view.ContainerView) -> vmodl.query.PropertyCollector.FilterSpec
+        """Build the filter spec selecting the required attributes of every object of the given view."""
         property_specs = []
         # Specify which attributes we want to retrieve per object
         for resource in ALL_RESOURCES:
@@ -192,24 +197,34 @@ class VSphereAPI(object):
         traversal_spec.skip = False
         traversal_spec.type = vim.view.ContainerView
 
-        retr_opts = vmodl.query.PropertyCollector.RetrieveOptions()
-        # To limit the number of objects retrieved per call.
-        # If batch_collector_size is 0, collect maximum number of objects.
-        retr_opts.maxObjects = self.config.batch_collector_size
-
         # Specify the root object from where we collect the rest of the objects
         obj_spec = vmodl.query.PropertyCollector.ObjectSpec()
+        obj_spec.obj = view_ref
         obj_spec.skip = True
         obj_spec.selectSet = [traversal_spec]
 
         # Create our filter spec from the above specs
         filter_spec = vmodl.query.PropertyCollector.FilterSpec()
         filter_spec.propSet = property_specs
+        filter_spec.objectSet = [obj_spec]
+
+        return filter_spec
+
+    @smart_retry
+    def _get_raw_infrastructure(self):
+        # type: () -> List[vmodl.query.PropertyCollector.ObjectContent]
+        """Traverse the whole vSphere infrastructure and returns the list of raw pyvmomi MOR objects with
+        the required pre-fetched attributes."""
+        content = self._conn.content  # vim.ServiceInstanceContent reference from the connection
+
+        retr_opts = vmodl.query.PropertyCollector.RetrieveOptions()
+        # To limit the number of objects retrieved per call.
+        # If batch_collector_size is 0, collect maximum number of objects.
+        retr_opts.maxObjects = self.config.batch_collector_size
 
         view_ref = content.viewManager.CreateContainerView(content.rootFolder, ALL_RESOURCES, True)
         try:
-            obj_spec.obj = view_ref
-            filter_spec.objectSet = [obj_spec]
+            filter_spec = self._get_infrastructure_filter_spec(view_ref)
 
             # Collect the objects and their properties
             res = content.propertyCollector.RetrievePropertiesEx([filter_spec], retr_opts)
@@ -260,25 +275,169 @@ class VSphereAPI(object):
         infrastructure_data[root_folder] = {"name": root_folder.name, "parent": None}
 
         if self.config.should_collect_attributes:
-            # Clean up attributes in infrastructure_data,
-            # at this point they are custom pyvmomi objects and the attribute keys are not resolved.
+            self._resolve_attributes(itervalues(infrastructure_data))
+        return cast(InfrastructureData, infrastructure_data)
 
-            attribute_keys = {x.key: x.name for x in self._fetch_all_attributes()}
-            for props in itervalues(infrastructure_data):
-                mor_attributes = []
-                if 'customValue' not in props:
+    def _resolve_attributes(self, mor_props_list):
+        # type: (Any) -> None
+        """Replace the `customValue` property of the given mor properties by the formatted `attributes`."""
+        # At this point attributes are custom pyvmomi objects and the attribute keys are not resolved.
+        attribute_keys = None  # type: Optional[Dict[int, str]]
+        for props in mor_props_list:
+            mor_attributes = []
+            if 'customValue' not in props:
+                continue
+            if attribute_keys is None:
+                attribute_keys = {x.key: x.name for x in self._fetch_all_attributes()}
+            for attribute in props.pop('customValue'):
+                # The attribute key is always unique
+                attr_key_name = attribute_keys.get(attribute.key)
+                if attr_key_name is None:
+                    self.log.debug("Unable to resolve attribute key with ID: %s", attribute.key)
                     continue
-                for attribute in props.pop('customValue'):
-                    # The attribute key is always unique
-                    attr_key_name = attribute_keys.get(attribute.key)
-                    if attr_key_name is None:
-                        self.log.debug("Unable to resolve attribute key with ID: %s", attribute.key)
-                        continue
-                    attr_value = attribute.value
-                    mor_attributes.append("{}{}:{}".format(self.config.attr_prefix, attr_key_name, attr_value))
-
-                props['attributes'] = mor_attributes
-        return cast(InfrastructureData, infrastructure_data)
+                attr_value = attribute.value
+                mor_attributes.append("{}{}:{}".format(self.config.attr_prefix, attr_key_name, attr_value))
+
+            props['attributes'] = mor_attributes
+
+    def get_infrastructure_updates(self):
+        # type: () -> Tuple[InfrastructureData, Optional[Set[vim.ManagedEntity]], Set[vim.ManagedEntity]]
+        """Same as `get_infrastructure`, but only the objects created, modified and deleted since the previous call
+        are retrieved from vCenter, using the versions returned by `WaitForUpdatesEx`.
+
+        :return: the whole infrastructure data, the mors created or modified and the mors deleted since the
+        previous call. The created or modified mors are `None` when the whole infrastructure had to be retrieved:
+        on the first call, after a reconnection, or when vCenter no longer knows the version of the previous call.
+        """
+        full_refresh = self._infrastructure_collector is None
+        if not full_refresh:
+            try:
+                object_updates = self._wait_for_infrastructure_updates()
+            except vmodl.query.InvalidCollectorVersion:
+                self.log.debug("The version of the infrastructure is no longer known, retrieving all of it again")
+                full_refresh = True
+            except Exception:
+                # Start over on the next call, it may require a new connection anyway
+                self._destroy_infrastructure_collector()
+                raise
+
+        if full_refresh:
+            self._destroy_infrastructure_collector()
+            self._create_infrastructure_collector()
+            try:
+                object_updates = self._wait_for_infrastructure_updates()
+            except Exception:
+                self._destroy_infrastructure_collector()
+                raise
+
+        infrastructure_data = self._infrastructure_data
+        if full_refresh:
+            # Add the root folder entity as it can't be fetched from the collector.
+            root_folder = self._conn.content.rootFolder
+            infrastructure_data[root_folder] = {"name": root_folder.name, "parent": None}
+
+        modified_mors = set()  # type: Set[vim.ManagedEntity]
+        deleted_mors = set()  # type: Set[vim.ManagedEntity]
+        for object_update in object_updates:
+            mor = object_update.obj
+            if object_update.kind == 'leave':
+                if infrastructure_data.pop(mor, None) is not None:
+                    deleted_mors.add(mor)
+                continue
+
+            # Objects entering the filter come with all their properties, modified ones only with the changed ones
+            props = infrastructure_data.get(mor, {}) if object_update.kind == 'modify' else {}
+            for change in object_update.changeSet:
+                if change.op in ('remove', 'indirectRemove'):
+                    props.pop(change.name, None)
+                else:
+                    props[change.name] = change.val
+
+            if props:
+                infrastructure_data[mor] = props
+                modified_mors.add(mor)
+
+        if self.config.should_collect_attributes:
+            self._resolve_attributes(infrastructure_data[mor] for mor in modified_mors)
+
+        self.log.debug(
+            "Retrieved %d created or modified and %d deleted resources", len(modified_mors), len(deleted_mors)
+        )
+        return infrastructure_data, None if full_refresh else modified_mors, deleted_mors
+
+    @smart_retry
+    def _create_infrastructure_collector(self):
+        # type: () -> None
+        """Create a property collector dedicated to the incremental retrieval of the infrastructure."""
+        content = self._conn.content
+        view_ref = content.viewManager.CreateContainerView(content.rootFolder, ALL_RESOURCES, True)
+        try:
+            collector = content.propertyCollector.CreatePropertyCollector()
+            # Without partial updates, a modified property is always reported with its whole new value
+            collector.CreateFilter(self._get_infrastructure_filter_spec(view_ref), partialUpdates=False)
+        except Exception:
+            view_ref.Destroy()
+            raise
+
+        self._infrastructure_collector = collector
+        self._infrastructure_view = view_ref
+
+    def _wait_for_infrastructure_updates(self):
+        # type: () -> List[vmodl.query.PropertyCollector.ObjectUpdate]
+        """Collect the pending updates of the infrastructure collector, without waiting for new ones.
+
+        This is not retried: the collector belongs to the current session and would not survive a new connection."""
+        collector = cast(vmodl.query.PropertyCollector, self._infrastructure_collector)
+        options = vmodl.query.PropertyCollector.WaitOptions()
+        options.maxWaitSeconds = 0
+        if self.config.batch_collector_size > 0:
+            # To limit the number of objects retrieved per call.
+            options.maxObjectUpdates = self.config.batch_collector_size
+
+        object_updates = []  # type: List[vmodl.query.PropertyCollector.ObjectUpdate]
+        version = self._infrastructure_version
+        while True:
+            update_set = collector.WaitForUpdatesEx(version, options)
+            if update_set is None:
+                # No pending updates
+                break
+
+            version = update_set.version
+            for filter_update in update_set.filterSet:
+                object_updates.extend(filter_update.objectSet)
+
+            # Updates can be paginated
+            if not update_set.truncated:
+                break
+
+        self._infrastructure_version = version
+        return object_updates
+
+    def reset_infrastructure_updates(self):
+        # type: () -> None
+        """Forget the changes already returned by `get_infrastructure_updates`, e.g. when they could not be applied,
+        so that the next call retrieves the whole infrastructure."""
+        self._destroy_infrastructure_collector()
+
+    def _destroy_infrastructure_collector(self):
+        # type: () -> None
+        """Destroy the objects used for incremental updates, the next call will retrieve the whole infrastructure."""
+        for managed_object in (self._infrastructure_collector, self._infrastructure_view):
+            if managed_object is None:
+                continue
+            try:
+                managed_object.Destroy()
+            except Exception as e:
+                self.log.debug("Unable to destroy %s: %s", managed_object, e)
+
+        self._reset_infrastructure_updates()
+
+    def _reset_infrastructure_updates(self):
+        # type: () -> None
+        self._infrastructure_collector = None
+        self._infrastructure_view = None
+        self._infrastructure_version = ''
+        self._infrastructure_data = {}
 
     @smart_retry
     def query_metrics(self, query_specs):
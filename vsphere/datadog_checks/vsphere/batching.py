@@ -0,0 +1,142 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+import heapq
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Tuple, Type  # noqa: F401
+
+from pyVmomi import vim  # noqa: F401
+from six import iteritems
+
+from datadog_checks.vsphere.types import CounterId, MetricCost, MorBatch  # noqa: F401
+
+
+class QueryBatchPlanner(object):
+    """Split the metrics to query into batches of similar cost, the cost being the number of series returned.
+
+    The number of series returned for each metric of each resource is learnt from the results of the previous
+    collection. Per-instance metrics (`*`) can return many series, so their cost is usually much higher than
+    the cost of aggregated metrics. Metrics that were never observed are assumed to return a single series.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        # Number of series returned for each (mor, counter) pair during the last collection
+        self._series = {}  # type: Dict[Tuple[vim.ManagedEntity, CounterId], int]
+        # Average number of series returned by a counter for a given resource type, used for new resources
+        self._average_series = {}  # type: Dict[Tuple[Type[vim.ManagedEntity], CounterId], float]
+        self._pending_series = {}  # type: Dict[Tuple[vim.ManagedEntity, CounterId], int]
+
+    def record_results(self, results_per_mor):
+        # type: (vim.PerformanceManager.EntityMetricBase) -> None
+        """Count the series returned for every counter of a resource."""
+        mor = results_per_mor.entity
+        for result in results_per_mor.value:
+            key = (mor, result.id.counterId)
+            self._pending_series[key] = self._pending_series.get(key, 0) + 1
+
+    def end_collection(self):
+        # type: () -> None
+        """Use the results recorded during the collection that just ended for the next estimations.
+
+        Only the last collection is kept so that the resources that disappeared are forgotten.
+        """
+        totals = defaultdict(lambda: [0, 0])  # type: Dict[Tuple[Type[vim.ManagedEntity], CounterId], List[int]]
+        for (mor, counter_id), series in iteritems(self._pending_series):
+            total = totals[(type(mor), counter_id)]
+            total[0] += series
+            total[1] += 1
+
+        # Keep the averages of the counters not returned this time, e.g. because the query failed
+        for key, (series, count) in iteritems(totals):
+            self._average_series[key] = series / float(count)
+
+        self._series = self._pending_series
+        self._pending_series = {}
+
+    def estimate_cost(self, mor, metric_id):
+        # type: (vim.ManagedEntity, vim.PerformanceManager.MetricId) -> float
+        series = self._series.get((mor, metric_id.counterId))
+        if series is None:
+            series = self._average_series.get((type(mor), metric_id.counterId), 1)
+
+        # Even metrics without values have a cost
+        return max(series, 1)
+
+    def estimate_query_cost(self, query_specs):
+        # type: (List[vim.PerformanceManager.QuerySpec]) -> float
+        return sum(
+            self.estimate_cost(query_spec.entity, metric_id)
+            for query_spec in query_specs
+            for metric_id in query_spec.metricId
+        )
+
+    def make_batches(
+        self,
+        mors,  # type: Iterable[vim.ManagedEntity]
+        metric_ids,  # type: List[vim.PerformanceManager.MetricId]
+        max_batch_cost,  # type: float
+        max_batch_size,  # type: float
+        workers,  # type: int
+    ):  # type: (...) -> List[MorBatch]
+        """Pack the metrics of every resource into batches costing at most `max_batch_cost` and containing at most
+        `max_batch_size` metrics, from the most to the least expensive batch.
+
+        The target cost of a batch is lowered so that there are at least `workers` batches to run concurrently, and
+        each chunk of metrics is added to the cheapest batch so that batches finish at about the same time.
+        """
+        costs_per_mor = []  # type: List[Tuple[vim.ManagedEntity, List[MetricCost]]]
+        total_cost = 0.0
+        for mor in mors:
+            costs = [(self.estimate_cost(mor, metric_id), metric_id) for metric_id in metric_ids]
+            total_cost += sum(cost for cost, _ in costs)
+            costs_per_mor.append((mor, costs))
+
+        target_cost = min(max_batch_cost, total_cost / max(workers, 1))
+        chunks = [
+            (cost, mor, chunk)
+            for mor, costs in costs_per_mor
+            for cost, chunk in self._split(costs, target_cost, max_batch_size)
+        ]
+        # Largest chunks first, so that the smaller ones fill the gaps
+        chunks.sort(key=lambda chunk: chunk[0], reverse=True)
+
+        # Heap of (cost, index) of the batches
+        batches = []  # type: List[MorBatch]
+        batch_sizes = []  # type: List[int]
+        heap = []  # type: List[Tuple[float, int]]
+        for cost, mor, metrics in chunks:
+            size = len(metrics)
+            if heap:
+                batch_cost, index = heap[0]
+                if batch_cost + cost <= target_cost and batch_sizes[index] + size <= max_batch_size:
+                    batches[index][mor].extend(metrics)
+                    batch_sizes[index] += size
+                    heapq.heapreplace(heap, (batch_cost + cost, index))
+                    continue
+
+            batch = defaultdict(list)  # type: MorBatch
+            batch[mor].extend(metrics)
+            batches.append(batch)
+            batch_sizes.append(size)
+            heapq.heappush(heap, (cost, len(batches) - 1))
+
+        # Start the most expensive queries first, they are the most likely to make the collection last longer
+        return [batches[index] for _, index in sorted(heap, reverse=True)]
+
+    @staticmethod
+    def _split(costs, max_cost, max_size):
+        # type: (List[MetricCost], float, float) -> Iterator[Tuple[float, List[vim.PerformanceManager.MetricId]]]
+        """Split the metrics of a resource in chunks that do not exceed the given cost and size."""
+        chunk = []  # type: List[vim.PerformanceManager.MetricId]
+        chunk_cost = 0.0
+        for cost, metric_id in costs:
+            if chunk and (chunk_cost + cost > max_cost or len(chunk) == max_size):
+                yield chunk_cost, chunk
+                chunk = []
+                chunk_cost = 0.0
+            chunk.append(metric_id)
+            chunk_cost += cost
+
+        if chunk:
+            yield chunk_cost, chunk
@@ -6,10 +6,13 @@ from contextlib import contextmanager
 from typing import Any, Dict, Generator, Iterator, List, Type  # noqa: F401
 
 from pyVmomi import vim  # noqa: F401
-from six import iterkeys
+from six import iteritems, iterkeys
 
+from datadog_checks.vsphere.constants import MOR_TYPE_AS_STRING
 from datadog_checks.vsphere.types import CounterId, MetricName, ResourceTags  # noqa: F401
 
+MOR_TYPE_FROM_STRING = {v: k for k, v in iteritems(MOR_TYPE_AS_STRING)}
+
 
 class VSphereCache(object):
     """
@@ -51,6 +54,11 @@ class VSphereCache(object):
         elapsed = time.time() - self._last_ts
         return elapsed > self._interval
 
+    def expire(self):
+        # type: () -> None
+        """Force the cache to be refreshed, its content is kept until then."""
+        self._last_ts = 0
+
 
 class MetricsMetadataCache(VSphereCache):
     """A VSphere cache dedicated to store the metrics metadata from a user environment.
@@ -74,6 +82,23 @@ class MetricsMetadataCache(VSphereCache):
         # type: (Type[vim.ManagedEntity], Dict[CounterId, MetricName]) -> None
         self._content[resource_type] = metadata
 
+    def dump(self):
+        # type: () -> Dict[str, Dict[str, MetricName]]
+        """Return the content of the cache in a JSON serializable format."""
+        return {
+            MOR_TYPE_AS_STRING[resource_type]: {str(counter_id): name for counter_id, name in iteritems(metadata)}
+            for resource_type, metadata in iteritems(self._content)
+        }
+
+    def load(self, data):
+        # type: (Dict[str, Dict[str, MetricName]]) -> None
+        """Set the content of the cache from the output of `dump`."""
+        for resource_type, metadata in iteritems(data):
+            self.set_metadata(
+                MOR_TYPE_FROM_STRING[resource_type],
+                {int(counter_id): name for counter_id, name in iteritems(metadata)},
+            )
+
 
 class InfrastructureCache(VSphereCache):
     """A VSphere cache dedicated to store the infrastructure data from a user environment.
@@ -121,6 +146,23 @@ class InfrastructureCache(VSphereCache):
         # type: (ResourceTags) -> None
         self._content['tags'] = value
 
+    @contextmanager
+    def patch(self):
+        # type: () -> Generator[None, None, None]
+        """Same as `update`, but the content is kept so that only the modified mors need to be set or deleted.
+        Only the mors mapping is copied so that the previous content can be restored on any error.
+        """
+        old_content = self._content
+        self._content = dict(old_content)
+        self._mors = {mor_type: dict(mors) for mor_type, mors in iteritems(self._mors)}
+        try:
+            yield
+            self._last_ts = time.time()
+        except Exception:
+            # Restore old data
+            self._content = old_content
+            raise
+
     def get_mor_tags(self, mor):
         # type: (vim.ManagedEntity) -> List[str]
         """
@@ -129,6 +171,10 @@ class InfrastructureCache(VSphereCache):
         mor_type = type(mor)
         return self._tags.get(mor_type, {}).get(mor._moId, [])
 
+    def get_all_tags(self):
+        # type: () -> ResourceTags
+        return self._tags
+
     def set_all_tags(self, mor_tags):
         # type: (ResourceTags) -> None
         self._tags = mor_tags
@@ -148,3 +194,27 @@ class InfrastructureCache(VSphereCache):
         if mor_type not in self._mors:
             self._mors[mor_type] = {}
         self._mors[mor_type][mor] = mor_data
+
+    def delete_mor_props(self, mor):
+        # type: (vim.ManagedEntity) -> None
+        self._mors.get(type(mor), {}).pop(mor, None)
+
+    def dump(self):
+        # type: () -> Dict[str, Dict[str, Dict[str, Any]]]
+        """Return the content of the cache in a JSON serializable format, where mors are identified by their id."""
+        return {
+            'mors': {
+                MOR_TYPE_AS_STRING[mor_type]: {mor._moId: mor_data for mor, mor_data in iteritems(mors)}
+                for mor_type, mors in iteritems(self._mors)
+            },
+            'tags': {MOR_TYPE_AS_STRING[mor_type]: tags for mor_type, tags in iteritems(self._tags)},
+        }
+
+    def load(self, data):
+        # type: (Dict[str, Dict[str, Dict[str, Any]]]) -> None
+        """Set the content of the cache from the output of `dump`."""
+        for mor_type_str, mors in iteritems(data['mors']):
+            mor_type = MOR_TYPE_FROM_STRING[mor_type_str]
+            for mor_id, mor_data in iteritems(mors):
+                self.set_mor_props(mor_type(mor_id), mor_data)
+        self.set_all_tags({MOR_TYPE_FROM_STRING[mor_type]: tags for mor_type, tags in iteritems(data['tags'])})
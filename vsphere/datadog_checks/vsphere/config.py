@@ -70,6 +70,7 @@ class VSphereConfig(object):
         # Check option
         self.threads_count = instance.get("threads_count", DEFAULT_THREAD_COUNT)
         self.metrics_per_query = instance.get("metrics_per_query", DEFAULT_METRICS_PER_QUERY)
+        self.use_cost_based_batching = is_affirmative(instance.get('use_cost_based_batching', False))
         self.batch_collector_size = instance.get('batch_property_collector_size', DEFAULT_BATCH_COLLECTOR_SIZE)
         self.batch_tags_collector_size = instance.get('batch_tags_collector_size', DEFAULT_TAGS_COLLECTOR_SIZE)
         self.collect_events_only = is_affirmative(instance.get("collect_events_only", False))
@@ -84,6 +85,10 @@ class VSphereConfig(object):
         self.refresh_infrastructure_cache_interval = instance.get(
             'refresh_infrastructure_cache_interval', DEFAULT_REFRESH_INFRASTRUCTURE_CACHE_INTERVAL
         )
+        self.use_incremental_infrastructure_cache = is_affirmative(
+            instance.get('use_incremental_infrastructure_cache', False)
+        )
+        self.persist_caches = is_affirmative(instance.get('persist_caches', False))
         self.refresh_metrics_metadata_cache_interval = instance.get(
             'refresh_metrics_metadata_cache_interval', DEFAULT_REFRESH_METRICS_METADATA_CACHE_INTERVAL
         )
@@ -94,6 +94,10 @@ def instance_min_collection_interval(field, value):
     return 15
 
 
+def instance_persist_caches(field, value):
+    return False
+
+
 def instance_refresh_infrastructure_cache_interval(field, value):
     return 300
 
@@ -142,5 +146,13 @@ def instance_use_collect_events_fallback(field, value):
     return False
 
 
+def instance_use_cost_based_batching(field, value):
+    return False
+
+
 def instance_use_guest_hostname(field, value):
     return False
+
+
+def instance_use_incremental_infrastructure_cache(field, value):
+    return False
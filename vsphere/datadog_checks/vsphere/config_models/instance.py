@@ -102,6 +102,7 @@ class RestApiOptions(BaseModel):
     proxy: Optional[Proxy]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    response_cache_size: Optional[float]
     skip_proxy: Optional[bool]
     timeout: Optional[float]
     tls_ca_cert: Optional[str]
@@ -141,6 +142,7 @@ class InstanceConfig(BaseModel):
     metrics_per_query: Optional[int]
     min_collection_interval: Optional[float]
     password: str
+    persist_caches: Optional[bool]
     refresh_infrastructure_cache_interval: Optional[int]
     refresh_metrics_metadata_cache_interval: Optional[int]
     resource_filters: Optional[Sequence[ResourceFilter]]
@@ -153,7 +155,9 @@ class InstanceConfig(BaseModel):
     threads_count: Optional[int]
     tls_ignore_warning: Optional[bool]
     use_collect_events_fallback: Optional[bool]
+    use_cost_based_batching: Optional[bool]
     use_guest_hostname: Optional[bool]
+    use_incremental_infrastructure_cache: Optional[bool]
     use_legacy_check_version: bool
     username: str
 
@@ -2,7 +2,7 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 
-from typing import Any, Dict, List, Optional, Pattern, Type, TypedDict
+from typing import Any, Dict, List, Optional, Pattern, Tuple, Type, TypedDict
 
 # CONFIG ALIASES
 from pyVmomi import vim
@@ -27,6 +27,7 @@ InstanceConfig = TypedDict(
         'max_historical_metrics': int,
         'threads_count': int,
         'metrics_per_query': int,
+        'use_cost_based_batching': bool,
         'batch_property_collector_size': int,
         'batch_tags_collector_size': int,
         'collect_events': bool,
@@ -39,6 +40,7 @@ InstanceConfig = TypedDict(
         'excluded_host_tags': List[str],
         'tags': List[str],
         'refresh_infrastructure_cache_interval': int,
+        'persist_caches': bool,
         'refresh_metrics_metadata_cache_interval': int,
         'resource_filters': List[ResourceFilterConfig],
         'metric_filters': MetricFilterConfig,
@@ -72,3 +74,4 @@ TagAssociation = TypedDict('TagAssociation', {'object_id': Dict[str, str], 'tag_
 MetricFilters = Dict[str, List[Pattern]]
 
 MorBatch = Dict[vim.ManagedEntity, List[vim.PerformanceManager.MetricId]]
+MetricCost = Tuple[float, vim.PerformanceManager.MetricId]
@@ -4,11 +4,12 @@
 from __future__ import division
 
 import datetime as dt
+import json
 import logging
 from collections import defaultdict
-from concurrent.futures import as_completed
+from concurrent.futures import Future, as_completed  # noqa: F401
 from concurrent.futures.thread import ThreadPoolExecutor
-from typing import Any, Dict, Generator, Iterable, List, Set, Type, cast  # noqa: F401
+from typing import Any, Dict, Generator, Iterable, List, Optional, Set, Tuple, Type, cast  # noqa: F401
 
 from pyVmomi import vim, vmodl
 from six import iteritems
@@ -18,6 +19,7 @@ from datadog_checks.base.checks.libs.timer import Timer
 from datadog_checks.base.utils.time import get_current_datetime, get_timestamp
 from datadog_checks.vsphere.api import APIConnectionError, VSphereAPI
 from datadog_checks.vsphere.api_rest import VSphereRestAPI
+from datadog_checks.vsphere.batching import QueryBatchPlanner
 from datadog_checks.vsphere.cache import InfrastructureCache, MetricsMetadataCache
 from datadog_checks.vsphere.config import VSphereConfig
 from datadog_checks.vsphere.constants import (
@@ -57,6 +59,9 @@ except ImportError:
 
 SERVICE_CHECK_NAME = 'can_connect'
 
+PERSISTENT_CACHES_KEY = 'caches'
+PERSISTENT_CACHES_VERSION = 1
+
 
 class VSphereCheck(AgentCheck):
     __NAMESPACE__ = 'vsphere'
@@ -88,7 +93,12 @@ class VSphereCheck(AgentCheck):
         # Do not override `AgentCheck.hostname`
         self._hostname = None
         self.thread_pool = ThreadPoolExecutor(max_workers=self._config.threads_count)
+        self.batch_planner = QueryBatchPlanner()
         self.check_initializations.append(self.initiate_api_connection)
+        # Fetched in the background when the caches are loaded from the persistent cache
+        self._caches_revalidation = None  # type: Optional[Future]
+        if self._config.persist_caches:
+            self.check_initializations.append(self.load_persistent_caches)
 
         self.last_connection_time = get_timestamp()
 
@@ -128,6 +138,10 @@ class VSphereCheck(AgentCheck):
         """
         Request the list of counters (metrics) from vSphere and store them in a cache.
         """
+        self.set_metrics_metadata(self.get_perf_counters())
+
+    def get_perf_counters(self):
+        # type: () -> List[vim.PerformanceManager.CounterInfo]
         self.log.debug(
             "Refreshing the metrics metadata cache. Collecting all counters metadata for collection_level=%d",
             self._config.collection_level,
@@ -142,7 +156,11 @@ class VSphereCheck(AgentCheck):
             hostname=self._hostname,
         )
         self.log.debug("Collected %d counters metadata in %.3f seconds.", len(counters), t0.total())
+        return counters
 
+    def set_metrics_metadata(self, counters):
+        # type: (List[vim.PerformanceManager.CounterInfo]) -> None
+        """Store the counters collected for each resource type into the metrics_metadata_cache."""
         for mor_type in self._config.collected_resource_types:
             allowed_counters = []
             for c in counters:
@@ -204,6 +222,11 @@ class VSphereCheck(AgentCheck):
         """Fetch the complete infrastructure, generate tags for each monitored resources and store all of that
         into the infrastructure_cache. It also computes the resource `hostname` property to be used when submitting
         metrics for this mor."""
+        self.set_infrastructure(*self.get_infrastructure())
+
+    def get_infrastructure(self):
+        # type: () -> Tuple[InfrastructureData, ResourceTags]
+        """Fetch the complete infrastructure and the tags of the monitored resources."""
         self.log.debug("Refreshing the infrastructure cache...")
         t0 = Timer()
         infrastructure_data = self.api.get_infrastructure()
@@ -217,84 +240,140 @@ class VSphereCheck(AgentCheck):
         self.log.debug("Infrastructure cache refreshed in %.3f seconds.", t0.total())
         self.log.debug("Infrastructure cache: %s", infrastructure_data)
 
-        all_tags = {}
+        all_tags = {}  # type: ResourceTags
         if self._config.should_collect_tags:
             all_tags = self.collect_tags(infrastructure_data)
-        self.infrastructure_cache.set_all_tags(all_tags)
 
+        return infrastructure_data, all_tags
+
+    def set_infrastructure(self, infrastructure_data, all_tags):
+        # type: (InfrastructureData, ResourceTags) -> None
+        """Store all the collected resources with their tags into the infrastructure_cache."""
+        self.infrastructure_cache.set_all_tags(all_tags)
         for mor, properties in iteritems(infrastructure_data):
-            if not isinstance(mor, tuple(self._config.collected_resource_types)):
-                # Do nothing for the resource types we do not collect
-                continue
+            self.cache_mor_props(mor, properties, infrastructure_data)
 
-            mor_name = to_string(properties.get("name", "unknown"))
-            mor_type_str = MOR_TYPE_AS_STRING[type(mor)]
-            hostname = None
-            tags = []
-
-            if isinstance(mor, vim.VirtualMachine):
-                power_state = properties.get("runtime.powerState")
-                if power_state != vim.VirtualMachinePowerState.poweredOn:
-                    # Skipping because the VM is not powered on
-                    # TODO: Sometimes VM are "poweredOn" but "disconnected" and thus have no metrics
-                    self.log.debug("Skipping VM %s in state %s", mor_name, to_string(power_state))
-                    continue
+    def refresh_infrastructure_cache_incrementally(self):
+        # type: () -> None
+        """Same as `refresh_infrastructure_cache`, but only the resources created, modified and deleted since the
+        last refresh are fetched and updated in the infrastructure_cache.
+        All the resources are updated when the whole infrastructure had to be fetched again, or when the changes can
+        affect the tags of other resources, i.e. when resources other than VMs changed or when tags changed."""
+        self.log.debug("Refreshing the infrastructure cache incrementally...")
+        t0 = Timer()
+        infrastructure_data, modified_mors, deleted_mors = self.api.get_infrastructure_updates()
+        self.gauge(
+            "datadog.vsphere.refresh_infrastructure_cache.time",
+            t0.total(),
+            tags=self._config.base_tags,
+            raw=True,
+            hostname=self._hostname,
+        )
+        self.log.debug("Infrastructure cache refreshed in %.3f seconds.", t0.total())
 
-                # Hosts are not considered as parents of the VMs they run, we use the `runtime.host` property
-                # to get the name of the ESXi host
-                runtime_host = properties.get("runtime.host")
-                runtime_host_props = {}  # type: InfrastructureDataItem
-                if runtime_host:
-                    if runtime_host in infrastructure_data:
-                        runtime_host_props = infrastructure_data.get(runtime_host, {})
-                    else:
-                        self.log.debug("Missing runtime.host details for VM %s", mor_name)
-                runtime_hostname = to_string(runtime_host_props.get("name", "unknown"))
-                tags.append('vsphere_host:{}'.format(runtime_hostname))
+        # The changes are only returned once, start over if they cannot be applied
+        try:
+            self.apply_infrastructure_updates(infrastructure_data, modified_mors, deleted_mors)
+        except Exception:
+            self.api.reset_infrastructure_updates()
+            raise
+
+    def apply_infrastructure_updates(self, infrastructure_data, modified_mors, deleted_mors):
+        # type: (InfrastructureData, Optional[Set[vim.ManagedEntity]], Set[vim.ManagedEntity]) -> None
+        """Store the changes returned by `get_infrastructure_updates` into the infrastructure_cache."""
+        all_tags = {}
+        if self._config.should_collect_tags:
+            all_tags = self.collect_tags(infrastructure_data)
+
+        if (
+            modified_mors is None
+            or all_tags != self.infrastructure_cache.get_all_tags()
+            or any(not isinstance(mor, vim.VirtualMachine) for mor in modified_mors | deleted_mors)
+        ):
+            with self.infrastructure_cache.update():
+                self.set_infrastructure(infrastructure_data, all_tags)
+            return
+
+        with self.infrastructure_cache.patch():
+            for mor in deleted_mors:
+                self.infrastructure_cache.delete_mor_props(mor)
+            for mor in modified_mors:
+                # The resource may no longer be collected, e.g. if a VM was powered off
+                self.infrastructure_cache.delete_mor_props(mor)
+                self.cache_mor_props(mor, infrastructure_data[mor], infrastructure_data)
+
+    def cache_mor_props(self, mor, properties, infrastructure_data):
+        # type: (vim.ManagedEntity, InfrastructureDataItem, InfrastructureData) -> None
+        """Compute the tags and hostname of a resource and store them into the infrastructure_cache, unless the
+        resource is not collected."""
+        if not isinstance(mor, tuple(self._config.collected_resource_types)):
+            # Do nothing for the resource types we do not collect
+            return
 
-                if self._config.use_guest_hostname:
-                    hostname = properties.get("guest.hostName", mor_name)
+        mor_name = to_string(properties.get("name", "unknown"))
+        mor_type_str = MOR_TYPE_AS_STRING[type(mor)]
+        hostname = None
+        tags = []
+
+        if isinstance(mor, vim.VirtualMachine):
+            power_state = properties.get("runtime.powerState")
+            if power_state != vim.VirtualMachinePowerState.poweredOn:
+                # Skipping because the VM is not powered on
+                # TODO: Sometimes VM are "poweredOn" but "disconnected" and thus have no metrics
+                self.log.debug("Skipping VM %s in state %s", mor_name, to_string(power_state))
+                return
+
+            # Hosts are not considered as parents of the VMs they run, we use the `runtime.host` property
+            # to get the name of the ESXi host
+            runtime_host = properties.get("runtime.host")
+            runtime_host_props = {}  # type: InfrastructureDataItem
+            if runtime_host:
+                if runtime_host in infrastructure_data:
+                    runtime_host_props = infrastructure_data.get(runtime_host, {})
                 else:
-                    hostname = mor_name
-            elif isinstance(mor, vim.HostSystem):
-                hostname = mor_name
+                    self.log.debug("Missing runtime.host details for VM %s", mor_name)
+            runtime_hostname = to_string(runtime_host_props.get("name", "unknown"))
+            tags.append('vsphere_host:{}'.format(runtime_hostname))
+
+            if self._config.use_guest_hostname:
+                hostname = properties.get("guest.hostName", mor_name)
             else:
-                tags.append('vsphere_{}:{}'.format(mor_type_str, mor_name))
-
-            parent = properties.get('parent')
-            runtime_host = properties.get('runtime.host')
-            if parent is not None:
-                tags.extend(get_tags_recursively(parent, infrastructure_data, self._config))
-            if runtime_host is not None:
-                tags.extend(
-                    get_tags_recursively(
-                        runtime_host, infrastructure_data, self._config, include_only=['vsphere_cluster']
-                    )
-                )
-            tags.append('vsphere_type:{}'.format(mor_type_str))
-
-            # Attach tags from fetched attributes.
-            tags.extend(properties.get('attributes', []))
-
-            resource_tags = self.infrastructure_cache.get_mor_tags(mor) + tags
-            if not is_resource_collected_by_filters(
-                mor,
-                infrastructure_data,
-                self._config.resource_filters,
-                resource_tags,
-            ):
-                # The resource does not match the specified whitelist/blacklist patterns.
-                self.log.debug(
-                    "Skipping resource not matched by filters. resource=`%s` tags=`%s`", mor_name, resource_tags
-                )
-                continue
+                hostname = mor_name
+        elif isinstance(mor, vim.HostSystem):
+            hostname = mor_name
+        else:
+            tags.append('vsphere_{}:{}'.format(mor_type_str, mor_name))
+
+        parent = properties.get('parent')
+        runtime_host = properties.get('runtime.host')
+        if parent is not None:
+            tags.extend(get_tags_recursively(parent, infrastructure_data, self._config))
+        if runtime_host is not None:
+            tags.extend(
+                get_tags_recursively(runtime_host, infrastructure_data, self._config, include_only=['vsphere_cluster'])
+            )
+        tags.append('vsphere_type:{}'.format(mor_type_str))
+
+        # Attach tags from fetched attributes.
+        tags.extend(properties.get('attributes', []))
+
+        resource_tags = self.infrastructure_cache.get_mor_tags(mor) + tags
+        if not is_resource_collected_by_filters(
+            mor,
+            infrastructure_data,
+            self._config.resource_filters,
+            resource_tags,
+        ):
+            # The resource does not match the specified whitelist/blacklist patterns.
+            self.log.debug("Skipping resource not matched by filters. resource=`%s` tags=`%s`", mor_name, resource_tags)
+            return
 
-            mor_payload = {"tags": tags}  # type: Dict[str, Any]
+        mor_payload = {"tags": tags}  # type: Dict[str, Any]
 
-            if hostname:
-                mor_payload['hostname'] = hostname
+        if hostname:
+            mor_payload['hostname'] = hostname
 
-            self.infrastructure_cache.set_mor_props(mor, mor_payload)
+        self.infrastructure_cache.set_mor_props(mor, mor_payload)
 
     def submit_metrics_callback(self, query_results):
         # type: (List[vim.PerformanceManager.EntityMetricBase]) -> None
@@ -316,6 +395,8 @@ class VSphereCheck(AgentCheck):
                     have_instance_value[resource_type].add(metadata[result.id.counterId])
 
         for results_per_mor in query_results:
+            if self._config.use_cost_based_batching:
+                self.batch_planner.record_results(results_per_mor)
             mor_props = self.infrastructure_cache.get_mor_props(results_per_mor.entity)
             if mor_props is None:
                 self.log.debug(
@@ -468,7 +549,11 @@ class VSphereCheck(AgentCheck):
         """Run queries in multiple threads and wait for completion."""
         tasks = []  # type: List[Any]
         try:
-            for query_specs in self.make_query_specs():
+            all_query_specs = self.make_query_specs()
+            if self._config.use_cost_based_batching:
+                # Start the most expensive queries first so that they do not delay the end of the collection
+                all_query_specs = sorted(all_query_specs, key=self.batch_planner.estimate_query_cost, reverse=True)
+            for query_specs in all_query_specs:
                 tasks.append(self.thread_pool.submit(self.query_metrics_wrapper, query_specs))
         except Exception as e:
             self.log.warning("Unable to schedule all metric collection tasks: %s", e)
@@ -498,6 +583,9 @@ class VSphereCheck(AgentCheck):
                         e,
                     )
 
+            if self._config.use_cost_based_batching:
+                self.batch_planner.end_collection()
+
     def make_batch(
         self,
         mors,  # type: Iterable[vim.ManagedEntity]
@@ -513,6 +601,11 @@ class VSphereCheck(AgentCheck):
         # Safeguard, let's avoid collecting multiple resources in the same call
         mors_filtered = [m for m in mors if isinstance(m, resource_type)]  # type: List[vim.ManagedEntity]
 
+        if self._config.use_cost_based_batching:
+            for batch in self.make_cost_based_batch(mors_filtered, metric_ids, resource_type):
+                yield batch
+            return
+
         if resource_type == vim.ClusterComputeResource:
             # Cluster metrics are unpredictable and a single call can max out the limit. Always collect them one by one.
             max_batch_size = 1  # type: float
@@ -540,6 +633,33 @@ class VSphereCheck(AgentCheck):
         if batch:
             yield batch
 
+    def make_cost_based_batch(
+        self,
+        mors,  # type: List[vim.ManagedEntity]
+        metric_ids,  # type: List[vim.PerformanceManager.MetricId]
+        resource_type,  # type: Type[vim.ManagedEntity]
+    ):  # type: (...) -> List[MorBatch]
+        """Same as `make_batch`, but `metrics_per_query` limits the estimated number of series returned by each
+        query instead of the number of metrics requested, and the work is spread across `threads_count` queries.
+        """
+        if resource_type == vim.ClusterComputeResource:
+            # Cluster metrics are unpredictable and a single call can max out the limit. Always collect them one by one.
+            max_batch_size = 1  # type: float
+        elif resource_type in REALTIME_RESOURCES or self._config.max_historical_metrics < 0:
+            max_batch_size = float('inf')
+        else:
+            # vCenter limits the number of metrics requested, regardless of the number of series returned
+            max_batch_size = self._config.max_historical_metrics
+
+        if self._config.metrics_per_query <= 0:
+            max_batch_cost = float('inf')
+        else:
+            max_batch_cost = self._config.metrics_per_query
+
+        return self.batch_planner.make_batches(
+            mors, metric_ids, max_batch_cost, max_batch_size, self._config.threads_count
+        )
+
     def submit_external_host_tags(self):
         # type: () -> None
         """Send external host tags to the Datadog backend. This is only useful for a REALTIME instance because
@@ -606,6 +726,74 @@ class VSphereCheck(AgentCheck):
             # OR something bad happened (which might happen again indefinitely).
             self.latest_event_query = collect_start_time
 
+    def load_persistent_caches(self):
+        # type: () -> None
+        """Load the caches persisted before the last restart so that metrics are collected right away, and fetch
+        their content again in the background."""
+        try:
+            caches = json.loads(self.read_persistent_cache(PERSISTENT_CACHES_KEY) or '{}')
+            if caches.get('version') != PERSISTENT_CACHES_VERSION:
+                return
+
+            with self.metrics_metadata_cache.update():
+                self.metrics_metadata_cache.load(caches['metrics_metadata'])
+            with self.infrastructure_cache.update():
+                self.infrastructure_cache.load(caches['infrastructure'])
+        except Exception as e:
+            self.log.warning("Unable to load the persisted caches, they will be refreshed: %s", e)
+            self.metrics_metadata_cache.expire()
+            self.infrastructure_cache.expire()
+            return
+
+        self.log.debug("Loaded the persisted caches, revalidating them in the background.")
+        self.submit_external_host_tags()
+        self._caches_revalidation = self.thread_pool.submit(self.fetch_caches_content)
+
+    def fetch_caches_content(self):
+        # type: () -> Tuple[List[vim.PerformanceManager.CounterInfo], InfrastructureData, ResourceTags]
+        """Fetch everything needed to refresh the caches.
+        Warning: called in threads
+        """
+        counters = self.get_perf_counters()
+        infrastructure_data, all_tags = self.get_infrastructure()
+        return counters, infrastructure_data, all_tags
+
+    def update_revalidated_caches(self):
+        # type: () -> bool
+        """Refresh the caches loaded at startup once their content was fetched again in the background.
+        Return whether the caches are being or were just revalidated, in which case they must not be refreshed."""
+        if self._caches_revalidation is None:
+            return False
+        if not self._caches_revalidation.done():
+            return True
+
+        caches_revalidation, self._caches_revalidation = self._caches_revalidation, None
+        try:
+            counters, infrastructure_data, all_tags = caches_revalidation.result()
+            with self.metrics_metadata_cache.update():
+                self.set_metrics_metadata(counters)
+            with self.infrastructure_cache.update():
+                self.set_infrastructure(infrastructure_data, all_tags)
+        except Exception as e:
+            # Refresh them as usual instead
+            self.log.warning("Unable to revalidate the persisted caches: %s", e)
+            self.metrics_metadata_cache.expire()
+            self.infrastructure_cache.expire()
+            return False
+
+        self.submit_external_host_tags()
+        self.write_persistent_caches()
+        return True
+
+    def write_persistent_caches(self):
+        # type: () -> None
+        caches = {
+            'version': PERSISTENT_CACHES_VERSION,
+            'metrics_metadata': self.metrics_metadata_cache.dump(),
+            'infrastructure': self.infrastructure_cache.dump(),
+        }
+        self.write_persistent_cache(PERSISTENT_CACHES_KEY, json.dumps(caches, separators=(',', ':')))
+
     def check(self, _):
         # type: (Any) -> None
         self._hostname = datadog_agent.get_hostname()
@@ -659,17 +847,29 @@ class VSphereCheck(AgentCheck):
                 )
                 pass
 
-        # Refresh the metrics metadata cache
-        if self.metrics_metadata_cache.is_expired():
-            with self.metrics_metadata_cache.update():
-                self.refresh_metrics_metadata_cache()
+        # The caches loaded at startup are used as is until they are fetched again in the background
+        if not self.update_revalidated_caches():
+            caches_refreshed = False
 
-        # Refresh the infrastructure cache
-        if self.infrastructure_cache.is_expired():
-            with self.infrastructure_cache.update():
-                self.refresh_infrastructure_cache()
-            # Submit host tags as soon as we have fresh data
-            self.submit_external_host_tags()
+            # Refresh the metrics metadata cache
+            if self.metrics_metadata_cache.is_expired():
+                with self.metrics_metadata_cache.update():
+                    self.refresh_metrics_metadata_cache()
+                caches_refreshed = True
+
+            # Refresh the infrastructure cache
+            if self.infrastructure_cache.is_expired():
+                if self._config.use_incremental_infrastructure_cache:
+                    self.refresh_infrastructure_cache_incrementally()
+                else:
+                    with self.infrastructure_cache.update():
+                        self.refresh_infrastructure_cache()
+                # Submit host tags as soon as we have fresh data
+                self.submit_external_host_tags()
+                caches_refreshed = True
+
+            if caches_refreshed and self._config.persist_caches:
+                self.write_persistent_caches()
 
         # Submit the number of VMs that are monitored
         for resource_type in self._config.collected_resource_types:
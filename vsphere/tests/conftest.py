@@ -86,8 +86,8 @@ def mock_threadpool():
     with patch('datadog_checks.vsphere.vsphere.ThreadPoolExecutor') as pool, patch(
         'datadog_checks.vsphere.vsphere.as_completed', side_effect=lambda x: x
     ):
-        pool.return_value.submit = lambda f, args: MagicMock(
-            done=MagicMock(return_value=True), result=MagicMock(return_value=f(args)), exception=lambda: None
+        pool.return_value.submit = lambda f, *args: MagicMock(
+            done=MagicMock(return_value=True), result=MagicMock(return_value=f(*args)), exception=lambda: None
         )
         yield
 
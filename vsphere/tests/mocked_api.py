@@ -103,7 +103,15 @@ class MockedAPI(object):
 
         data = []
         for spec in query_specs:
-            entity_name = self.infrastructure_data.get(spec.entity)['name']
+            props = self.infrastructure_data.get(spec.entity)
+            if props is None:
+                # Resources loaded from the persistent cache are not the mocked ones
+                props = next(
+                    p
+                    for m, p in iteritems(self.get_infrastructure())
+                    if m.__class__ == spec.entity.__class__ and m._moId == spec.entity._moId
+                )
+            entity_name = props['name']
             counter_ids = [i.counterId for i in spec.metricId]
             results = [m for m in self.metrics_data if m.entity == entity_name and m.counterId in counter_ids]
             values = []
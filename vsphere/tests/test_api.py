@@ -111,6 +111,82 @@ def test_get_infrastructure(realtime_instance):
         container_view.Destroy.assert_called_once()
 
 
+def test_get_infrastructure_updates(realtime_instance):
+    def object_update(kind, obj, **props):
+        change_set = [vmodl.query.PropertyCollector.Change(name=k, op='assign', val=v) for k, v in props.items()]
+        return MagicMock(kind=kind, obj=obj, changeSet=change_set)
+
+    def update_set(version, object_updates, truncated=False):
+        return MagicMock(version=version, filterSet=[MagicMock(objectSet=object_updates)], truncated=truncated)
+
+    with patch('datadog_checks.vsphere.api.connect'):
+        config = VSphereConfig(realtime_instance, {}, MagicMock())
+        api = VSphereAPI(config, MagicMock())
+
+        content = api._conn.content
+        content.viewManager.CreateContainerView.return_value.__class__ = vim.ManagedObject
+        collector = content.propertyCollector.CreatePropertyCollector.return_value
+        root_folder = content.rootFolder
+        root_folder.name = 'root-folder'
+
+        # The first call retrieves the whole infrastructure
+        collector.WaitForUpdatesEx.side_effect = [
+            update_set('1', [object_update('enter', 'foo', name='foo')], truncated=True),
+            update_set('2', [object_update('enter', 'bar', name='bar'), object_update('enter', 'baz', name='baz')]),
+        ]
+        infrastructure_data, modified_mors, deleted_mors = api.get_infrastructure_updates()
+        assert infrastructure_data == {
+            'foo': {'name': 'foo'},
+            'bar': {'name': 'bar'},
+            'baz': {'name': 'baz'},
+            root_folder: {'name': 'root-folder', 'parent': None},
+        }
+        assert modified_mors is None
+        assert deleted_mors == set()
+        collector.CreateFilter.assert_called_once_with(ANY, partialUpdates=False)
+        assert [c.args[0] for c in collector.WaitForUpdatesEx.call_args_list] == ['', '1']
+
+        # Then only the changes since the previous version
+        collector.WaitForUpdatesEx.side_effect = [
+            update_set(
+                '3',
+                [
+                    object_update('modify', 'foo', name='foo-renamed'),
+                    object_update('leave', 'bar'),
+                    object_update('enter', 'qux', name='qux'),
+                ],
+            ),
+        ]
+        infrastructure_data, modified_mors, deleted_mors = api.get_infrastructure_updates()
+        assert infrastructure_data == {
+            'foo': {'name': 'foo-renamed'},
+            'baz': {'name': 'baz'},
+            'qux': {'name': 'qux'},
+            root_folder: {'name': 'root-folder', 'parent': None},
+        }
+        assert modified_mors == {'foo', 'qux'}
+        assert deleted_mors == {'bar'}
+        assert collector.WaitForUpdatesEx.call_args.args[0] == '2'
+
+        # No pending changes
+        collector.WaitForUpdatesEx.side_effect = [None]
+        _, modified_mors, deleted_mors = api.get_infrastructure_updates()
+        assert modified_mors == set()
+        assert deleted_mors == set()
+        assert collector.WaitForUpdatesEx.call_args.args[0] == '3'
+
+        # Unknown versions trigger a full refresh with a new collector
+        collector.WaitForUpdatesEx.side_effect = [
+            vmodl.query.InvalidCollectorVersion(),
+            update_set('1', [object_update('enter', 'foo', name='foo')]),
+        ]
+        infrastructure_data, modified_mors, _ = api.get_infrastructure_updates()
+        assert infrastructure_data == {'foo': {'name': 'foo'}, root_folder: {'name': 'root-folder', 'parent': None}}
+        assert modified_mors is None
+        collector.Destroy.assert_called_once()
+        assert collector.WaitForUpdatesEx.call_args.args[0] == ''
+
+
 @pytest.mark.parametrize(
     'exception, expected_calls',
     [
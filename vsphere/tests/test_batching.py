@@ -0,0 +1,107 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+from pyVmomi import vim
+
+from datadog_checks.vsphere.batching import QueryBatchPlanner
+
+
+def make_results(mor, counters):
+    return vim.PerformanceManager.EntityMetric(
+        entity=mor,
+        value=[
+            vim.PerformanceManager.IntSeries(
+                value=[1], id=vim.PerformanceManager.MetricId(counterId=counter_id, instance=instance)
+            )
+            for counter_id, instances in counters.items()
+            for instance in instances
+        ],
+    )
+
+
+def batch_cost(planner, batch):
+    return sum(planner.estimate_cost(mor, metric_id) for mor, metric_ids in batch.items() for metric_id in metric_ids)
+
+
+def test_estimate_cost():
+    planner = QueryBatchPlanner()
+    vm1 = vim.VirtualMachine(moId='vm1')
+    vm2 = vim.VirtualMachine(moId='vm2')
+    host = vim.HostSystem(moId='host')
+    aggregated = vim.PerformanceManager.MetricId(counterId=1, instance='')
+    per_instance = vim.PerformanceManager.MetricId(counterId=2, instance='*')
+
+    # Unknown metrics return a single series
+    assert planner.estimate_cost(vm1, per_instance) == 1
+
+    planner.record_results(make_results(vm1, {1: [''], 2: ['', 'a', 'b', 'c']}))
+    planner.record_results(make_results(vm2, {2: ['', 'a']}))
+    # Results are only used once the collection is over
+    assert planner.estimate_cost(vm1, per_instance) == 1
+    planner.end_collection()
+
+    assert planner.estimate_cost(vm1, aggregated) == 1
+    assert planner.estimate_cost(vm1, per_instance) == 4
+    assert planner.estimate_cost(vm2, per_instance) == 2
+    # Metrics without values still cost a query
+    assert planner.estimate_cost(vm2, aggregated) == 1
+    # New resources use the average of their type
+    assert planner.estimate_cost(vim.VirtualMachine(moId='vm3'), per_instance) == 3
+    assert planner.estimate_cost(host, per_instance) == 1
+
+    # Only the last collection is kept, but the averages of the counters not collected are
+    planner.record_results(make_results(vm2, {1: ['']}))
+    planner.end_collection()
+    assert planner.estimate_cost(vm1, per_instance) == 3
+    assert planner.estimate_cost(vm2, aggregated) == 1
+
+
+def test_make_batches():
+    planner = QueryBatchPlanner()
+    mors = [vim.VirtualMachine(moId='vm{}'.format(i)) for i in range(10)]
+    metric_ids = [vim.PerformanceManager.MetricId(counterId=i, instance='*') for i in range(5)]
+
+    # Without history, every metric costs 1
+    batches = planner.make_batches(mors, metric_ids, 20, float('inf'), 1)
+    assert len(batches) == 3
+    assert sorted(batch_cost(planner, batch) for batch in batches) == [10, 20, 20]
+    # Resources are not split unless needed
+    assert all(len(metrics) == 5 for batch in batches for metrics in batch.values())
+
+    # The first resource returns 20 series for each metric, the others a single one
+    planner.record_results(make_results(mors[0], {i: [str(n) for n in range(20)] for i in range(5)}))
+    for mor in mors[1:]:
+        planner.record_results(make_results(mor, {i: [''] for i in range(5)}))
+    planner.end_collection()
+    batches = planner.make_batches(mors, metric_ids, 20, float('inf'), 1)
+    costs = [batch_cost(planner, batch) for batch in batches]
+    assert costs == sorted(costs, reverse=True)
+    assert costs == [20, 20, 20, 20, 20, 20, 20, 5]
+    # The metrics of the first resource are split in as many queries
+    assert len([batch for batch in batches if mors[0] in batch]) == 5
+
+    # Every metric is queried exactly once
+    queried = sorted(
+        (mor._moId, metric_id.counterId) for batch in batches for mor, metrics in batch.items() for metric_id in metrics
+    )
+    assert queried == sorted((mor._moId, metric_id.counterId) for mor in mors for metric_id in metric_ids)
+
+
+def test_make_batches_balances_workers():
+    planner = QueryBatchPlanner()
+    mors = [vim.VirtualMachine(moId='vm{}'.format(i)) for i in range(8)]
+    metric_ids = [vim.PerformanceManager.MetricId(counterId=i, instance='') for i in range(5)]
+
+    batches = planner.make_batches(mors, metric_ids, float('inf'), float('inf'), 4)
+    assert [batch_cost(planner, batch) for batch in batches] == [10] * 4
+
+
+def test_make_batches_max_size():
+    planner = QueryBatchPlanner()
+    mors = [vim.ClusterComputeResource(moId='c{}'.format(i)) for i in range(2)]
+    metric_ids = [vim.PerformanceManager.MetricId(counterId=i, instance='') for i in range(3)]
+
+    batches = planner.make_batches(mors, metric_ids, float('inf'), 1, 1)
+    assert len(batches) == 6
+    assert all(len(batch) == 1 and len(list(batch.values())[0]) == 1 for batch in batches)
+    assert planner.make_batches([], metric_ids, float('inf'), 1, 1) == []
@@ -1,6 +1,7 @@
 # (C) Datadog, Inc. 2019-present
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
+import json
 import logging
 
 import pytest
@@ -100,3 +101,68 @@ def test_infrastructure_cache(realtime_instance):
     assert cache.get_mor_tags(vm_mor) == ['my_cat_name_1:my_tag_name_1', 'my_cat_name_2:my_tag_name_2']
     assert cache.get_mor_tags(datastore) == ['my_cat_name_2:my_tag_name_2']
     assert cache.get_mor_tags(vm2_mor) == []
+
+
+def test_infrastructure_cache_patch():
+    cache = InfrastructureCache(float('inf'))
+    vm1 = vim.VirtualMachine(moId='vm-1')
+    vm2 = vim.VirtualMachine(moId='vm-2')
+    host = vim.HostSystem(moId='host-1')
+
+    with cache.update():
+        cache.set_mor_props(vm1, {'name': 'vm1'})
+        cache.set_mor_props(host, {'name': 'host1'})
+        cache.set_all_tags({vim.VirtualMachine: {'vm-1': ['foo:bar']}})
+
+    # Patching keeps the existing content
+    with cache.patch():
+        cache.delete_mor_props(vm1)
+        cache.set_mor_props(vm2, {'name': 'vm2'})
+
+    assert list(cache.get_mors(vim.VirtualMachine)) == [vm2]
+    assert cache.get_mor_props(host) == {'name': 'host1'}
+    assert cache.get_mor_tags(vm1) == ['foo:bar']
+
+    # The previous content is restored on error
+    with pytest.raises(Exception), cache.patch():
+        cache.delete_mor_props(vm2)
+        cache.delete_mor_props(host)
+        raise Exception('foo')
+
+    assert list(cache.get_mors(vim.VirtualMachine)) == [vm2]
+    assert cache.get_mor_props(host) == {'name': 'host1'}
+
+
+def test_caches_dump_and_load():
+    metrics_metadata_cache = MetricsMetadataCache(float('inf'))
+    with metrics_metadata_cache.update():
+        metrics_metadata_cache.set_metadata(vim.VirtualMachine, {1: 'cpu.usage.avg', 2: 'mem.active.avg'})
+        metrics_metadata_cache.set_metadata(vim.HostSystem, {})
+
+    infrastructure_cache = InfrastructureCache(float('inf'))
+    vm = vim.VirtualMachine(moId='vm-1')
+    datastore = vim.Datastore(moId='datastore-1')
+    with infrastructure_cache.update():
+        infrastructure_cache.set_mor_props(vm, {'tags': ['vsphere_type:vm'], 'hostname': 'vm1'})
+        infrastructure_cache.set_mor_props(datastore, {'tags': ['vsphere_type:datastore']})
+        infrastructure_cache.set_all_tags({vim.VirtualMachine: {'vm-1': ['foo:bar']}})
+
+    # The content must survive a round trip through JSON
+    loaded_metrics_metadata_cache = MetricsMetadataCache(float('inf'))
+    loaded_metrics_metadata_cache.load(json.loads(json.dumps(metrics_metadata_cache.dump())))
+    assert loaded_metrics_metadata_cache.get_metadata(vim.VirtualMachine) == {1: 'cpu.usage.avg', 2: 'mem.active.avg'}
+    assert loaded_metrics_metadata_cache.get_metadata(vim.HostSystem) == {}
+
+    loaded_infrastructure_cache = InfrastructureCache(60)
+    with loaded_infrastructure_cache.update():
+        loaded_infrastructure_cache.load(json.loads(json.dumps(infrastructure_cache.dump())))
+    assert list(loaded_infrastructure_cache.get_mors(vim.VirtualMachine)) == [vm]
+    assert loaded_infrastructure_cache.get_mor_props(vm) == {'tags': ['vsphere_type:vm'], 'hostname': 'vm1'}
+    assert loaded_infrastructure_cache.get_mor_props(datastore) == {'tags': ['vsphere_type:datastore']}
+    assert loaded_infrastructure_cache.get_mor_tags(vm) == ['foo:bar']
+
+    # Expiring a cache keeps its content until it is refreshed
+    assert not loaded_infrastructure_cache.is_expired()
+    loaded_infrastructure_cache.expire()
+    assert loaded_infrastructure_cache.is_expired()
+    assert loaded_infrastructure_cache.get_mor_props(vm) == {'tags': ['vsphere_type:vm'], 'hostname': 'vm1'}
@@ -9,6 +9,7 @@ import time
 import mock
 import pytest
 from mock import MagicMock
+from pyVmomi import vim
 
 from datadog_checks.base import to_string
 from datadog_checks.vsphere import VSphereCheck
@@ -38,6 +39,87 @@ def test_realtime_metrics(aggregator, dd_run_check, realtime_instance):
     aggregator.assert_all_metrics_covered()
 
 
+@pytest.mark.usefixtures("mock_type", "mock_threadpool", "mock_api")
+def test_cost_based_batching(aggregator, dd_run_check, realtime_instance):
+    """Batching by estimated cost must not change the metrics collected."""
+    realtime_instance['use_cost_based_batching'] = True
+    realtime_instance['metrics_per_query'] = 10
+    check = VSphereCheck('vsphere', {}, [realtime_instance])
+    dd_run_check(check)
+    assert check.batch_planner._series
+
+    # The second run uses the estimations from the first one
+    aggregator.reset()
+    check.infrastructure_cache._last_ts = 0
+    check.metrics_metadata_cache._last_ts = 0
+    dd_run_check(check)
+
+    fixture_file = os.path.join(HERE, 'fixtures', 'metrics_realtime_values.json')
+    with open(fixture_file, 'r') as f:
+        data = json.load(f)
+        for metric in data:
+            aggregator.assert_metric(
+                metric['name'], metric.get('value'), hostname=metric.get('hostname'), tags=metric.get('tags')
+            )
+
+    aggregator.assert_metric('datadog.vsphere.collect_events.time', metric_type=aggregator.GAUGE, count=1)
+    aggregator.assert_all_metrics_covered()
+
+
+@pytest.mark.usefixtures("mock_type", "mock_threadpool", "mock_api")
+def test_persist_caches(aggregator, dd_run_check, realtime_instance):
+    realtime_instance['persist_caches'] = True
+    check = VSphereCheck('vsphere', {}, [realtime_instance])
+    dd_run_check(check)
+    assert json.loads(check.read_persistent_cache('caches'))['version'] == 1
+
+    # After a restart, metrics are collected with the persisted caches while they are fetched again in the background
+    aggregator.reset()
+    check = VSphereCheck('vsphere', {}, [realtime_instance])
+    revalidation = MagicMock(done=MagicMock(return_value=False))
+    submit = check.thread_pool.submit
+    check.thread_pool.submit = lambda f, *args: revalidation if f == check.fetch_caches_content else submit(f, *args)
+    check.api_rest = None
+    with mock.patch.object(check, 'get_perf_counters') as get_perf_counters, mock.patch.object(
+        check, 'get_infrastructure'
+    ) as get_infrastructure:
+        dd_run_check(check)
+        get_perf_counters.assert_not_called()
+        get_infrastructure.assert_not_called()
+
+    fixture_file = os.path.join(HERE, 'fixtures', 'metrics_realtime_values.json')
+    with open(fixture_file, 'r') as f:
+        data = json.load(f)
+        for metric in data:
+            if metric['name'].startswith('datadog.vsphere.refresh_'):
+                continue
+            aggregator.assert_metric(
+                metric['name'], metric.get('value'), hostname=metric.get('hostname'), tags=metric.get('tags')
+            )
+
+    # The caches are updated once revalidated
+    revalidation.done.return_value = True
+    revalidation.result.return_value = ([], {}, {})
+    dd_run_check(check)
+    assert check._caches_revalidation is None
+    assert not list(check.infrastructure_cache.get_mors(vim.VirtualMachine))
+    assert json.loads(check.read_persistent_cache('caches'))['infrastructure'] == {'mors': {}, 'tags': {}}
+
+
+@pytest.mark.usefixtures("mock_type", "mock_threadpool", "mock_api")
+def test_persist_caches_invalid(aggregator, dd_run_check, realtime_instance):
+    realtime_instance['persist_caches'] = True
+    check = VSphereCheck('vsphere', {}, [realtime_instance])
+    check.write_persistent_cache('caches', '{"version": 1, "metrics_metadata": {"unknown": {}}}')
+    dd_run_check(check)
+
+    # The caches are refreshed as usual
+    assert check._caches_revalidation is None
+    aggregator.assert_metric('datadog.vsphere.refresh_metrics_metadata_cache.time')
+    aggregator.assert_metric('datadog.vsphere.refresh_infrastructure_cache.time')
+    aggregator.assert_metric('vsphere.cpu.usage.avg')
+
+
 @pytest.mark.usefixtures("mock_type", "mock_threadpool", "mock_api")
 def test_historical_metrics(aggregator, dd_run_check, historical_instance):
     """This test asserts that the same api content always produces the same metrics."""
@@ -297,6 +379,32 @@ def test_refresh_tags_cache_should_not_raise_exception(aggregator, dd_run_check,
     check.log.error.assert_called_once_with("Failed to collect tags: %s", mock.ANY)
 
 
+def test_incremental_infrastructure_cache_failure(realtime_instance):
+    realtime_instance['use_incremental_infrastructure_cache'] = True
+    check = VSphereCheck('vsphere', {}, [realtime_instance])
+    check.api = MagicMock()
+
+    root_folder = vim.Folder(moId='root')
+    vm = vim.VirtualMachine(moId='vm1')
+    infrastructure_data = {
+        root_folder: {'name': 'root', 'parent': None},
+        vm: {'name': 'vm1', 'parent': root_folder, 'runtime.powerState': vim.VirtualMachinePowerState.poweredOn},
+    }
+    check.api.get_infrastructure_updates.return_value = (infrastructure_data, None, set())
+    check.refresh_infrastructure_cache_incrementally()
+    assert check.infrastructure_cache.get_mor_props(vm)['hostname'] == 'vm1'
+
+    # The API already consumed the changes, so the whole infrastructure must be retrieved on the next refresh
+    infrastructure_data[vm] = dict(infrastructure_data[vm], name='vm1-renamed')
+    check.api.get_infrastructure_updates.return_value = (infrastructure_data, {vm}, set())
+    with mock.patch.object(check, 'cache_mor_props', side_effect=Exception('error')):
+        with pytest.raises(Exception, match='error'):
+            check.refresh_infrastructure_cache_incrementally()
+
+    check.api.reset_infrastructure_updates.assert_called_once()
+    assert check.infrastructure_cache.get_mor_props(vm)['hostname'] == 'vm1'
+
+
 @pytest.mark.usefixtures('mock_type', 'mock_threadpool', 'mock_api', 'mock_rest_api')
 def test_renew_rest_api_session_on_failure(aggregator, dd_run_check, realtime_instance):
     realtime_instance.update({'collect_tags': True})
@@ -182,6 +182,10 @@ def instance_resourcemanager_uri(field, value):
     return 'http://localhost:8088'
 
 
+def instance_response_cache_size(field, value):
+    return 10240
+
+
 def instance_service(field, value):
     return get_default_field_value(field, value)
 
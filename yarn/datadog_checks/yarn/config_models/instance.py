@@ -89,6 +89,7 @@ class InstanceConfig(BaseModel):
     read_timeout: Optional[float]
     request_size: Optional[float]
     resourcemanager_uri: Optional[str]
+    response_cache_size: Optional[float]
     service: Optional[str]
     skip_proxy: Optional[bool]
     split_yarn_application_tags: Optional[bool]